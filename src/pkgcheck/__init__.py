@@ -1,10 +1,10 @@
 from importlib import import_module as _import
 
-from .api import keywords, scan
+from .api import Scanner, keywords, scan
 from .base import PkgcheckException
 from .results import Result
 
-__all__ = ('keywords', 'scan', 'PkgcheckException', 'Result')
+__all__ = ('keywords', 'scan', 'Scanner', 'PkgcheckException', 'Result')
 __title__ = 'pkgcheck'
 __version__ = '0.10.13'
 
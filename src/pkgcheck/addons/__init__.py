@@ -11,7 +11,7 @@ from snakeoil.cli import arghparse
 from snakeoil.sequences import iflatten_instance
 from snakeoil.strings import pluralism
 
-from .. import base, results
+from .. import base, results, tracing
 from ..base import PkgcheckUserException
 from ..log import logger
 from . import caches
@@ -299,11 +299,13 @@ def init_addon(cls, options, addons_map=None, **kwargs):
         if issubclass(cls, caches.CachedAddon) and not options.cache[cls.cache.type]:
             raise caches.CacheDisabled(cls.cache)
 
-        addon = addons_map[cls] = cls(options, **kwargs)
+        with tracing.span(cls.__name__, 'addon init'):
+            addon = addons_map[cls] = cls(options, **kwargs)
 
         # force cache updates
         force_cache = getattr(options, 'force_cache', False)
         if isinstance(addon, caches.CachedAddon):
-            addon.update_cache(force=force_cache)
+            with tracing.span(f'{cls.cache.type} cache', 'cache update'):
+                addon.update_cache(force=force_cache)
 
     return addon
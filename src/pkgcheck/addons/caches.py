@@ -5,18 +5,26 @@ import os
 import pathlib
 import pickle
 import shutil
+import sqlite3
+import stat
+import time
 from collections import UserDict
+from collections.abc import Mapping, Sequence, Set
 from dataclasses import dataclass
 from hashlib import blake2b
+from itertools import chain
 from operator import attrgetter
 
+from pkgcore.ebuild.atom import atom as atom_cls
+from pkgcore.package.errors import MetadataException
 from snakeoil import klass
+from snakeoil.cli import arghparse
 from snakeoil.compatibility import IGNORED_EXCEPTIONS
 from snakeoil.fileutils import AtomicWriteFile
 from snakeoil.mappings import ImmutableDict
 from snakeoil.osutils import pjoin
 
-from ..base import Addon, PkgcheckException, PkgcheckUserException
+from ..base import Addon, PkgcheckException, PkgcheckUserException, get_addons
 from ..log import logger
 
 
@@ -26,6 +34,8 @@ class CacheData:
     type: str
     file: str
     version: int
+    # cache types disabled by default must be explicitly enabled
+    default: bool = True
 
 
 class Cache:
@@ -42,6 +52,21 @@ class DictCache(UserDict, Cache):
         self._cache = cache
 
 
+def repo_cache_dir(cache_dir, repo):
+    """Return the cache directory for a given repository.
+
+    A unique token using the repo's location is used so separate repos
+    using the same identifier don't use the same cache directory.
+    """
+    dirname = f'{repo.repo_id.lstrip(os.sep)}-{location_token(repo.location)}'
+    return pjoin(cache_dir, 'repos', dirname)
+
+
+def location_token(location):
+    """Return the token identifying a repo location in cache directory names."""
+    return blake2b(location.encode()).hexdigest()[:10]
+
+
 class CacheDisabled(PkgcheckException):
     """Exception flagging that a requested cache type is disabled."""
 
@@ -69,14 +94,8 @@ class CachedAddon(Addon):
         raise NotImplementedError(self.update_cache)
 
     def cache_file(self, repo):
-        """Return the cache file for a given repository.
-
-        A unique token using the repo's location is used so separate repos
-        using the same identifier don't use the same cache file.
-        """
-        token = blake2b(repo.location.encode()).hexdigest()[:10]
-        dirname = f'{repo.repo_id.lstrip(os.sep)}-{token}'
-        return pjoin(self.options.cache_dir, 'repos', dirname, self.cache.file)
+        """Return the cache file for a given repository."""
+        return pjoin(repo_cache_dir(self.options.cache_dir, repo), self.cache.file)
 
     def load_cache(self, path, fallback=None):
         cache = fallback
@@ -146,3 +165,334 @@ class CachedAddon(Addon):
                                     raise
             except IOError as e:
                 raise PkgcheckUserException(f'failed removing {cache_type} cache: {path!r}: {e}')
+
+
+class SqliteCache:
+    """Mixin for caches stored in sqlite databases shared between processes."""
+
+    _db = None
+    _db_pid = None
+
+    @property
+    def _conn(self):
+        """Database connection for the current process."""
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=60)
+            self._db.execute('PRAGMA synchronous = OFF')
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _close(self):
+        if self._db is not None and self._db_pid == os.getpid():
+            self._db.close()
+        self._db = None
+        self._db_pid = None
+
+
+class ResultsCache(SqliteCache, CachedAddon):
+    """Scan results cache for unchanged packages.
+
+    Results of checks run against version and package restrictions are stored
+    keyed by a hash of the package directory contents, the eclasses inherited
+    by its versions, the checks run, and global state such as the pkgcheck
+    version, options altering check results, profiles, and repo metadata
+    (e.g. metadata/pkgcheck.conf).
+    Unchanged packages replay their cached results instead of being fed to
+    checks. Entries unused for a while are pruned on cache updates.
+
+    Checks depending on data outside of that set (e.g. other packages or git
+    history) are flagged as uncacheable and always run.
+    """
+
+    # cache registry
+    cache = CacheData(type='results', file='results.db', version=2, default=False)
+
+    # entries unused for this long are pruned on cache updates
+    max_age = 30 * 24 * 60 * 60
+
+    # repo subdirectories tracked for global cache invalidation
+    _repo_dirs = ('profiles', 'metadata', 'licenses')
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.repo = self.options.target_repo
+        self.path = self.cache_file(self.repo)
+        self._fingerprint = None
+        self._eclass_hashes = {}
+        self._pkg_hash = (None, None)
+
+    # scan options altering check results that aren't registered by checks
+    _scan_options = (
+        'verbosity', 'gentoo_repo', 'net', 'arches', 'stable_arches', 'filter',
+        'selected_scopes', 'selected_checks', 'selected_keywords', 'filtered_keywords',
+    )
+
+    @staticmethod
+    def _check_options():
+        """Return the option attributes registered by checks and their addons."""
+        from .. import objects
+        parser = arghparse.ArgumentParser(suppress=True)
+        parser.plugin = parser.add_argument_group('plugin options')
+        for addon in get_addons(objects.CHECKS.values()):
+            addon.mangle_argparser(parser)
+        return sorted({x.dest for x in parser._actions} - {'help'})
+
+    @classmethod
+    def _option_repr(cls, value):
+        """Return a representation of an option value that is stable across runs."""
+        if isinstance(value, type):
+            return value.__name__
+        elif isinstance(value, Mapping):
+            return repr(sorted((cls._option_repr(k), cls._option_repr(v)) for k, v in value.items()))
+        elif isinstance(value, (Set, list, tuple)):
+            values = [cls._option_repr(x) for x in value]
+            return repr(values if isinstance(value, Sequence) else sorted(values))
+        return repr(value)
+
+    def _options_data(self):
+        """Yield option settings that alter check results."""
+        from .. import __version__
+        yield f'{__version__}-{self.cache.version}'
+        for attr in chain(self._scan_options, self._check_options()):
+            yield f'{attr}={self._option_repr(getattr(self.options, attr, None))}'
+        profiles = getattr(self.options, 'profiles', None) or ()
+        yield ' '.join(sorted(p.path for p in profiles))
+
+    def _repo_fingerprint(self):
+        """Return a hash of global repo state affecting all cached results."""
+        h = blake2b()
+        for data in self._options_data():
+            h.update(data.encode())
+            h.update(b'\0')
+        for repo in self.repo.trees:
+            # hash file contents using repo relative paths so cached results
+            # are reused for separate checkouts of the same repo, e.g. in CI
+            h.update(b'\0')
+            paths = ['.gitignore']
+            for subdir in self._repo_dirs:
+                for root, dirs, files in os.walk(pjoin(repo.location, subdir)):
+                    # package metadata changes are tracked via package hashes
+                    dirs[:] = sorted(x for x in dirs if x != 'md5-cache')
+                    root = os.path.relpath(root, repo.location)
+                    paths.extend(pjoin(root, x) for x in sorted(files))
+            for path in paths:
+                try:
+                    with open(pjoin(repo.location, path), 'rb') as f:
+                        data = f.read()
+                except (FileNotFoundError, IsADirectoryError):
+                    continue
+                h.update(f'{path}\0'.encode())
+                h.update(blake2b(data).digest())
+        return h.hexdigest()
+
+    def update_cache(self, force=False):
+        """Update related cache and push updates to disk."""
+        if force:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+        self._fingerprint = self._repo_fingerprint()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = self._conn
+            if db.execute('PRAGMA user_version').fetchone()[0] != self.cache.version:
+                logger.debug('forcing %s cache regen due to outdated version', self.cache.type)
+                db.execute('DROP TABLE IF EXISTS results')
+                db.execute(f'PRAGMA user_version = {self.cache.version}')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS results '
+                '(key TEXT PRIMARY KEY, mtime INTEGER, data BLOB)')
+            # Drop stale entries, note that entries for other global states
+            # are kept since keys include the fingerprint, allowing scans
+            # using separate options to share the cache.
+            db.execute(
+                'DELETE FROM results WHERE mtime < ?', (int(time.time()) - self.max_age,))
+            db.commit()
+        except sqlite3.Error as e:
+            raise PkgcheckUserException(
+                f'failed updating {self.cache.type} cache: {self.path!r}: {e}')
+        finally:
+            # connections can't be shared with forked processes
+            self._close()
+
+    def _eclass_hash(self, name):
+        """Return the content hash for a given eclass."""
+        try:
+            return self._eclass_hashes[name]
+        except KeyError:
+            digest = ''
+            for repo in reversed(self.repo.trees):
+                try:
+                    with open(pjoin(repo.location, 'eclass', f'{name}.eclass'), 'rb') as f:
+                        digest = blake2b(f.read()).hexdigest()
+                    break
+                except FileNotFoundError:
+                    continue
+            self._eclass_hashes[name] = digest
+            return digest
+
+    def _package_hash(self, restrict):
+        """Return the content hash for the package targeted by a given restriction."""
+        key, digest = self._pkg_hash
+        if key == restrict.key:
+            return digest
+
+        h = blake2b()
+        pkgdir = pjoin(self.repo.location, restrict.category, restrict.package)
+        for root, dirs, files in os.walk(pkgdir):
+            dirs.sort()
+            h.update(f'{root[len(pkgdir):]}/\0'.encode())
+            for name in sorted(files):
+                path = pjoin(root, name)
+                st = os.lstat(path)
+                h.update(f'{path[len(pkgdir):]}:{st.st_mode}\0'.encode())
+                if stat.S_ISREG(st.st_mode):
+                    with open(path, 'rb') as f:
+                        h.update(blake2b(f.read()).digest())
+
+        try:
+            inherited = set()
+            for pkg in self.repo.itermatch(restrict.unversioned_atom):
+                inherited.update(pkg.inherited)
+        except MetadataException:
+            # inherited eclasses can't be determined for broken packages
+            digest = None
+        else:
+            for name in sorted(inherited):
+                h.update(f'{name}:{self._eclass_hash(name)}'.encode())
+            digest = h.hexdigest()
+
+        self._pkg_hash = (restrict.key, digest)
+        return digest
+
+    def key(self, runner, restrict):
+        """Return the cache key for a given checkrunner and restriction, if cacheable."""
+        if not isinstance(restrict, atom_cls):
+            return None
+        if (pkg_hash := self._package_hash(restrict)) is None:
+            return None
+        data = '\0'.join((self._fingerprint, pkg_hash, str(restrict)) + runner.key)
+        return blake2b(data.encode()).hexdigest()
+
+    def get(self, key):
+        """Return cached results mapping for a given key, if it exists."""
+        try:
+            row = self._conn.execute(
+                'SELECT data, mtime FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            # refresh timestamps of used entries at most once per day
+            if (now := int(time.time())) - row[1] > 24 * 60 * 60:
+                with self._conn as db:
+                    db.execute('UPDATE results SET mtime = ? WHERE key = ?', (now, key))
+        except sqlite3.Error as e:
+            logger.debug('failed querying %s cache: %s', self.cache.type, e)
+            return None
+        return pickle.loads(row[0])
+
+    def put(self, key, results):
+        """Store results mapping for a given key and push it to disk."""
+        try:
+            with self._conn as db:
+                db.execute(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                    (key, int(time.time()), pickle.dumps(results, protocol=-1)))
+        except sqlite3.Error as e:
+            logger.debug('failed updating %s cache: %s', self.cache.type, e)
+
+
+class SyntaxCache(SqliteCache, CachedAddon):
+    """Syntax facts cache for parsed ebuilds and eclasses.
+
+    Facts extracted from bash parse trees are stored keyed by a hash of the
+    parsed file contents, allowing parse-based checks to skip parsing files
+    that were seen in earlier runs.
+    """
+
+    # cache registry
+    cache = CacheData(type='syntax', file='syntax.db', version=1, default=False)
+
+    # entries unused for this long are pruned on cache updates
+    max_age = 30 * 24 * 60 * 60
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.path = self.cache_file(self.options.target_repo)
+        self._fingerprint = None
+
+    @staticmethod
+    def _parser_fingerprint():
+        """Return a hash of the pkgcheck version and bash parsing library."""
+        from .. import __version__, bash
+        h = blake2b(__version__.encode())
+        with open(bash.lang_path, 'rb') as f:
+            h.update(f.read())
+        return h.hexdigest()
+
+    def update_cache(self, force=False):
+        """Update related cache and push updates to disk."""
+        if force:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+        fingerprint = self._parser_fingerprint()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = self._conn
+            db.execute('CREATE TABLE IF NOT EXISTS meta (fingerprint TEXT)')
+            row = db.execute('SELECT fingerprint FROM meta').fetchone()
+            version = db.execute('PRAGMA user_version').fetchone()[0]
+            if version != self.cache.version or row is None or row[0] != fingerprint:
+                logger.debug('forcing %s cache regen due to outdated version', self.cache.type)
+                db.execute('DROP TABLE IF EXISTS facts')
+                db.execute('DELETE FROM meta')
+                db.execute('INSERT INTO meta VALUES (?)', (fingerprint,))
+                db.execute(f'PRAGMA user_version = {self.cache.version}')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS facts '
+                '(key BLOB PRIMARY KEY, mtime INTEGER, data BLOB)')
+            # drop stale entries
+            db.execute(
+                'DELETE FROM facts WHERE mtime < ?', (int(time.time()) - self.max_age,))
+            db.commit()
+        except sqlite3.Error as e:
+            raise PkgcheckUserException(
+                f'failed updating {self.cache.type} cache: {self.path!r}: {e}')
+        finally:
+            # connections can't be shared with forked processes
+            self._close()
+
+    @staticmethod
+    def key(data):
+        """Return the cache key for given file contents."""
+        return blake2b(data).digest()
+
+    def get(self, key):
+        """Return cached syntax facts for a given key, if they exist."""
+        try:
+            row = self._conn.execute(
+                'SELECT data, mtime FROM facts WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            # refresh timestamps of used entries at most once per day
+            if (now := int(time.time())) - row[1] > 24 * 60 * 60:
+                with self._conn as db:
+                    db.execute('UPDATE facts SET mtime = ? WHERE key = ?', (now, key))
+        except sqlite3.Error as e:
+            logger.debug('failed querying %s cache: %s', self.cache.type, e)
+            return None
+        return pickle.loads(row[0])
+
+    def put(self, key, facts):
+        """Store syntax facts for a given key and push them to disk."""
+        try:
+            with self._conn as db:
+                db.execute(
+                    'INSERT OR REPLACE INTO facts VALUES (?, ?, ?)',
+                    (key, int(time.time()), pickle.dumps(facts, protocol=-1)))
+        except sqlite3.Error as e:
+            logger.debug('failed updating %s cache: %s', self.cache.type, e)
@@ -1,10 +1,19 @@
 """Git specific support and addon."""
 
 import argparse
+import fcntl
+import glob
+import multiprocessing
 import os
+import pickle
 import re
 import shlex
+import shutil
+import sqlite3
 import subprocess
+import tempfile
+import time
+import weakref
 from collections import defaultdict, deque
 from dataclasses import dataclass
 from datetime import datetime
@@ -15,11 +24,13 @@ from pathspec import PathSpec
 from pkgcore.ebuild import cpv
 from pkgcore.ebuild.atom import MalformedAtom
 from pkgcore.ebuild.atom import atom as atom_cls
+from pkgcore.repository import errors as repo_errors
 from pkgcore.repository import multiplex
 from pkgcore.repository.util import SimpleTree
 from pkgcore.restrictions import packages
 from snakeoil.cli import arghparse
 from snakeoil.contexts import GitStash
+from snakeoil.fileutils import AtomicWriteFile, touch
 from snakeoil.klass import jit_attr
 from snakeoil.mappings import ImmutableDict, OrderedSet
 from snakeoil.osutils import pjoin
@@ -71,13 +82,292 @@ class GitError(Exception):
     """Generic git-related error."""
 
 
-class GitCache(caches.DictCache):
-    """Dictionary-based cache that encapsulates git commit data."""
+class GitCache(caches.SqliteCache):
+    """Indexed git package history cache stored in an sqlite database.
 
-    def __init__(self, *args, commit):
-        super().__init__(*args)
+    Package changes are stored as rows indexed by category and package so
+    repos overlaid on the cache only load the history for queried packages
+    instead of the entire history being loaded on startup. Updates append
+    the changes from new commits.
+    """
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        # commit the cache was last updated to
+        self.commit = None
+
+    def load(self):
+        """Load the commit the cache was last updated to.
+
+        Returns False if the cache exists but is outdated.
+        """
+        self.commit = None
+        if not os.path.exists(self.path):
+            return True
+        db = self._conn
+        if db.execute('PRAGMA user_version').fetchone()[0] != self.version:
+            return False
+        row = db.execute('SELECT hash FROM meta').fetchone()
+        self.commit = row[0] if row is not None else None
+        return True
+
+    def remove(self):
+        """Remove the cache from disk."""
+        self._close()
+        self.commit = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def update(self, data, commit):
+        """Append package history for new commits and push it to disk."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = self._conn
+        if self.commit is None:
+            db.executescript(f"""
+                DROP TABLE IF EXISTS meta;
+                DROP TABLE IF EXISTS packages;
+                DROP TABLE IF EXISTS history;
+                CREATE TABLE meta (hash TEXT);
+                CREATE TABLE packages (
+                    category TEXT, package TEXT, PRIMARY KEY (category, package));
+                CREATE TABLE history (
+                    category TEXT, package TEXT, status TEXT,
+                    version TEXT, time INTEGER, hash TEXT);
+                CREATE INDEX history_pkgs ON history (category, package);
+                PRAGMA user_version = {self.version};
+            """)
+        with db:
+            db.executemany(
+                'INSERT OR IGNORE INTO packages VALUES (?, ?)',
+                ((category, package) for category, pkgs in data.items() for package in pkgs))
+            db.executemany(
+                'INSERT INTO history VALUES (?, ?, ?, ?, ?, ?)',
+                ((category, package, status, *commit)
+                 for category, pkgs in data.items()
+                 for package, statuses in pkgs.items()
+                 for status, commits in statuses.items()
+                 for commit in commits))
+            db.execute('DELETE FROM meta')
+            db.execute('INSERT INTO meta VALUES (?)', (commit,))
         self.commit = commit
 
+    def categories(self):
+        """Return all categories with package history."""
+        return tuple(x for (x,) in self._conn.execute(
+            'SELECT DISTINCT category FROM packages'))
+
+    def packages(self, category):
+        """Return all packages with history for a given category."""
+        return tuple(x for (x,) in self._conn.execute(
+            'SELECT package FROM packages WHERE category = ?', (category,)))
+
+    def history(self, cp, statuses):
+        """Return package changes for a given package matching given statuses."""
+        return [
+            (status, commit) for status, *commit in self._conn.execute(
+                'SELECT status, version, time, hash FROM history '
+                'WHERE category = ? AND package = ? ORDER BY rowid', cp)
+            if status in statuses]
+
+
+class GitCatFile:
+    """Persistent ``git cat-file --batch`` process for reading git objects.
+
+    The process is started on first use and restarted in forked processes
+    so objects can be read without spawning a subprocess per lookup. It's
+    terminated when closed, when the reader is garbage collected, or at exit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._proc = None
+        self._pid = None
+        self._finalizer = None
+
+    def _process(self):
+        if self._pid != os.getpid():
+            self._proc = subprocess.Popen(
+                ['git', 'cat-file', '--batch'], cwd=self.path,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, env=NO_CONFIG_ENV)
+            self._pid = os.getpid()
+            self._finalizer = weakref.finalize(self, self._terminate, self._proc, self._pid)
+        return self._proc
+
+    @staticmethod
+    def _terminate(proc, pid):
+        # processes are only terminated by the process that started them
+        if pid == os.getpid():
+            proc.stdin.close()
+            proc.wait()
+            proc.stdout.close()
+
+    def get(self, obj):
+        """Return the hash, type, and contents for a given object name."""
+        proc = self._process()
+        try:
+            proc.stdin.write(obj.encode() + b'\n')
+            proc.stdin.flush()
+            header = proc.stdout.readline().split()
+            if len(header) != 3:
+                raise GitError(f'failed reading git object: {obj}')
+            obj_hash, obj_type, size = header
+            data = proc.stdout.read(int(size))
+            # discard trailing newline
+            proc.stdout.read(1)
+        except (BrokenPipeError, ValueError):
+            self.close()
+            raise GitError(f'failed reading git object: {obj}')
+        return obj_hash.decode(), obj_type.decode(), data
+
+    def tree(self, obj):
+        """Return the (mode, name, hash) entries for a given tree object name."""
+        obj_hash, obj_type, data = self.get(obj)
+        if obj_type != 'tree':
+            raise GitError(f'invalid git tree object: {obj}')
+        # raw hashes use the repo's object format length
+        hash_len = len(obj_hash) // 2
+        entries = []
+        pos = 0
+        while pos < len(data):
+            end = data.index(b'\0', pos)
+            mode, name = data[pos:end].split(b' ', 1)
+            pos = end + 1 + hash_len
+            entries.append((mode.decode(), name.decode(), data[end + 1:pos].hex()))
+        return entries
+
+    def close(self):
+        """Terminate the running process, if any."""
+        if self._finalizer is not None:
+            self._finalizer()
+        self._proc = None
+        self._pid = None
+        self._finalizer = None
+
+
+class GitTree:
+    """Materialize git tree objects into directories without a checkout.
+
+    Files are hard linked from a content-addressed store of blobs so trees
+    for different revisions share storage. Blobs are written atomically,
+    allowing separate processes to materialize trees using the same store.
+    """
+
+    # minimum time between periodic store pruning runs
+    prune_interval = 24 * 60 * 60
+
+    def __init__(self, path, store):
+        self.objects = GitCatFile(path)
+        self.store = store
+
+    def _blob(self, obj_hash, mode):
+        """Return the store path for a given blob, writing it if missing."""
+        executable = mode == '100755'
+        path = pjoin(self.store, obj_hash[:2], obj_hash[2:] + ('.x' if executable else ''))
+        if not os.path.exists(path):
+            _, _, data = self.objects.get(obj_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                os.fchmod(f.fileno(), 0o755 if executable else 0o644)
+            os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def _link(blob, path):
+        try:
+            os.link(blob, path)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # fallback for stores on filesystems lacking hard links
+            shutil.copy2(blob, path)
+
+    @staticmethod
+    def _remove(path):
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.unlink(path)
+
+    def _extract(self, tree_hash, path, trees, previous):
+        trees[path] = tree_hash
+        if previous.get(path) == tree_hash:
+            # reuse unchanged subtrees from earlier extractions
+            prefix = path + os.sep
+            trees.update((k, v) for k, v in previous.items() if k.startswith(prefix))
+            return
+
+        os.makedirs(path, exist_ok=True)
+        # entries left from earlier extractions
+        existing = set(os.listdir(path)) if path in previous else set()
+        for mode, name, obj_hash in self.objects.tree(tree_hash):
+            existing.discard(name)
+            dest = pjoin(path, name)
+            if mode == '40000':
+                if not os.path.isdir(dest) or os.path.islink(dest):
+                    self._remove(dest)
+                self._extract(obj_hash, dest, trees, previous)
+                continue
+            self._remove(dest)
+            if mode == '120000':
+                os.symlink(self.objects.get(obj_hash)[2], dest)
+            elif mode != '160000':
+                try:
+                    self._link(self._blob(obj_hash, mode), dest)
+                except FileNotFoundError:
+                    # blob was pruned by a concurrent scan
+                    self._link(self._blob(obj_hash, mode), dest)
+        for name in existing:
+            self._remove(pjoin(path, name))
+
+    def extract(self, rev, path, previous=None):
+        """Write the tree for a given revision to a path.
+
+        Extractions can be updated in place by passing the tree mapping
+        returned from an earlier extraction to the same path, only
+        rewriting changed subtrees.
+
+        Returns the mapping of extracted directories to their tree hashes.
+        """
+        trees = {}
+        tree_hash, _, _ = self.objects.get(f'{rev}^{{tree}}')
+        try:
+            self._extract(tree_hash, path, trees, previous or {})
+        finally:
+            self.objects.close()
+        return trees
+
+    @classmethod
+    def prune(cls, store, periodic=False):
+        """Remove blobs from a store that aren't linked to by any tree.
+
+        Periodic runs are skipped if the store was pruned recently.
+        """
+        stamp = pjoin(store, '.pruned')
+        try:
+            if periodic and os.stat(stamp).st_mtime > time.time() - cls.prune_interval:
+                return
+        except FileNotFoundError:
+            pass
+        if not os.path.isdir(store):
+            return
+        touch(stamp)
+        for root, _dirs, files in os.walk(store):
+            for name in files:
+                path = pjoin(root, name)
+                if path == stamp:
+                    continue
+                try:
+                    if os.lstat(path).st_nlink == 1:
+                        os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
 
 class GitLog:
     """Iterator for decoded `git log` line output."""
@@ -236,6 +526,98 @@ class GitRepoPkgs(_ParseGitRepo):
                 self._pkgs.append(GitPkgChange(pkgs[0], status, commit_hash, commit_time))
 
 
+class GitRepoPkgChunks:
+    """Parse package changes for a commit range in parallel chunks.
+
+    Commits in the range are split into chunks that are parsed by separate
+    processes, each running ``git log`` on its chunk of commits and parsing
+    the raw ``-z`` output in bulk. Parsed commits are yielded in commit order
+    as (commit hash, commit time, changes) tuples with changes being
+    (status, category, package, version) tuples and renames treated as an
+    addition and removal.
+    """
+
+    # number of commits parsed per chunk
+    chunk_size = 1000
+
+    _git_cmd = f'{GitRepoPkgs._git_cmd} --no-walk=unsorted --stdin'
+    _format = GitRepoPkgs._format
+
+    def __init__(self, path, commit_range, jobs=1):
+        self.path = os.path.realpath(path)
+        self.commit_range = commit_range
+        self.jobs = jobs
+
+    def _commits(self):
+        """Return the hashes for all commits in the range."""
+        try:
+            p = subprocess.run(
+                ['git', 'rev-list', self.commit_range],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                cwd=self.path, env=NO_CONFIG_ENV, check=True, encoding='utf8')
+        except subprocess.CalledProcessError as e:
+            raise GitError(f'failed running git rev-list: {e.stderr.strip()}')
+        return p.stdout.split()
+
+    @staticmethod
+    def _pkg(path):
+        """Return the package components for a given ebuild path, if valid."""
+        if mo := _ParseGitRepo._ebuild_re.match(path):
+            try:
+                atom = atom_cls(f"={mo.group('category')}/{mo.group('package')}")
+            except MalformedAtom:
+                return None
+            return atom.category, atom.package, atom.fullver
+        return None
+
+    def _parse(self, commits):
+        """Run git log on a chunk of commits, parsing its output in bulk."""
+        cmd = shlex.split(self._git_cmd)
+        cmd.append(f"--pretty=tformat:%n{'%n'.join(self._format)}")
+        p = subprocess.run(
+            cmd, input='\n'.join(commits).encode(), cwd=self.path,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=NO_CONFIG_ENV)
+        if p.returncode:
+            error = p.stderr.decode().strip()
+            raise GitError(f'failed running git log: {error}')
+
+        # Fields are NUL-terminated with commit headers and the first status
+        # field of each commit prefixed by a newline. Use replacement
+        # characters for non-UTF8 decoding issues (issue #166).
+        fields = iter(p.stdout.decode('utf-8', 'replace').split('\x00'))
+        parsed = []
+        changes = None
+        for field in fields:
+            field = field.lstrip('\n')
+            if '\n' in field:
+                commit_hash, commit_time = field.split('\n')
+                changes = []
+                parsed.append((commit_hash, int(commit_time), changes))
+            elif field.startswith('R'):
+                old, new = self._pkg(next(fields)), self._pkg(next(fields))
+                if old and new:
+                    changes.append(('A', *new))
+                    changes.append(('D', *old))
+            elif field:
+                if pkg := self._pkg(next(fields)):
+                    changes.append((field, *pkg))
+        return parsed
+
+    def __iter__(self):
+        commits = self._commits()
+        chunks = [
+            commits[i:i + self.chunk_size]
+            for i in range(0, len(commits), self.chunk_size)]
+        if self.jobs > 1 and len(chunks) > 1:
+            ctx = multiprocessing.get_context('fork')
+            with ctx.Pool(min(self.jobs, len(chunks))) as pool:
+                for parsed in pool.imap(self._parse, chunks):
+                    yield from parsed
+        else:
+            for chunk in chunks:
+                yield from self._parse(chunk)
+
+
 class _GitCommitPkg(cpv.VersionedCPV):
     """Fake packages encapsulating commits parsed from git log."""
 
@@ -266,7 +648,20 @@ class GitChangedRepo(SimpleTree):
         kwargs.setdefault('pkg_klass', _GitCommitPkg)
         super().__init__(*args, **kwargs)
 
+    def _get_categories(self, *args):
+        if isinstance(self.cpv_dict, GitCache):
+            return () if args else self.cpv_dict.categories()
+        return super()._get_categories(*args)
+
+    def _get_packages(self, category):
+        if isinstance(self.cpv_dict, GitCache):
+            return self.cpv_dict.packages(category)
+        return super()._get_packages(category)
+
     def _get_versions(self, cp):
+        if isinstance(self.cpv_dict, GitCache):
+            # history is queried lazily from the cache per package
+            return self.cpv_dict.history(cp, self._status_filter)
         versions = []
         for status, data in self.cpv_dict[cp[0]][cp[1]].items():
             if status in self._status_filter:
@@ -299,9 +694,39 @@ class GitRemovedRepo(GitChangedRepo):
     _status_filter = {'D'}
 
 
+class _StagedLock:
+    """Lock on a materialized staged tree, shared by scans while running.
+
+    Lock files are reused per path within a process so later scans convert
+    the existing lock instead of deadlocking on it.
+    """
+
+    _files = {}
+
+    def __init__(self, path):
+        if (f := self._files.get(path)) is None:
+            f = self._files[path] = open(path, 'w')
+        self._file = f
+
+    def shared(self):
+        fcntl.flock(self._file, fcntl.LOCK_SH)
+
+    def exclusive(self):
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+
+
 class _ScanGit(argparse.Action):
     """Argparse action that enables scanning against git commits or staged changes."""
 
+    # staged tree state format version
+    _staged_version = 2
+
     def __init__(self, *args, staged=False, **kwargs):
         super().__init__(*args, **kwargs)
         if staged:
@@ -315,27 +740,126 @@ class _ScanGit(argparse.Action):
         self.default_ref = default_ref
         self.diff_cmd = diff_cmd
 
-    def generate_restrictions(self, parser, namespace, ref):
-        """Generate restrictions for a given diff command."""
+    def _git(self, parser, cmd, path):
+        """Run a given git command, returning its output."""
         try:
             p = subprocess.run(
-                self.diff_cmd + [ref],
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                cwd=namespace.target_repo.location, check=True, encoding='utf8')
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                cwd=path, check=True, encoding='utf8')
         except FileNotFoundError as e:
             parser.error(str(e))
         except subprocess.CalledProcessError as e:
             error = e.stderr.splitlines()[0]
             parser.error(f'failed running git: {error}')
+        return p.stdout
+
+    @staticmethod
+    def _staged_state(path):
+        """Load the state of an earlier staged tree materialization."""
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug('failed loading staged tree mapping: %s', e)
+        return None
 
-        if not p.stdout:
+    def _update_staged(self, repo, cache_dir, tree_hash, ignored):
+        """Update the materialized staged tree in place."""
+        staged_dir = pjoin(cache_dir, 'staged')
+        trees_file = pjoin(cache_dir, 'staged.pickle')
+        previous = self._staged_state(trees_file)
+        if previous is None or previous.get('version') != self._staged_version:
+            shutil.rmtree(staged_dir, ignore_errors=True)
+            previous = {'trees': None, 'ignored': ()}
+        try:
+            # force a full rebuild if interrupted
+            os.unlink(trees_file)
+        except FileNotFoundError:
+            pass
+
+        # Remove links to files and directories that are no longer ignored
+        # before extracting, so newly tracked files in previously ignored
+        # directories aren't written through the links.
+        for path in set(previous['ignored']).difference(ignored):
+            dest = pjoin(staged_dir, path)
+            if os.path.islink(dest) and os.readlink(dest) == pjoin(repo.location, path):
+                os.unlink(dest)
+
+        store = pjoin(cache_dir, 'objects')
+        trees = GitTree(repo.location, store).extract(tree_hash, staged_dir, previous['trees'])
+        # drop blobs only used by earlier states
+        GitTree.prune(store, periodic=True)
+
+        for path in ignored:
+            dest = pjoin(staged_dir, path)
+            if not os.path.lexists(dest):
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.symlink(pjoin(repo.location, path), dest)
+
+        state = {
+            'version': self._staged_version, 'tree': tree_hash,
+            'ignored': ignored, 'trees': trees,
+        }
+        with AtomicWriteFile(trees_file, binary=True) as f:
+            pickle.dump(state, f, protocol=-1)
+
+    def staged_repo(self, parser, namespace):
+        """Create a repo overlaying staged changes on ignored working tree files.
+
+        Files in the git index are written to a directory in the cache dir,
+        updating only changed subtrees from earlier runs. Ignored files, e.g.
+        generated metadata, fall back to the working tree via symlinks.
+        Unstaged changes and untracked files are excluded without touching
+        the working tree.
+
+        Scans hold a shared lock on the materialized tree while running so
+        it's only updated once no other scans are using it.
+        """
+        repo = namespace.target_repo
+        tree_hash = self._git(parser, ['git', 'write-tree'], repo.location).strip()
+        # wholly ignored directories are listed, and linked, once
+        ignored = sorted(x.rstrip('/') for x in self._git(
+            parser, ['git', 'ls-files', '-z', '--others', '--ignored', '--exclude-standard',
+                     '--directory'],
+            repo.location).split('\x00') if x)
+
+        cache_dir = caches.repo_cache_dir(namespace.cache_dir, repo)
+        trees_file = pjoin(cache_dir, 'staged.pickle')
+        os.makedirs(cache_dir, exist_ok=True)
+        lock = _StagedLock(pjoin(cache_dir, 'staged.lock'))
+        while True:
+            lock.shared()
+            state = self._staged_state(trees_file)
+            if state is not None and state.get('version') == self._staged_version and \
+                    (state['tree'], state['ignored']) == (tree_hash, ignored):
+                break
+            # Converting locks isn't atomic, so the tree state is rechecked
+            # after downgrading in case another scan updated it in between.
+            lock.exclusive()
+            try:
+                self._update_staged(repo, cache_dir, tree_hash, ignored)
+            except GitError as e:
+                parser.error(f'failed reading staged changes: {e}')
+        namespace.contexts.append(lock)
+
+        try:
+            return namespace.domain.add_repo(pjoin(cache_dir, 'staged'), config=namespace.config)
+        except repo_errors.InitializationError as e:
+            parser.error(f'invalid staged repo: {e}')
+
+    def generate_restrictions(self, parser, namespace, ref):
+        """Generate restrictions for a given diff command."""
+        output = self._git(parser, self.diff_cmd + [ref], namespace.target_repo.location)
+        if not output:
             # no changes exist, exit early
             parser.exit()
 
         eclass_re = re.compile(r'^eclass/(?P<eclass>\S+)\.eclass$')
         eclasses, profiles, pkgs = OrderedSet(), OrderedSet(), OrderedSet()
 
-        for path in p.stdout.strip('\x00').split('\x00'):
+        for path in output.strip('\x00').split('\x00'):
             path_components = path.split(os.sep)
             if mo := eclass_re.match(path):
                 eclasses.add(mo.group('eclass'))
@@ -381,7 +905,81 @@ class _ScanGit(argparse.Action):
         # generate scanning restrictions
         namespace.restrictions = self.generate_restrictions(parser, namespace, ref)
         # ignore irrelevant changes during scan
-        namespace.contexts.append(GitStash(namespace.target_repo.location, staged=self.staged))
+        if self.staged:
+            # git history is still pulled from the original repo
+            namespace.git_repo = namespace.target_repo
+            namespace.target_repo = self.staged_repo(parser, namespace)
+            namespace.search_repo = multiplex.tree(*namespace.target_repo.trees)
+            namespace.gentoo_repo = 'gentoo' in namespace.target_repo.aliases
+        else:
+            namespace.contexts.append(GitStash(namespace.target_repo.location))
+
+
+class _ScanTree(argparse.Action):
+    """Argparse action that enables scanning a git revision's tree."""
+
+    # materialized trees unused for this long are removed
+    max_age = 7 * 24 * 60 * 60
+
+    def _prune(self, cache_dir, repo_cache_dir):
+        """Remove outdated materialized trees along with related caches."""
+        trees_dir = pjoin(repo_cache_dir, 'trees')
+        cutoff = time.time() - self.max_age
+        try:
+            entries = list(os.scandir(trees_dir))
+        except FileNotFoundError:
+            return
+        pruned = False
+        for entry in entries:
+            if entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                # caches generated for the tree's location
+                token = caches.location_token(entry.path)
+                for path in glob.glob(pjoin(cache_dir, 'repos', f'*-{token}')):
+                    shutil.rmtree(path, ignore_errors=True)
+                pruned = True
+        if pruned:
+            GitTree.prune(pjoin(repo_cache_dir, 'objects'))
+
+    def __call__(self, parser, namespace, value, option_string=None):
+        repo = namespace.target_repo
+        try:
+            tree_hash = GitAddon._get_commit_hash(repo.location, f'{value}^{{tree}}')
+        except GitError:
+            parser.error(f'{option_string}: invalid git revision: {value!r}')
+
+        # Trees are stored by hash so scans of the same revision reuse them
+        # along with any caches generated for their location.
+        cache_dir = caches.repo_cache_dir(namespace.cache_dir, repo)
+        trees_dir = pjoin(cache_dir, 'trees')
+        tree_dir = pjoin(trees_dir, tree_hash)
+        self._prune(namespace.cache_dir, cache_dir)
+        if not os.path.exists(tree_dir):
+            os.makedirs(trees_dir, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=trees_dir)
+            try:
+                GitTree(repo.location, pjoin(cache_dir, 'objects')).extract(tree_hash, tmp_dir)
+                os.rename(tmp_dir, tree_dir)
+            except GitError as e:
+                parser.error(f'{option_string}: failed reading git tree: {e}')
+            except OSError:
+                # tree was materialized by a concurrent scan
+                if not os.path.exists(tree_dir):
+                    raise
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        # mark tree as used
+        os.utime(tree_dir)
+
+        try:
+            tree_repo = namespace.domain.add_repo(tree_dir, config=namespace.config)
+        except repo_errors.InitializationError as e:
+            parser.error(f'{option_string}: invalid repo tree: {e}')
+
+        setattr(namespace, self.dest, value)
+        namespace.target_repo = tree_repo
+        namespace.search_repo = multiplex.tree(*tree_repo.trees)
+        namespace.gentoo_repo = 'gentoo' in tree_repo.aliases
 
 
 class GitAddon(caches.CachedAddon):
@@ -402,7 +1000,7 @@ class GitAddon(caches.CachedAddon):
     """
 
     # cache registry
-    cache = caches.CacheData(type='git', file='git.pickle', version=5)
+    cache = caches.CacheData(type='git', file='git.db', version=6)
 
     @classmethod
     def mangle_argparser(cls, parser):
@@ -423,12 +1021,34 @@ class GitAddon(caches.CachedAddon):
             """)
         git_opts.add_argument(
             '--staged', nargs='?', default=False, metavar='tree-ish',
-            action=arghparse.Delayed, target=partial(_ScanGit, staged=True), priority=10,
+            # run after the target repo is loaded
+            action=arghparse.Delayed, target=partial(_ScanGit, staged=True), priority=30,
             help='determine scan targets from staged changes',
             docs="""
                 Targets are determined using all staged changes for the git
-                repo. Unstaged changes and untracked files are ignored by
-                temporarily stashing them during the scanning process.
+                repo. Files are scanned as they exist in the git index, which
+                is written to the cache directory and updated incrementally
+                on later runs, so unstaged changes and untracked files are
+                ignored without modifying the working tree. Ignored files,
+                e.g. generated metadata, are used from the working tree.
+            """)
+        git_opts.add_argument(
+            '--tree', metavar='tree-ish',
+            # run after the target repo is loaded
+            action=arghparse.Delayed, target=_ScanTree, priority=30,
+            help='scan the tree of a git revision without checking it out',
+            docs="""
+                Scan the repo as it exists at a given revision, reading files
+                from git objects instead of the working tree.
+
+                Trees are materialized in the cache directory using hard links
+                to a shared store of file contents and reused by later scans of
+                the same revision. The working tree isn't touched, so separate
+                revisions can be scanned concurrently, e.g. ``pkgcheck scan
+                --tree HEAD~1`` alongside ``pkgcheck scan --tree HEAD``.
+
+                Git history related checks are unavailable when scanning
+                trees.
             """)
 
     def __init__(self, *args):
@@ -441,13 +1061,22 @@ class GitAddon(caches.CachedAddon):
         # mapping of repo locations to their corresponding git repo caches
         self._cached_repos = {}
 
+    @property
+    def _repo(self):
+        """Repo git data is pulled from.
+
+        Staged scans read files from a copy of the git index that isn't a git
+        repo, so history and ignore settings come from the original repo.
+        """
+        return getattr(self.options, 'git_repo', None) or self.options.target_repo
+
     @jit_attr
     def _gitignore(self):
         """Load a repo's .gitignore and .git/info/exclude files for path matching."""
         patterns = []
         for path in ('.gitignore', '.git/info/exclude'):
             try:
-                with open(pjoin(self.options.target_repo.location, path)) as f:
+                with open(pjoin(self._repo.location, path)) as f:
                     patterns.extend(f)
             except (FileNotFoundError, IOError):
                 pass
@@ -501,30 +1130,44 @@ class GitAddon(caches.CachedAddon):
         return p.stdout.strip().split('/')[-1]
 
     @staticmethod
-    def pkg_history(repo, commit_range, data=None, local=False, verbosity=-1):
-        """Create or update historical package data for a given commit range."""
+    def pkg_history(repo, commit_range, data=None, local=False, verbosity=-1, jobs=1):
+        """Create or update historical package data for a given commit range.
+
+        Non-local history is parsed in parallel chunks using the given number
+        of processes.
+        """
         if data is None:
             data = {}
         seen = set()
         with base.ProgressManager(verbosity=verbosity) as progress:
-            for pkg in GitRepoPkgs(repo.location, commit_range, local=local):
-                atom = pkg.atom
-                key = (atom, pkg.status)
-                if key not in seen:
-                    seen.add(key)
-                    if local:
+            if local:
+                for pkg in GitRepoPkgs(repo.location, commit_range, local=local):
+                    atom = pkg.atom
+                    key = (atom, pkg.status)
+                    if key not in seen:
+                        seen.add(key)
                         commit = (atom.fullver, pkg.commit_time, pkg.commit, pkg.old)
-                    else:
-                        date = datetime.fromtimestamp(pkg.commit_time).strftime('%Y-%m-%d')
-                        progress(f'{repo} -- updating git cache: commit date: {date}')
-                        commit = (atom.fullver, pkg.commit_time, pkg.commit)
-                    data.setdefault(atom.category, {}).setdefault(
-                        atom.package, {}).setdefault(pkg.status, []).append(commit)
+                        data.setdefault(atom.category, {}).setdefault(
+                            atom.package, {}).setdefault(pkg.status, []).append(commit)
+                return data
+
+            commits = GitRepoPkgChunks(repo.location, commit_range, jobs=jobs)
+            for commit_hash, commit_time, changes in commits:
+                if changes:
+                    date = datetime.fromtimestamp(commit_time).strftime('%Y-%m-%d')
+                    progress(f'{repo} -- updating git cache: commit date: {date}')
+                for status, category, package, version in changes:
+                    key = (category, package, version, status)
+                    if key not in seen:
+                        seen.add(key)
+                        data.setdefault(category, {}).setdefault(
+                            package, {}).setdefault(status, []).append(
+                                (version, commit_time, commit_hash))
         return data
 
     def update_cache(self, force=False):
         """Update related cache and push updates to disk."""
-        for repo in self.options.target_repo.trees:
+        for repo in self._repo.trees:
             try:
                 branch = self._get_current_branch(repo.location)
                 default_branch = self._get_default_branch(repo.location)
@@ -538,42 +1181,48 @@ class GitAddon(caches.CachedAddon):
             except GitError:
                 continue
 
-            # initialize cache file location
-            cache_file = self.cache_file(repo)
-            git_cache = None
-            cache_repo = True
-
-            if not force:
-                git_cache = self.load_cache(cache_file)
+            git_cache = GitCache(self.cache_file(repo), self.cache.version)
+            try:
+                if force:
+                    git_cache.remove()
+                elif not git_cache.load():
+                    logger.debug(
+                        'forcing %s cache regen due to outdated version', self.cache.type)
+                    git_cache.remove()
+            except sqlite3.Error as e:
+                logger.debug('forcing %s cache regen: %s', self.cache.type, e)
+                git_cache.remove()
 
-            if git_cache is None or commit != git_cache.commit:
+            if commit != git_cache.commit:
                 logger.debug('updating %s git repo cache to %s', repo, commit[:13])
-                if git_cache is None:
-                    data = {}
+                if git_cache.commit is None:
                     commit_range = 'origin/HEAD'
                 else:
-                    data = git_cache.data
                     commit_range = f'{git_cache.commit}..origin/HEAD'
 
                 try:
-                    self.pkg_history(
-                        repo, commit_range, data=data,
-                        verbosity=self.options.verbosity)
+                    data = self.pkg_history(
+                        repo, commit_range, verbosity=self.options.verbosity,
+                        jobs=getattr(self.options, 'jobs', None) or os.cpu_count())
                 except GitError as e:
                     raise PkgcheckUserException(str(e))
-                git_cache = GitCache(data, self.cache, commit=commit)
-            else:
-                cache_repo = False
 
-            if git_cache:
+                # skip creating caches for repos lacking package history
+                if data or git_cache.commit is not None:
+                    try:
+                        git_cache.update(data, commit)
+                    except (OSError, sqlite3.Error) as e:
+                        raise PkgcheckUserException(
+                            f'failed updating {self.cache.type} cache: {git_cache.path!r}: {e}')
+
+            # connections can't be shared with forked processes
+            git_cache._close()
+            if git_cache.commit is not None:
                 self._cached_repos[repo.location] = git_cache
-                # push repo to disk if it was created or updated
-                if cache_repo:
-                    self.save_cache(git_cache, cache_file)
 
     def cached_repo(self, repo_cls):
         git_repos = []
-        for repo in self.options.target_repo.trees:
+        for repo in self._repo.trees:
             git_cache = self._cached_repos.get(repo.location, {})
             git_repos.append(repo_cls(git_cache, repo_id=f'{repo.repo_id}-history'))
 
@@ -582,7 +1231,7 @@ class GitAddon(caches.CachedAddon):
         return git_repos[0]
 
     def commits_repo(self, repo_cls):
-        target_repo = self.options.target_repo
+        target_repo = self._repo
         data = {}
 
         try:
@@ -597,7 +1246,7 @@ class GitAddon(caches.CachedAddon):
         return repo_cls(data, repo_id=repo_id)
 
     def commits(self):
-        target_repo = self.options.target_repo
+        target_repo = self._repo
         commits = ()
 
         try:
@@ -1,6 +1,7 @@
 """Profile specific support and addon."""
 
 import os
+import pickle
 import stat
 from collections import defaultdict
 from functools import partial
@@ -8,12 +9,12 @@ from itertools import chain
 
 from pkgcore.ebuild import domain, misc
 from pkgcore.ebuild import profiles as profiles_mod
+from pkgcore.package.errors import MetadataException
 from pkgcore.restrictions import packages, values
 from snakeoil.cli import arghparse
 from snakeoil.containers import ProtectedSet
 from snakeoil.decorators import coroutine
 from snakeoil.klass import jit_attr
-from snakeoil.mappings import ImmutableDict
 from snakeoil.osutils import pjoin
 
 from .. import base
@@ -41,6 +42,9 @@ class ProfileData:
         self.visible = vfilter.match
         self.status = status
         self.deprecated = deprecated
+        # bit identifying the profile in visibility bitsets, assigned by the
+        # profile addon
+        self.bit = 0
 
     def identify_use(self, pkg, known_flags):
         # note we're trying to be *really* careful about not creating
@@ -107,7 +111,7 @@ class ProfileAddon(caches.CachedAddon):
     non_profile_dirs = frozenset(['desc', 'updates'])
 
     # cache registry
-    cache = caches.CacheData(type='profiles', file='profiles.pickle', version=2)
+    cache = caches.CacheData(type='profiles', file='profiles.pickle', version=3)
 
     @classmethod
     def mangle_argparser(cls, parser):
@@ -157,23 +161,57 @@ class ProfileAddon(caches.CachedAddon):
         self.global_insoluble = set()
         self.profile_filters = {}
         self.profile_evaluate_dict = {}
-
-        self.arch_profiles = defaultdict(list)
+        # bitset support for vectorized visibility evaluation
+        self.profile_bits = 0
+        self._keyword_bits = defaultdict(int)
+        self._mask_filters = []
+        self._provides_filters = []
+
+        # Profile data is only loaded for the arches used by targeted packages
+        # when scanning specific packages, see load_targets().
+        self._loaded_arches = set()
+        self._force_cache = False
+        # raw cache entries per profiles base, see _cached_profiles()
+        self._cache_data = {}
+        self._profile_files_gen = None
+
+        self.arch_profiles = {}
+        self._selected_profiles = defaultdict(list)
         self.target_repo = self.options.target_repo
         ignore_deprecated = getattr(self.options, 'ignore_deprecated_profiles', True)
 
+        # Profile data objects get bits assigned using the selected profile's
+        # index so they're consistent between processes regardless of the
+        # order arches are loaded in.
+        self._profile_index = {}
         for p in sorted(self.options.profiles):
             if p.deprecated and ignore_deprecated:
                 continue
-            try:
-                profile = self.target_repo.profiles.create_profile(p, load_profile_base=False)
-            except profiles_mod.ProfileError as e:
-                # Only throw errors if the profile was selected by the user, bad
-                # repo profiles will be caught during repo metadata scans.
-                if self.options.selected_profiles is not None:
-                    raise PkgcheckUserException(f'invalid profile: {e.path!r}: {e.error}')
-                continue
-            self.arch_profiles[p.arch].append((profile, p))
+            self._profile_index[p] = len(self._profile_index)
+            self._selected_profiles[p.arch].append(p)
+
+        if self.options.selected_profiles is not None:
+            # create user selected profile objects upfront to flag invalid ones
+            for arch in sorted(self._selected_profiles):
+                self._profile_objs(arch)
+
+    def _profile_objs(self, arch):
+        """Return the list of profile objects for a given arch."""
+        try:
+            return self.arch_profiles[arch]
+        except KeyError:
+            profiles = self.arch_profiles[arch] = []
+            for p in self._selected_profiles.get(arch, ()):
+                try:
+                    profile = self.target_repo.profiles.create_profile(p, load_profile_base=False)
+                except profiles_mod.ProfileError as e:
+                    # Only throw errors if the profile was selected by the user, bad
+                    # repo profiles will be caught during repo metadata scans.
+                    if self.options.selected_profiles is not None:
+                        raise PkgcheckUserException(f'invalid profile: {e.path!r}: {e.error}')
+                    continue
+                profiles.append((profile, p))
+            return profiles
 
     @coroutine
     def _profile_files(self):
@@ -199,35 +237,74 @@ class ProfileAddon(caches.CachedAddon):
                 profile_files.extend(files)
             yield profile_mtime, frozenset(profile_files)
 
+    def _profile_data(self, profile_obj):
+        """Return a profile's age and file set used to check cache viability."""
+        if self._profile_files_gen is None:
+            self._profile_files_gen = self._profile_files()
+        data = self._profile_files_gen.send(profile_obj)
+        next(self._profile_files_gen)
+        return data
+
     @jit_attr
-    def profile_data(self):
-        """Mapping of profile age and file sets used to check cache viability."""
-        data = {}
-        gen_profile_data = self._profile_files()
-        for profile_obj, profile in chain.from_iterable(
-                self.arch_profiles.values()):
-            mtime, files = gen_profile_data.send(profile_obj)
-            data[profile] = (mtime, files)
-            next(gen_profile_data)
-        return ImmutableDict(data)
+    def _profile_repos(self):
+        """Mapping of profiles base directories to their related repos."""
+        return {repo.config.profiles_base: repo for repo in self.target_repo.trees}
+
+    def _cached_profiles(self, profiles_base):
+        """Return the raw, per profile pickled cache entries for a profiles base."""
+        try:
+            return self._cache_data[profiles_base]
+        except KeyError:
+            data = {}
+            repo = self._profile_repos.get(profiles_base)
+            if repo is not None and not self._force_cache:
+                data.update(self.load_cache(self.cache_file(repo), fallback={}))
+            self._cache_data[profiles_base] = data
+            return data
 
     def update_cache(self, force=False):
         """Update related cache and push updates to disk."""
-        cached_profiles = defaultdict(dict)
-        official_arches = self.target_repo.known_arches
+        self._force_cache = force
+        self.load_targets(getattr(self.options, 'restrictions', None))
+
+    def load_targets(self, restrictions):
+        """Load profile data required to scan the given restrictions.
+
+        Only the arches keyworded by targeted packages are loaded for scans of
+        specific packages, otherwise all profiles are loaded. This is run
+        before scanning processes are forked so loaded profiles and cache
+        updates are shared between them.
+        """
+        if restrictions and all(scope >= base.package_scope for scope, _ in restrictions):
+            keywords = set()
+            for _scope, restrict in restrictions:
+                for pkg in self.target_repo.itermatch(restrict):
+                    try:
+                        keywords.update(pkg.keywords)
+                    except MetadataException:
+                        # invalid packages are flagged by metadata checks
+                        continue
+            self._load_arches(x.lstrip('~') for x in keywords)
+        else:
+            self._load_arches(self.options.arches)
 
-        with base.ProgressManager(verbosity=self.options.verbosity) as progress:
-            for repo in self.target_repo.trees:
-                cache_file = self.cache_file(repo)
-                # add profiles-base -> repo mapping to ease storage procedure
-                cached_profiles[repo.config.profiles_base]['repo'] = repo
-                if not force:
-                    cache = self.load_cache(cache_file, fallback={})
-                    cached_profiles[repo.config.profiles_base].update(cache)
+    def _load_arches(self, arches, save=True):
+        """Load profile data for the given arches, optionally pushing cache updates to disk."""
+        if not (arches := sorted(set(arches).intersection(
+                self.options.arches).difference(self._loaded_arches))):
+            return
+        self._loaded_arches.update(arches)
 
-                chunked_data_cache = {}
+        official_arches = self.target_repo.known_arches
+        updated = set()
+        chunked_data_cache = {}
+        # padding for progress output
+        padding = max(len(x) for x in self.options.arches)
+        keys = set()
 
-                for arch in sorted(self.options.arches):
+        with base.ProgressManager(verbosity=self.options.verbosity) as progress:
+            for repo_index, repo in enumerate(self.target_repo.trees):
+                for arch in arches:
                     stable_key, unstable_key = arch, f'~{arch}'
                     stable_r = packages.PackageRestriction(
                         "keywords", values.ContainmentMatch2((stable_key,)))
@@ -237,13 +314,11 @@ class ProfileAddon(caches.CachedAddon):
                     default_masked_use = tuple(set(
                         x for x in official_arches if x != stable_key))
 
-                    # padding for progress output
-                    padding = max(len(x) for x in self.options.arches)
-
-                    for profile_obj, profile in self.arch_profiles.get(arch, []):
-                        files = self.profile_data.get(profile)
+                    for profile_obj, profile in self._profile_objs(arch):
+                        files = self._profile_data(profile_obj)
+                        cached_profiles = self._cached_profiles(profile.base)
                         try:
-                            cached_profile = cached_profiles[profile.base][profile.path]
+                            cached_profile = pickle.loads(cached_profiles[profile.path])
                             if files != cached_profile['files']:
                                 # force refresh of outdated cache entry
                                 raise KeyError
@@ -296,8 +371,8 @@ class ProfileAddon(caches.CachedAddon):
                                 # unsupported EAPI or other issue, profile checks will catch this
                                 continue
 
-                            cached_profiles[profile.base]['update'] = True
-                            cached_profiles[profile.base][profile.path] = {
+                            updated.add(profile.base)
+                            cached_profiles[profile.path] = pickle.dumps({
                                 'files': files,
                                 'masks': masks,
                                 'unmasks': unmasks,
@@ -309,7 +384,7 @@ class ProfileAddon(caches.CachedAddon):
                                 'iuse_effective': iuse_effective,
                                 'use': use,
                                 'provides_repo': provides_repo,
-                            }
+                            }, protocol=-1)
 
                         # used to interlink stable/unstable lookups so that if
                         # unstable says it's not visible, stable doesn't try
@@ -324,7 +399,7 @@ class ProfileAddon(caches.CachedAddon):
                         # stable cache is usable for unstable, but not vice versa.
                         # unstable insoluble is usable for stable, but not vice versa
                         vfilter = domain.generate_filter(self.target_repo.pkg_masks | masks, unmasks)
-                        self.profile_filters.setdefault(stable_key, []).append(ProfileData(
+                        stable_profile = ProfileData(
                             repo.repo_id,
                             profile.path, stable_key,
                             provides_repo,
@@ -336,9 +411,9 @@ class ProfileAddon(caches.CachedAddon):
                             stable_cache,
                             ProtectedSet(unstable_insoluble),
                             profile.status,
-                            profile.deprecated))
+                            profile.deprecated)
 
-                        self.profile_filters.setdefault(unstable_key, []).append(ProfileData(
+                        unstable_profile = ProfileData(
                             repo.repo_id,
                             profile.path, unstable_key,
                             provides_repo,
@@ -350,20 +425,40 @@ class ProfileAddon(caches.CachedAddon):
                             ProtectedSet(stable_cache),
                             unstable_insoluble,
                             profile.status,
-                            profile.deprecated))
+                            profile.deprecated)
+
+                        # Stable and unstable profile data share their mask
+                        # filter and provides, so the related visibility
+                        # restrictions only get evaluated once per pair.
+                        index = repo_index * len(self._profile_index) + self._profile_index[profile]
+                        stable_profile.bit = 1 << (index * 2)
+                        unstable_profile.bit = stable_profile.bit << 1
+                        pair_bits = stable_profile.bit | unstable_profile.bit
+                        self.profile_bits |= pair_bits
+                        self._keyword_bits[stable_key] |= pair_bits
+                        self._keyword_bits[unstable_key] |= unstable_profile.bit
+                        self._mask_filters.append((pair_bits, vfilter.match))
+                        self._provides_filters.append(
+                            (pair_bits, stable_profile.provides_has_match))
+
+                        self.profile_filters.setdefault(stable_key, []).append(stable_profile)
+                        self.profile_filters.setdefault(unstable_key, []).append(unstable_profile)
+                        keys.update((stable_key, unstable_key))
 
         # dump updated profile filters
-        for k, v in cached_profiles.items():
-            if v.pop('update', False):
-                repo = v.pop('repo')
-                cache_file = self.cache_file(repo)
-                cache = caches.DictCache(
-                    cached_profiles[repo.config.profiles_base], self.cache)
-                self.save_cache(cache, cache_file)
-
-        for key, profile_list in self.profile_filters.items():
+        for profiles_base in updated if save else ():
+            if (repo := self._profile_repos.get(profiles_base)) is not None:
+                cache = caches.DictCache(self._cache_data[profiles_base], self.cache)
+                self.save_cache(cache, self.cache_file(repo))
+
+        # keep profiles sorted by arch, independent of load order
+        self.profile_filters = {
+            k: self.profile_filters[k] for k in
+            sorted(self.profile_filters, key=lambda x: (x.lstrip('~'), x[0] == '~'))}
+
+        for key in keys:
             similar = self.profile_evaluate_dict[key] = []
-            for profile in profile_list:
+            for profile in self.profile_filters[key]:
                 for existing in similar:
                     if (existing[0].masked_use == profile.masked_use and
                             existing[0].forced_use == profile.forced_use):
@@ -372,25 +467,66 @@ class ProfileAddon(caches.CachedAddon):
                 else:
                     similar.append([profile])
 
+    def load(self, keywords):
+        """Load profile data for the arches related to the given keywords.
+
+        Data missing from load_targets() is loaded on demand, but cache
+        updates aren't saved since this can occur in parallel processes.
+        """
+        self._load_arches((x.lstrip('~') for x in keywords), save=False)
+
+    def visible_profiles(self, pkg):
+        """Return the bitset of profiles a given package is visible in.
+
+        Equivalent to ORing together the bits of all profiles where
+        ``profile.visible(pkg)`` is true, but keyword restrictions are
+        resolved via bitset lookups and each mask filter is only run once per
+        stable/unstable profile pair.
+        """
+        keyword_bits = self._keyword_bits
+        candidates = 0
+        for key in pkg.keywords:
+            candidates |= keyword_bits.get(key, 0)
+
+        visible = 0
+        if candidates:
+            for bits, match in self._mask_filters:
+                if candidates & bits and match(pkg):
+                    visible |= candidates & bits
+        return visible
+
+    def provided_profiles(self, node):
+        """Return the bitset of profiles providing a match for a given atom."""
+        provided = 0
+        for bits, has_match in self._provides_filters:
+            if has_match(node):
+                provided |= bits
+        return provided
+
     def identify_profiles(self, pkg):
         # yields groups of profiles; the 'groups' are grouped by the ability to share
         # the use processing across each of 'em.
         groups = []
+        self.load(pkg.keywords)
+        if not (visible := self.visible_profiles(pkg)):
+            return groups
         keywords = pkg.keywords
         unstable_keywords = (f'~{x}' for x in keywords if x[0] != '~')
         for key in chain(keywords, unstable_keywords):
             if profile_grps := self.profile_evaluate_dict.get(key):
                 for profiles in profile_grps:
-                    if group := [x for x in profiles if x.visible(pkg)]:
+                    if group := [x for x in profiles if x.bit & visible]:
                         groups.append(group)
         return groups
 
     def __getitem__(self, key):
         """Return profiles matching a given keyword."""
+        self.load((key,))
         return self.profile_filters[key]
 
     def get(self, key, default=None):
         """Return profiles matching a given keyword with a fallback if none exist."""
+        self.load((key,))
         try:
             return self.profile_filters[key]
         except KeyError:
@@ -398,6 +534,7 @@ class ProfileAddon(caches.CachedAddon):
 
     def __iter__(self):
         """Iterate over all profile data objects."""
+        self._load_arches(self.options.arches, save=False)
         return chain.from_iterable(self.profile_filters.values())
 
     def __len__(self):
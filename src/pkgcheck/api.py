@@ -1,5 +1,6 @@
 """Implements pkgcheck API to be exported."""
 
+from copy import copy
 from functools import partial
 
 import lazy_object_proxy
@@ -7,22 +8,12 @@ from snakeoil.contexts import patch
 from snakeoil.mappings import AttrAccessible
 
 from . import objects
-from .base import PkgcheckException
+from .base import PkgcheckException, PkgcheckUserException
 
 
-def scan(args=None, /, *, base_args=None):
-    """Run ``pkgcheck scan`` using given arguments.
-
-    Args:
-        args (:obj:`list`, optional): command-line args for ``pkgcheck scan``
-        base_args (:obj:`list`, optional): pkgcore-specific command-line args for ``pkgcheck``
-    Raises:
-        PkgcheckException on failure
-    Returns:
-        iterator of Result objects
-    """
+def _parse_args(args=None, base_args=None):
+    """Parse ``pkgcheck scan`` arguments into an options namespace."""
     # avoid circular imports
-    from .pipeline import Pipeline
     from .scripts import pkgcheck
 
     def parser_exit(parser, status=0, message=None):
@@ -40,8 +31,103 @@ def scan(args=None, /, *, base_args=None):
         base_args = []
 
     with patch('argparse.ArgumentParser.exit', parser_exit):
-        options = pkgcheck.argparser.parse_args(base_args + ['scan'] + args)
-    return Pipeline(options)
+        return pkgcheck.argparser.parse_args(base_args + ['scan'] + args)
+
+
+def scan(args=None, /, *, base_args=None):
+    """Run ``pkgcheck scan`` using given arguments.
+
+    Args:
+        args (:obj:`list`, optional): command-line args for ``pkgcheck scan``
+        base_args (:obj:`list`, optional): pkgcore-specific command-line args for ``pkgcheck``
+    Raises:
+        PkgcheckException on failure
+    Returns:
+        iterator of Result objects
+    """
+    # avoid circular imports
+    from .pipeline import Pipeline
+
+    return Pipeline(_parse_args(args, base_args))
+
+
+class Scanner:
+    """Reusable scanner for running multiple scans using the same options.
+
+    Arguments are parsed once and initialized addons, including their loaded
+    caches, are reused across scans. If the git HEAD commit of the target
+    repo changes between scans, options and addons are reinitialized in
+    order to refresh repo data and update caches.
+
+    Scanning processes are forked from the current process for each scan
+    so they inherit all initialized addons.
+
+    Args:
+        args (:obj:`list`, optional): command-line args for ``pkgcheck scan``
+        base_args (:obj:`list`, optional): pkgcore-specific command-line args for ``pkgcheck``
+    Raises:
+        PkgcheckException on failure
+    """
+
+    def __init__(self, args=None, /, *, base_args=None):
+        self._args = args
+        self._base_args = base_args
+        self._load()
+
+    def _load(self):
+        """Parse arguments and reset initialized addons."""
+        self.options = _parse_args(self._args, self._base_args)
+        self._head = self._repo_head()
+        # initialized addons, excluding checks
+        self._addons = {}
+
+    def _repo_head(self):
+        """Return the target repo's HEAD commit, if it's a git repo."""
+        # avoid circular imports
+        from .addons.git import GitAddon, GitError
+
+        try:
+            return GitAddon._get_commit_hash(self.options.target_repo.location, 'HEAD')
+        except GitError:
+            return None
+
+    def scan(self, targets=None):
+        """Scan given targets.
+
+        Args:
+            targets (:obj:`list`, optional): targets to scan, defaulting to
+                those used for initialization
+        Raises:
+            PkgcheckException on failure
+        Returns:
+            iterator of Result objects
+        """
+        # avoid circular imports
+        from .addons.profiles import ProfileAddon
+        from .checks import Check
+        from .pipeline import Pipeline
+        from .scripts.pkgcheck_scan import generate_restricts
+
+        if self._repo_head() != self._head:
+            self._load()
+
+        options = copy(self.options)
+        if targets is not None:
+            options.targets = list(targets)
+            options.restrictions = list(generate_restricts(options.target_repo, options.targets))
+            if not options.restrictions:
+                raise PkgcheckUserException('no targets')
+            options.pkg_scan = False
+
+        addons_map = dict(self._addons)
+        if (profile_addon := addons_map.get(ProfileAddon)) is not None:
+            # load profiles for new targets before scanning processes are forked
+            profile_addon.load_targets(options.restrictions)
+        pipe = Pipeline(options, addons_map=addons_map)
+        # checks are stateful so only other addons are reused
+        self._addons.update(
+            (cls, addon) for cls, addon in addons_map.items() if not issubclass(cls, Check))
+        return pipe
 
 
 def _keywords():
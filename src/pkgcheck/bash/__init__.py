@@ -1,6 +1,9 @@
 """bash parsing support"""
 
+from array import array
+from bisect import bisect_left, bisect_right
 from functools import partial
+from operator import attrgetter
 import os
 
 from snakeoil.osutils import pjoin
@@ -95,43 +98,287 @@ except ImportError:  # pragma: no cover
         bash_src = pjoin(const.REPO_PATH, 'tree-sitter-bash')
         build_library(lib, [bash_src])
 
+# mapping of indexed node kinds to their parse tree node types
+node_types = {
+    'cmd': 'command',
+    'func': 'function_definition',
+    'assign': 'variable_assignment',
+    'var': 'variable_name',
+}
+
 if syslib is not None or os.path.exists(lib):
-    lang = Language(syslib or lib, 'bash')
+    lang_path = syslib or lib
+    lang = Language(lang_path, 'bash')
     query = partial(lang.query)
     parser = Parser()
     parser.set_language(lang)
 
-    # various parse tree queries
-    cmd_query = query('(command) @call')
-    func_query = query('(function_definition) @func')
-    var_assign_query = query('(variable_assignment) @assign')
-    var_query = query('(variable_name) @var')
+    # combined query capturing all node types indexed by parse trees
+    nodes_query = query(' '.join(
+        f'({node_type}) @{kind}' for kind, node_type in node_types.items()))
+
+
+class SyntaxNode:
+    """Parse tree node restored from syntax facts.
+
+    Only the subset of the node API used by checks is supported and node
+    attributes are pulled from the stored facts on access.
+    """
+
+    __slots__ = ('_facts', '_index')
+
+    def __init__(self, facts, index):
+        self._facts = facts
+        self._index = index
+
+    def _field(self, offset):
+        return self._facts._data[self._index * SyntaxFacts.width + offset]
+
+    @property
+    def type(self):
+        return self._facts._types[self._field(0)]
+
+    @property
+    def start_byte(self):
+        return self._field(1)
+
+    @property
+    def end_byte(self):
+        return self._field(2)
+
+    @property
+    def start_point(self):
+        return self._field(3), self._field(4)
+
+    @property
+    def end_point(self):
+        return self._field(5), self._field(6)
+
+    @property
+    def has_error(self):
+        return bool(self._field(7))
+
+    @property
+    def parent(self):
+        return self._facts.node(self._field(8))
+
+    @property
+    def children(self):
+        return self._facts.children(self._index)
+
+    def child_by_field_name(self, name):
+        if name == 'name':
+            return self._facts.node(self._field(9))
+        raise ValueError(f'unsupported field name: {name!r}')
+
+    def __repr__(self):
+        return f'<SyntaxNode type={self.type}, start_point={self.start_point}>'
+
+
+class SyntaxFacts:
+    """Serializable syntax facts extracted from a parse tree.
+
+    Parse trees can't be serialized so the nodes captured for checks are
+    stored instead, along with their ancestors, ``name`` fields, and the
+    children of variable assignments. Node attributes are stored in a flat
+    integer array and nodes are only restored on access, keeping loading
+    cheaper than reparsing.
+    """
+
+    __slots__ = ('_types', '_data', '_kinds', '_nodes', '_children')
+
+    # number of stored integers per node: type, byte range, start and end
+    # points, error flag, and parent and name node indices
+    width = 10
+
+    def __init__(self, types, data, kinds):
+        # node type names referenced by index
+        self._types = types
+        self._data = data
+        # flat pairs of kind and node indices for captures in document order
+        self._kinds = kinds
+        self._nodes = [None] * (len(data) // self.width)
+        self._children = None
+
+    @classmethod
+    def from_tree(cls, parse_tree):
+        """Extract syntax facts from a given parse tree."""
+        indices = {}
+        types = {}
+        data = array('i')
+
+        def add(node):
+            if node is None:
+                return -1
+            try:
+                return indices[node.id]
+            except KeyError:
+                pass
+            parent = add(node.parent)
+            i = indices[node.id] = len(data) // cls.width
+            type_id = types.setdefault(node.type, len(types))
+            data.extend((
+                type_id, node.start_byte, node.end_byte, *node.start_point,
+                *node.end_point, node.has_error, parent, -1))
+            if node.type in ('command', 'function_definition', 'variable_assignment'):
+                data[(i + 1) * cls.width - 1] = add(node.child_by_field_name('name'))
+            if node.type == 'variable_assignment':
+                for child in node.children:
+                    add(child)
+            return i
+
+        root = parse_tree.tree.root_node
+        add(root)
+        kind_ids = {kind: i for i, kind in enumerate(node_types)}
+        kinds = array('i')
+        for node, kind in nodes_query.captures(root):
+            kinds.extend((kind_ids[kind], add(node)))
+        return cls(tuple(types), data, kinds)
+
+    def __getstate__(self):
+        return self._types, self._data, self._kinds
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def node(self, index):
+        """Return the restored node for a given index."""
+        if index < 0:
+            return None
+        if (node := self._nodes[index]) is None:
+            node = self._nodes[index] = SyntaxNode(self, index)
+        return node
+
+    def children(self, index):
+        """Return the stored children for a given node index."""
+        if self._children is None:
+            self._children = {}
+            parents = self._data[self.width - 2::self.width]
+            for i, parent in enumerate(parents):
+                self._children.setdefault(parent, []).append(i)
+        nodes = map(self.node, self._children.get(index, ()))
+        return sorted(nodes, key=attrgetter('start_byte'))
+
+    @property
+    def root_node(self):
+        return self.node(0)
+
+    def index(self):
+        """Return captured nodes and their start byte offsets bucketed by kind."""
+        nodes = {kind: ([], []) for kind in node_types}
+        kinds = tuple(nodes.values())
+        data = self._data
+        node = self.node
+        for kind_id, i in zip(self._kinds[::2], self._kinds[1::2]):
+            kind_nodes, kind_starts = kinds[kind_id]
+            kind_nodes.append(node(i))
+            kind_starts.append(data[i * self.width + 1])
+        return nodes
 
 
 class ParseTree:
     """Bash parse tree object and support."""
 
-    def __init__(self, data, **kwargs):
+    def __init__(self, data, facts=None, **kwargs):
         super().__init__(**kwargs)
         self.data = data
-        self.tree = parser.parse(data)
+        self._facts = facts
+        self._tree = None
+        self._nodes = None
+
+    @property
+    def tree(self):
+        """Parse tree for the related data, parsed on first access."""
+        if self._tree is None:
+            self._tree = parser.parse(self.data)
+        return self._tree
+
+    @property
+    def root_node(self):
+        """Root node of the parse tree or its restored syntax facts."""
+        if self._facts is not None:
+            return self._facts.root_node
+        return self.tree.root_node
+
+    @property
+    def has_error(self):
+        """Determine if the parse tree contains syntax errors."""
+        return self.root_node.has_error
+
+    @property
+    def facts(self):
+        """Syntax facts for the parse tree, usable in place of reparsing."""
+        if self._facts is not None:
+            return self._facts
+        return SyntaxFacts.from_tree(self)
+
+    def edit(self, data, edits):
+        """Update the parse tree for edited data, reparsing it incrementally.
+
+        Edits are applied in order using tuples of the start byte, old end
+        byte, new end byte, start point, old end point, and new end point of
+        each change as used by :meth:`tree_sitter.Tree.edit`, with points
+        being (row, byte column) tuples.
+        """
+        tree = self.tree
+        for edit in edits:
+            tree.edit(*edit)
+        self._tree = parser.parse(data, tree)
+        self.data = data
+        self._facts = None
+        self._nodes = None
+
+    def _index(self):
+        """Bucket captured nodes by kind using a single query over the tree.
+
+        Nodes are captured in document order so their start byte offsets are
+        stored as well, allowing captures within a given node to be found via
+        bisection.
+        """
+        if self._facts is not None:
+            nodes = self._facts.index()
+        else:
+            nodes = {kind: ([], []) for kind in node_types}
+            for node, kind in nodes_query.captures(self.tree.root_node):
+                kind_nodes, kind_starts = nodes[kind]
+                kind_nodes.append(node)
+                kind_starts.append(node.start_byte)
+        # byte ranges of function definitions in global scope
+        root = self.root_node
+        self._func_ranges = tuple(
+            (x.start_byte, x.end_byte) for x in nodes['func'][0] if x.parent == root)
+        self._nodes = nodes
+        return nodes
+
+    def nodes(self, kind, node=None):
+        """Return captured nodes of a given kind, optionally within a given node.
+
+        Supported kinds are ``cmd`` for commands, ``func`` for function
+        definitions, ``assign`` for variable assignments, and ``var`` for
+        variable names. The results match those from running the related
+        query on the given node.
+        """
+        kind_nodes, kind_starts = self._nodes[kind] if self._nodes else self._index()[kind]
+        if node is None:
+            return kind_nodes
+        start, end = node.start_byte, node.end_byte
+        i = bisect_left(kind_starts, start)
+        j = bisect_right(kind_starts, end, lo=i)
+        return [x for x in kind_nodes[i:j] if x.end_byte <= end]
+
+    def _in_func(self, node):
+        """Determine if a given node is within a global scope function definition."""
+        i = bisect_right(self._func_ranges, (node.start_byte, float('inf')))
+        return i > 0 and node.end_byte <= self._func_ranges[i - 1][1]
+
+    def global_nodes(self, kind):
+        """Return captured nodes of a given kind in global scope."""
+        return [x for x in self.nodes(kind) if not self._in_func(x)]
+
+    def func_nodes(self, kind):
+        """Return captured nodes of a given kind in function scope."""
+        return [x for x in self.nodes(kind) if self._in_func(x)]
 
     def node_str(self, node):
         """Return the ebuild string associated with a given parse tree node."""
         return self.data[node.start_byte:node.end_byte].decode('utf8')
-
-    def global_query(self, query):
-        """Run a given parse tree query returning only those nodes in global scope."""
-        for x in self.tree.root_node.children:
-            # skip nodes in function scope
-            if x.type != 'function_definition':
-                for node, _ in query.captures(x):
-                    yield node
-
-    def func_query(self, query):
-        """Run a given parse tree query returning only those nodes in function scope."""
-        for x in self.tree.root_node.children:
-            # only return nodes in function scope
-            if x.type == 'function_definition':
-                for node, _ in query.captures(x):
-                    yield node
@@ -25,6 +25,9 @@ class Check(feeds.Feed):
     known_results = frozenset()
     # checkrunner class used to execute this check
     runner_cls = runners.SyncCheckRunner
+    # results only depend on the scanned package's files, inherited eclasses,
+    # and global repo data so they can be stored in the results cache
+    cacheable = True
 
     @klass.jit_attr
     def priority(self):
@@ -62,15 +65,45 @@ class RepoCheck(Check):
     """Check that requires running at a repo level."""
 
     runner_cls = runners.RepoCheckRunner
+    # Checks only accumulating state while being fed can be fed over separate
+    # repo shards in parallel, with each shard's partial state merged into a
+    # freshly started instance before finishing.
+    mergeable = False
 
     def start(self):
         """Do startup here."""
 
+    def state(self):
+        """Return the partial state accumulated while being fed."""
+        raise NotImplementedError(self.state)
+
+    def merge(self, state):
+        """Merge partial state accumulated by a separately fed instance."""
+        raise NotImplementedError(self.merge)
+
     def finish(self):
         """Do cleanup and yield final results here."""
         yield from ()
 
 
+class SplitCheck(Check):
+    """Check supporting splitting the work done per item into separate parts.
+
+    Expensive items are fed to separate instances per part in parallel, with
+    the results of all parts merged to generate the final results.
+    """
+
+    runner_cls = runners.SplitCheckRunner
+
+    def split(self, part, parts):
+        """Restrict the work done to a given part out of the total number of parts."""
+        raise NotImplementedError(self.split)
+
+    def merge_split(self, results):
+        """Merge results generated by all parts, yielding final results."""
+        raise NotImplementedError(self.merge_split)
+
+
 class GentooRepoCheck(Check):
     """Check that is only run against the gentoo repo by default."""
 
@@ -100,6 +133,9 @@ class OptionalCheck(Check):
 class GitCommitsCheck(OptionalCheck):
     """Check that is only run when explicitly enabled via the --commits git option."""
 
+    # results depend on git history
+    cacheable = False
+
     def __init__(self, *args):
         super().__init__(*args)
         if not self.options.commits:
@@ -8,7 +8,7 @@ from snakeoil.mappings import ImmutableDict
 from snakeoil.sequences import stable_unique
 from snakeoil.strings import pluralism
 
-from .. import addons, bash
+from .. import addons
 from .. import results, sources
 from . import Check
 
@@ -68,8 +68,8 @@ class BadCommandsCheck(Check):
     known_results = frozenset([DeprecatedEapiCommand, BannedEapiCommand])
 
     def feed(self, pkg):
-        for func_node, _ in bash.func_query.captures(pkg.tree.root_node):
-            for node, _ in bash.cmd_query.captures(func_node):
+        for func_node in pkg.nodes('func'):
+            for node in pkg.nodes('cmd', func_node):
                 call = pkg.node_str(node)
                 name = pkg.node_str(node.child_by_field_name('name'))
                 lineno, colno = node.start_point
@@ -94,8 +94,8 @@ class EendMissingArgCheck(Check):
     known_results = frozenset([EendMissingArg])
 
     def feed(self, pkg):
-        for func_node, _ in bash.func_query.captures(pkg.tree.root_node):
-            for node, _ in bash.cmd_query.captures(func_node):
+        for func_node in pkg.nodes('func'):
+            for node in pkg.nodes('cmd', func_node):
                 line = pkg.node_str(node)
                 if line == "eend":
                     lineno, _ = node.start_point
@@ -510,7 +510,7 @@ class MetadataVarCheck(Check):
     @verify_vars('HOMEPAGE', 'KEYWORDS')
     def _raw_text(self, var, node, value, pkg):
         matches = []
-        for var_node, _ in bash.var_query.captures(node):
+        for var_node in pkg.nodes('var', node):
             matches.append(pkg.node_str(var_node.parent))
         if matches:
             yield ReferenceInMetadataVar(var, stable_unique(matches), pkg=pkg)
@@ -518,7 +518,7 @@ class MetadataVarCheck(Check):
     @verify_vars('LICENSE')
     def _raw_text_license(self, var, node, value, pkg):
         matches = []
-        for var_node, _ in bash.var_query.captures(node):
+        for var_node in pkg.nodes('var', node):
             var_str = pkg.node_str(var_node.parent).strip()
             if var_str in ['$LICENSE', '${LICENSE}']:
                 continue  # LICENSE in LICENSE is ok
@@ -541,7 +541,7 @@ class MetadataVarCheck(Check):
 
     def feed(self, pkg):
         keywords_lines = set()
-        for node in pkg.global_query(bash.var_assign_query):
+        for node in pkg.global_nodes('assign'):
             name = pkg.node_str(node.child_by_field_name('name'))
             if name in self.known_variables:
                 # RHS value node should be last
@@ -623,6 +623,7 @@ class InheritsCheck(Check):
     order for direct inherits to be correct.
     """
 
+    cacheable = False
     _source = sources.EbuildParseRepoSource
     known_results = frozenset([
         MissingInherits, IndirectInherits, UnusedInherits, InternalEclassUsage])
@@ -684,14 +685,14 @@ class InheritsCheck(Check):
 
         # register variables assigned in ebuilds
         assigned_vars = dict()
-        for node, _ in bash.var_assign_query.captures(pkg.tree.root_node):
+        for node in pkg.nodes('assign'):
             name = pkg.node_str(node.child_by_field_name('name'))
             if eclass := self.get_eclass(name, pkg):
                 assigned_vars[name] = eclass
 
         # match captured commands with eclasses
         used = defaultdict(list)
-        for node, _ in bash.cmd_query.captures(pkg.tree.root_node):
+        for node in pkg.nodes('cmd'):
             call = pkg.node_str(node)
             name = pkg.node_str(node.child_by_field_name('name'))
             if name == 'inherit':
@@ -707,7 +708,7 @@ class InheritsCheck(Check):
                     used[eclass].append((lineno + 1, name, call.split('\n', 1)[0]))
 
         # match captured variables with eclasses
-        for node, _ in bash.var_query.captures(pkg.tree.root_node):
+        for node in pkg.nodes('var'):
             name = pkg.node_str(node)
             if name not in self.eapi_vars[pkg.eapi] | assigned_vars.keys():
                 lineno, colno = node.start_point
@@ -783,7 +784,7 @@ class ReadonlyVariableCheck(Check):
     ])
 
     def feed(self, pkg):
-        for node in pkg.global_query(bash.var_assign_query):
+        for node in pkg.global_nodes('assign'):
             name = pkg.node_str(node.child_by_field_name('name'))
             if name in self.readonly_vars:
                 call = pkg.node_str(node)
@@ -853,11 +854,11 @@ class VariableScopeCheck(Check):
     scoped_vars = ImmutableDict(scoped_vars)
 
     def feed(self, pkg):
-        for func_node, _ in bash.func_query.captures(pkg.tree.root_node):
+        for func_node in pkg.nodes('func'):
             func_name = pkg.node_str(func_node.child_by_field_name('name'))
             if variables := self.scoped_vars[pkg.eapi].get(func_name):
                 usage = defaultdict(set)
-                for var_node, _ in bash.var_query.captures(func_node):
+                for var_node in pkg.nodes('var', func_node):
                     var_name = pkg.node_str(var_node)
                     if var_name in variables:
                         lineno, colno = var_node.start_point
@@ -966,7 +967,7 @@ class _UnquotedVariablesCheck(Check):
 
     def _var_needs_quotes(self, pkg, node):
         pnode = node.parent
-        while pnode != node:
+        while pnode is not None:
             if pnode.type in self.node_types_ok:
                 return False
             elif pnode.type == 'command':
@@ -981,13 +982,13 @@ class _UnquotedVariablesCheck(Check):
         return True
 
     def _feed(self, item):
-        if item.tree.root_node.has_error:
+        if item.has_error:
             # Do not run this check if the parse tree contains errors, as it
             # might result in false positives. This check appears to be quite
             # expensive though...
             return
         hits = defaultdict(set)
-        for var_node, _ in bash.var_query.captures(item.tree.root_node):
+        for var_node in item.nodes('var'):
             var_name = item.node_str(var_node)
             if var_name in self.var_names:
                 if self._var_needs_quotes(item, var_node):
@@ -7,7 +7,7 @@ from pkgcore.ebuild.eapi import EAPI
 from pkgcore.ebuild.eclass import EclassDoc
 from snakeoil.strings import pluralism
 
-from .. import addons, bash, results, sources
+from .. import addons, results, sources
 from ..base import LogMap, LogReports
 from . import Check
 from .codingstyle import VariableScope, VariableScopeCheck
@@ -125,7 +125,7 @@ class EclassUsageCheck(Check):
 
         # scan for any misplaced @PRE_INHERIT variables
         if pre_inherits:
-            for node, _ in bash.var_assign_query.captures(pkg.tree.root_node):
+            for node in pkg.nodes('assign'):
                 var_name = pkg.node_str(node.child_by_field_name('name'))
                 lineno, _colno = node.start_point
                 if var_name in pre_inherits and lineno > pre_inherits[var_name]:
@@ -145,7 +145,7 @@ class EclassUsageCheck(Check):
 
         # scan for usage of @DEPRECATED variables
         if deprecated:
-            for node, _ in bash.var_query.captures(pkg.tree.root_node):
+            for node in pkg.nodes('var'):
                 var_name = pkg.node_str(node)
                 lineno, _colno = node.start_point
                 if var_name in deprecated:
@@ -168,7 +168,7 @@ class EclassUsageCheck(Check):
 
         # scan for usage of @DEPRECATED functions
         if deprecated:
-            for node, _ in bash.cmd_query.captures(pkg.tree.root_node):
+            for node in pkg.nodes('cmd'):
                 func_name = pkg.node_str(node.child_by_field_name('name'))
                 lineno, _colno = node.start_point
                 if func_name in deprecated:
@@ -183,7 +183,7 @@ class EclassUsageCheck(Check):
         if pkg.inherit:
             inherited = set()
             inherits = []
-            for node, _ in bash.cmd_query.captures(pkg.tree.root_node):
+            for node in pkg.nodes('cmd'):
                 name = pkg.node_str(node.child_by_field_name('name'))
                 if name == 'inherit':
                     call = pkg.node_str(node)
@@ -262,14 +262,14 @@ class EclassParseCheck(Check):
 
     def feed(self, eclass):
         func_prefix = f'{eclass.name}_'
-        for func_node, _ in bash.func_query.captures(eclass.tree.root_node):
+        for func_node in eclass.nodes('func'):
             func_name = eclass.node_str(func_node.child_by_field_name('name'))
             if not func_name.startswith(func_prefix):
                 continue
             phase = func_name[len(func_prefix):]
             if variables := self.eclass_phase_vars(eclass, phase):
                 usage = defaultdict(set)
-                for var_node, _ in bash.var_query.captures(func_node):
+                for var_node in eclass.nodes('var', func_node):
                     var_name = eclass.node_str(var_node)
                     if var_name in variables:
                         lineno, colno = var_node.start_point
@@ -278,7 +278,7 @@ class EclassParseCheck(Check):
                     yield EclassVariableScope(var, func_name, lines=sorted(lines), eclass=eclass.name)
 
         export_funcs_called = None
-        for node in eclass.global_query(bash.cmd_query):
+        for node in eclass.global_nodes('cmd'):
             call = eclass.node_str(node)
             if call.startswith('EXPORT_FUNCTIONS'):
                 export_funcs_called = node.start_point[0] + 1
@@ -3,7 +3,6 @@
 import os
 import re
 import subprocess
-import tarfile
 from collections import defaultdict
 from datetime import datetime
 from itertools import chain
@@ -172,12 +171,21 @@ class MissingMove(results.PackageResult, results.Error):
 
 
 class _RemovalRepo(UnconfiguredTree):
-    """Repository of removed packages stored in a temporary directory."""
+    """Repository of removed packages stored in a temporary directory.
 
-    def __init__(self, repo):
+    Files are written from git objects read via a given
+    :class:`git.GitCatFile` instance. The hashes of written trees and files
+    are tracked so unchanged objects, e.g. the eclass tree shared by most
+    commits, are skipped on later updates.
+    """
+
+    def __init__(self, repo, git_objects):
         self.__parent_repo = repo
+        self.__git_objects = git_objects
         self.__tmpdir = TemporaryDirectory()
         self.__created = False
+        # mapping of written paths to their git object hashes
+        self.__written = {}
         repo_dir = self.__tmpdir.name
 
         # set up some basic repo files so pkgcore doesn't complain
@@ -199,21 +207,39 @@ class _RemovalRepo(UnconfiguredTree):
         self.__created = True
         return self
 
+    def _write_tree(self, tree_hash, path):
+        """Write the contents of a given tree object to a path."""
+        if self.__written.get(path) == tree_hash:
+            return
+        os.makedirs(path, exist_ok=True)
+        for mode, name, obj_hash in self.__git_objects.tree(tree_hash):
+            dest = pjoin(path, name)
+            if mode == '40000':
+                self._write_tree(obj_hash, dest)
+            elif mode != '160000' and self.__written.get(dest) != obj_hash:
+                _, _, data = self.__git_objects.get(obj_hash)
+                if os.path.lexists(dest):
+                    os.unlink(dest)
+                if mode == '120000':
+                    os.symlink(data, dest)
+                else:
+                    with open(dest, 'wb') as f:
+                        f.write(data)
+                self.__written[dest] = obj_hash
+        self.__written[path] = tree_hash
+
     def _populate(self, pkgs):
         """Populate the repo with a given sequence of historical packages."""
         pkg = pkgs[0]
         paths = [pjoin(pkg.category, pkg.package)]
         if os.path.exists(pjoin(self.__parent_repo.location, 'eclass')):
             paths.append('eclass')
-        old_files = subprocess.Popen(
-            ['git', 'archive', f'{pkg.commit}~1'] + paths,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            cwd=self.__parent_repo.location)
-        if old_files.poll():
-            error = old_files.stderr.read().decode().strip()
-            raise PkgcheckUserException(f'failed populating archive repo: {error}')
-        with tarfile.open(mode='r|', fileobj=old_files.stdout) as tar:
-            tar.extractall(path=self.location)
+        try:
+            for path in paths:
+                tree_hash, _, _ = self.__git_objects.get(f'{pkg.commit}~1:{path}')
+                self._write_tree(tree_hash, pjoin(self.location, path))
+        except git.GitError as e:
+            raise PkgcheckUserException(f'failed populating archive repo: {e}')
 
 
 class GitPkgCommitsCheck(GentooRepoCheck, GitCommitsCheck):
@@ -235,16 +261,18 @@ class GitPkgCommitsCheck(GentooRepoCheck, GitCommitsCheck):
         self.repo = self.options.target_repo
         self.valid_arches = self.options.target_repo.known_arches
         self._git_addon = git_addon
+        # git objects reader for populating historical package repos
+        self.git_objects = git.GitCatFile(self.repo.location)
 
     @klass.jit_attr
     def removal_repo(self):
         """Create a repository of packages removed from git."""
-        return _RemovalRepo(self.repo)
+        return _RemovalRepo(self.repo, self.git_objects)
 
     @klass.jit_attr
     def modified_repo(self):
         """Create a repository of old packages newly modified in git."""
-        return _RemovalRepo(self.repo)
+        return _RemovalRepo(self.repo, self.git_objects)
 
     @klass.jit_attr
     def added_repo(self):
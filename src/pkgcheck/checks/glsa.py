@@ -33,6 +33,7 @@ class GlsaCheck(GentooRepoCheck):
     Requires a GLSA directory for vulnerability info.
     """
 
+    cacheable = False
     known_results = frozenset([VulnerablePackage])
 
     @staticmethod
@@ -617,6 +617,7 @@ class MissingSlotDep(results.VersionResult, results.Warning):
 class MissingSlotDepCheck(Check):
     """Check for missing slot dependencies."""
 
+    cacheable = False
     # only run the check for EAPI 5 and above
     _source = (sources.RestrictionRepoSource, (
         packages.PackageRestriction('eapi', values.GetAttrRestriction(
@@ -743,6 +744,7 @@ class InvalidIdepend(results.MetadataError, results.VersionResult):
 class DependencyCheck(Check):
     """Verify dependency attributes (e.g. RDEPEND)."""
 
+    cacheable = False
     required_addons = (addons.UseAddon,)
     known_results = frozenset([
         BadDependency, MissingPackageRevision, MissingUseDepDefault,
@@ -875,6 +877,7 @@ class NonexistentBlocker(results.VersionResult, results.Warning):
 class OutdatedBlockersCheck(Check):
     """Check for outdated and nonexistent blocker dependencies."""
 
+    cacheable = False
     required_addons = (addons.git.GitAddon,)
     known_results = frozenset([OutdatedBlocker, NonexistentBlocker])
 
@@ -996,6 +999,7 @@ class VirtualKeywordsUpdate(results.VersionResult, results.Info):
 class KeywordsCheck(Check):
     """Check package keywords for sanity; empty keywords, and -* are flagged."""
 
+    cacheable = False
     required_addons = (addons.UseAddon, addons.KeywordsAddon)
     known_results = frozenset([
         BadKeywords, UnknownKeywords, OverlappingKeywords, DuplicateKeywords,
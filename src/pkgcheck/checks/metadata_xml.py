@@ -294,6 +294,7 @@ class InvalidRemoteID(results.PackageResult, results.Warning):
 class _XmlBaseCheck(Check):
     """Base class for metadata.xml scans."""
 
+    cacheable = False
     schema = None
 
     misformed_error = None
@@ -84,7 +84,7 @@ class PerlCheck(OptionalCheck):
             raise SkipCheck(self, str(e))
 
     def feed(self, pkg):
-        if mo := self.dist_version_re.search(''.join(pkg.lines)):
+        if mo := self.dist_version_re.search(pkg.content.text):
             dist_version = mo.group('dist_version')
             normalized = self.perl.normalize(dist_version)
             if normalized != pkg.version:
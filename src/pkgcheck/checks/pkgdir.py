@@ -332,6 +332,7 @@ class LiveOnlyPackage(results.PackageResult, results.Warning):
 class LiveOnlyCheck(GentooRepoCheck):
     """Scan for packages with only live versions."""
 
+    cacheable = False
     _source = sources.PackageRepoSource
     required_addons = (addons.git.GitAddon,)
     known_results = frozenset([LiveOnlyPackage])
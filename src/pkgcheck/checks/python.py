@@ -275,6 +275,7 @@ class PythonCompatCheck(Check):
     Supports ebuilds inheriting python-r1, python-single-r1, and python-any-r1.
     """
 
+    cacheable = False
     known_results = frozenset([PythonCompatUpdate])
 
     def __init__(self, *args):
@@ -2,6 +2,7 @@ import re
 from collections import defaultdict
 from difflib import SequenceMatcher
 from itertools import chain
+from operator import itemgetter
 
 from pkgcore import fetch
 from snakeoil.sequences import iflatten_instance
@@ -169,6 +170,7 @@ class UnusedLicensesCheck(RepoCheck):
 
     _source = sources.RepositoryRepoSource
     known_results = frozenset([UnusedLicenses])
+    mergeable = True
 
     def __init__(self, *args):
         super().__init__(*args)
@@ -184,6 +186,12 @@ class UnusedLicensesCheck(RepoCheck):
         self.unused_licenses.difference_update(iflatten_instance(pkg.license))
         yield from ()
 
+    def state(self):
+        return self.unused_licenses
+
+    def merge(self, state):
+        self.unused_licenses.intersection_update(state)
+
     def finish(self):
         if self.unused_licenses:
             yield UnusedLicenses(sorted(self.unused_licenses))
@@ -208,6 +216,7 @@ class UnusedMirrorsCheck(MirrorsCheck, RepoCheck):
 
     _source = sources.RepositoryRepoSource
     known_results = frozenset([UnusedMirrors])
+    mergeable = True
 
     def start(self):
         master_mirrors = set()
@@ -220,6 +229,12 @@ class UnusedMirrorsCheck(MirrorsCheck, RepoCheck):
             self.unused_mirrors.difference_update(self.get_mirrors(pkg))
         yield from ()
 
+    def state(self):
+        return self.unused_mirrors
+
+    def merge(self, state):
+        self.unused_mirrors.intersection_update(state)
+
     def finish(self):
         if self.unused_mirrors:
             yield UnusedMirrors(sorted(self.unused_mirrors))
@@ -244,6 +259,7 @@ class UnusedEclassesCheck(RepoCheck):
 
     _source = sources.RepositoryRepoSource
     known_results = frozenset([UnusedEclasses])
+    mergeable = True
 
     def __init__(self, *args):
         super().__init__(*args)
@@ -260,6 +276,12 @@ class UnusedEclassesCheck(RepoCheck):
         self.unused_eclasses.difference_update(pkg.inherited)
         yield from ()
 
+    def state(self):
+        return self.unused_eclasses
+
+    def merge(self, state):
+        self.unused_eclasses.intersection_update(state)
+
     def finish(self):
         if self.unused_eclasses:
             yield UnusedEclasses(sorted(self.unused_eclasses))
@@ -374,12 +396,16 @@ class GlobalUseCheck(RepoCheck):
     known_results = frozenset([
         PotentialLocalUse, PotentialGlobalUse, UnusedGlobalUse, UnusedGlobalUseExpand,
     ])
+    mergeable = True
 
     def __init__(self, *args, use_addon):
         super().__init__(*args)
-        self.global_flag_usage = defaultdict(set)
+        self.global_flag_usage = None
         self.repo = self.options.target_repo
 
+    def start(self):
+        self.global_flag_usage = defaultdict(set)
+
     def feed(self, pkgs):
         # ignore bad XML, it will be caught by metadata.xml checks
         local_use = set(pkgs[0].local_use.keys())
@@ -388,6 +414,13 @@ class GlobalUseCheck(RepoCheck):
                 self.global_flag_usage[flag].add(pkg.unversioned_atom)
         yield from ()
 
+    def state(self):
+        return dict(self.global_flag_usage)
+
+    def merge(self, state):
+        for flag, pkgs in state.items():
+            self.global_flag_usage[flag].update(pkgs)
+
     @staticmethod
     def _similar_flags(pkgs):
         """Yield groups of packages with similar local USE flag descriptions."""
@@ -650,7 +683,7 @@ class MatchingChksums(results.VersionResult, results.Warning):
         return msg
 
 
-class ManifestCollisionCheck(Check):
+class ManifestCollisionCheck(RepoCheck):
     """Search Manifest entries for different types of distfile collisions.
 
     In particular, search for matching filenames with different checksums and
@@ -659,21 +692,23 @@ class ManifestCollisionCheck(Check):
 
     _source = (sources.RepositoryRepoSource, (), (('source', sources.PackageRepoSource),))
     known_results = frozenset([ConflictingChksums, MatchingChksums])
+    mergeable = True
 
     def __init__(self, *args):
         super().__init__(*args)
-        self.seen_files = {}
-        self.seen_chksums = {}
+        self.distfiles = None
         # ignore go.mod false positives (issue #228)
         self._ignored_files_re = re.compile(r'^.*%2F@v.*\.mod$')
 
-    def _conflicts(self, pkg):
+    def start(self):
+        self.distfiles = []
+
+    def _conflicts(self, pkg, distfiles, seen_files):
         """Check for similarly named distfiles with different checksums."""
-        for filename, chksums in pkg.manifest.distfiles.items():
-            existing = self.seen_files.get(filename)
+        for filename, chksums in distfiles.items():
+            existing = seen_files.get(filename)
             if existing is None:
-                self.seen_files[filename] = (
-                    [pkg.key], dict(chksums.items()))
+                seen_files[filename] = ([pkg.key], dict(chksums))
                 continue
             seen_pkgs, seen_chksums = existing
             conflicting_chksums = []
@@ -688,13 +723,13 @@ class ManifestCollisionCheck(Check):
                 seen_chksums.update(chksums)
                 seen_pkgs.append(pkg.key)
 
-    def _matching(self, pkg):
+    def _matching(self, pkg, distfiles, seen_chksums):
         """Check for distfiles with matching checksums and different names."""
-        for filename, chksums in pkg.manifest.distfiles.items():
+        for filename, chksums in distfiles.items():
             key = tuple(chksums.values())
-            existing = self.seen_chksums.get(key)
+            existing = seen_chksums.get(key)
             if existing is None:
-                self.seen_chksums[key] = (pkg.key, filename)
+                seen_chksums[key] = (pkg.key, filename)
                 continue
             seen_pkg, seen_file = existing
             if seen_file == filename or self._ignored_files_re.match(filename):
@@ -703,8 +738,23 @@ class ManifestCollisionCheck(Check):
 
     def feed(self, pkgs):
         pkg = pkgs[0]
-        yield from self._conflicts(pkg)
-        yield from self._matching(pkg)
+        distfiles = {k: dict(v.items()) for k, v in pkg.manifest.distfiles.items()}
+        self.distfiles.append((pkg.versioned_atom, distfiles))
+        yield from ()
+
+    def state(self):
+        return self.distfiles
+
+    def merge(self, state):
+        self.distfiles.extend(state)
+
+    def finish(self):
+        seen_files = {}
+        seen_chksums = {}
+        # collisions are flagged against the first package in repo order
+        for pkg, distfiles in sorted(self.distfiles, key=itemgetter(0)):
+            yield from self._conflicts(pkg, distfiles, seen_files)
+            yield from self._matching(pkg, distfiles, seen_chksums)
 
 
 class EmptyProject(results.Warning):
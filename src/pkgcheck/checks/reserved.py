@@ -1,5 +1,5 @@
 import re
-from .. import addons, bash, results, sources
+from .. import addons, results, sources
 from . import Check
 
 
@@ -29,11 +29,11 @@ class _ReservedNameCheck(Check):
     def _feed(self, item):
         yield from self._check('function', {
             item.node_str(node.child_by_field_name('name')): node.start_point
-            for node, _ in bash.func_query.captures(item.tree.root_node)
+            for node in item.nodes('func')
         })
         yield from self._check('variable', {
             item.node_str(node.child_by_field_name('name')): node.start_point
-            for node, _ in bash.var_assign_query.captures(item.tree.root_node)
+            for node in item.nodes('assign')
         })
 
 
@@ -1,14 +1,16 @@
 from collections import defaultdict
+from itertools import chain
 from operator import attrgetter
 
-from pkgcore.ebuild.atom import atom, transitive_use_atom
+from pkgcore.ebuild.atom import atom
+from pkgcore.restrictions import boolean
 from snakeoil import klass
 from snakeoil.iterables import caching_iter
-from snakeoil.sequences import iflatten_func, iflatten_instance, stable_unique
+from snakeoil.sequences import iflatten_instance, stable_unique
 from snakeoil.strings import pluralism
 
 from .. import addons, feeds, results
-from . import Check
+from . import SplitCheck
 
 
 class FakeConfigurable:
@@ -73,26 +75,13 @@ class FakeConfigurable:
         raise AttributeError(self, 'is immutable')
 
 
-class _BlockMemoryExhaustion(Exception):
-    pass
+def visit_atoms(stream):
+    """Iterate over all atoms in a depset.
 
-
-# This is fast path code, hence the seperated implementations.
-if getattr(atom, '_TRANSITIVE_USE_ATOM_BUG_IS_FIXED', False):
-    def _eapi2_flatten(val):
-        return isinstance(val, atom) and not isinstance(val, transitive_use_atom)
-else:
-    def _eapi2_flatten(val):
-        if isinstance(val, transitive_use_atom):
-            if len([x for x in val.use if x.endswith("?")]) > 16:
-                raise _BlockMemoryExhaustion(val)
-        return isinstance(val, atom) and not isinstance(val, transitive_use_atom)
-
-
-def visit_atoms(pkg, stream):
-    if not pkg.eapi.options.transitive_use_atoms:
-        return iflatten_instance(stream, atom)
-    return iflatten_func(stream, _eapi2_flatten)
+    Transitive USE atoms aren't expanded into their conditional forms since
+    only the related versioned atoms are used for querying matches.
+    """
+    return iflatten_instance(stream, atom)
 
 
 class VisibleVcsPkg(results.VersionResult, results.Warning):
@@ -133,7 +122,11 @@ class NonexistentDeps(results.VersionResult, results.Warning):
 
 
 class UncheckableDep(results.VersionResult, results.Warning):
-    """Given dependency cannot be checked due to the number of transitive use deps in it."""
+    """Given dependency cannot be checked due to the number of transitive use deps in it.
+
+    No longer generated since depsets are solved without expanding transitive
+    use deps, kept for compatibility with existing result filters and caches.
+    """
 
     def __init__(self, attr, **kwargs):
         super().__init__(**kwargs)
@@ -189,14 +182,18 @@ class NonsolvableDepsInExp(NonsolvableDeps):
     _profile = 'exp'
 
 
-class VisibilityCheck(feeds.EvaluateDepSet, feeds.QueryCache, Check):
+class VisibilityCheck(feeds.EvaluateDepSet, feeds.QueryCache, SplitCheck):
     """Visibility dependency scans.
 
     Check that at least one solution is possible for a pkg, checking all
     profiles (defined by arch.list) visibility modifiers per stable/unstable
     keyword.
+
+    Expensive packages can be split into parts checking separate subsets of
+    profiles.
     """
 
+    cacheable = False
     required_addons = (addons.profiles.ProfileAddon,)
     known_results = frozenset([
         VisibleVcsPkg, NonexistentDeps, UncheckableDep,
@@ -211,13 +208,59 @@ class VisibilityCheck(feeds.EvaluateDepSet, feeds.QueryCache, Check):
             'dev': NonsolvableDepsInDev,
             'exp': NonsolvableDepsInExp,
         }
+        # profile visibility bitsets for packages pulled from the query cache
+        self.pkg_visibility = feeds.LRUCache(self.options.query_cache_size)
+        # profile bitsets of atoms that have been checked for visible matches
+        # and the subset that was found to be satisfiable
+        self.node_visibility = feeds.LRUCache(self.options.query_cache_size)
+        # loaded profiles the visibility caches are valid for
+        self._profile_bits = 0
+        # split run part and total number of parts
+        self._split = (0, 1)
+
+    def split(self, part, parts):
+        self._split = (part, parts)
+
+    def merge_split(self, results):
+        if self.options.verbosity > 0:
+            # verbose mode reports failures for each profile separately
+            yield from results
+            return
+
+        # collapse per part failures into one per depset per profile type
+        merged = {}
+        for result in results:
+            if not isinstance(result, NonsolvableDeps):
+                yield result
+                continue
+            key = (result.__class__, result.category, result.package,
+                   result.version, result.attr, result.deps)
+            if existing := merged.get(key):
+                num_profiles = existing.num_profiles + result.num_profiles
+                if (result.keyword, result.profile) > (existing.keyword, existing.profile):
+                    result = existing
+                result = result._create(**{**result._attrs, 'num_profiles': num_profiles})
+            merged[key] = result
+        yield from merged.values()
 
     def feed(self, pkg):
         super().feed(pkg)
 
+        # profiles may be loaded on demand, invalidating cached visibility
+        self.profiles.load(pkg.keywords)
+        if self._profile_bits != self.profiles.profile_bits:
+            self._profile_bits = self.profiles.profile_bits
+            self.pkg_visibility.clear()
+            self.node_visibility.clear()
+
+        if self._split[0]:
+            # other results are only generated by the first part
+            yield from self._check_depsets(pkg)
+            return
+
         # query_cache gets caching_iter partial repo searches shoved into it-
-        # reason is simple, it's likely that versions of this pkg probably
-        # use similar deps- so we're forcing those packages that were
+        # reason is simple, it's likely that versions of this pkg and other
+        # pkgs use similar deps- so we're forcing those packages that were
         # accessed for atom matching to remain in memory.
         # end result is less going to disk
 
@@ -225,42 +268,20 @@ class VisibilityCheck(feeds.EvaluateDepSet, feeds.QueryCache, Check):
             # vcs ebuild that better not be visible
             yield from self.check_visibility_vcs(pkg)
 
-        suppressed_depsets = []
         for attr in (x.lower() for x in pkg.eapi.dep_keys):
             nonexistent = set()
-            try:
-                for orig_node in visit_atoms(pkg, getattr(pkg, attr)):
-                    node = orig_node.no_usedeps
-                    if node not in self.query_cache:
-                        if node in self.profiles.global_insoluble:
-                            nonexistent.add(node)
-                            # insert an empty tuple, so that tight loops further
-                            # on don't have to use the slower get method
-                            self.query_cache[node] = ()
-                        else:
-                            matches = caching_iter(
-                                self.options.search_repo.itermatch(node))
-                            if matches:
-                                self.query_cache[node] = matches
-                                if orig_node is not node:
-                                    self.query_cache[str(orig_node)] = matches
-                            elif not node.blocks:
-                                nonexistent.add(node)
-                                self.query_cache[node] = ()
-                                self.profiles.global_insoluble.add(node)
-                    elif not self.query_cache[node]:
-                        nonexistent.add(node)
-
-            except _BlockMemoryExhaustion:
-                yield UncheckableDep(attr, pkg=pkg)
-                suppressed_depsets.append(attr)
+            for orig_node in visit_atoms(getattr(pkg, attr)):
+                node = orig_node.no_usedeps
+                if not self._query(node) and not node.blocks:
+                    nonexistent.add(node)
             if nonexistent:
                 nonexistent = map(str, sorted(nonexistent))
                 yield NonexistentDeps(attr.upper(), nonexistent, pkg=pkg)
 
+        yield from self._check_depsets(pkg)
+
+    def _check_depsets(self, pkg):
         for attr in (x.lower() for x in pkg.eapi.dep_keys):
-            if attr in suppressed_depsets:
-                continue
             depset = getattr(pkg, attr)
             profile_failures = defaultdict(lambda: defaultdict(set))
             for edepset, profiles in self.collapse_evaluate_depset(
@@ -297,9 +318,10 @@ class VisibilityCheck(feeds.EvaluateDepSet, feeds.QueryCache, Check):
 
     def check_visibility_vcs(self, pkg):
         visible = []
-        for profile in self.profiles:
-            if profile.visible(pkg):
-                visible.append(profile)
+        if visible_bits := self.profiles.visible_profiles(pkg):
+            visible = [
+                x for x in chain.from_iterable(self.profiles.profile_filters.values())
+                if x.bit & visible_bits]
 
         if visible:
             if self.options.verbosity > 0:
@@ -310,53 +332,126 @@ class VisibilityCheck(feeds.EvaluateDepSet, feeds.QueryCache, Check):
                 p = visible[0]
                 yield VisibleVcsPkg(p.key, p.name, len(visible), pkg=pkg)
 
-    def process_depset(self, pkg, attr, depset, edepset, profiles):
-        get_cached_query = self.query_cache.get
-
-        csolutions = []
-        for required in edepset.iter_cnf_solutions():
-            for node in required:
-                if node.blocks:
-                    break
+    def _query(self, node):
+        """Return the cached matches for an atom, searching the repo on misses."""
+        matches = self.query_cache.get(node)
+        if matches is None:
+            if node in self.profiles.global_insoluble:
+                # insert an empty tuple, so that tight loops further
+                # on don't have to iterate over empty searches
+                matches = ()
             else:
-                csolutions.append(required)
+                matches = caching_iter(self.options.search_repo.itermatch(node))
+                if not matches:
+                    matches = ()
+                    if not node.blocks:
+                        self.profiles.global_insoluble.add(node)
+            self.query_cache[node] = matches
+        return matches
+
+    def _visible_profiles(self, pkg):
+        """Return the cached bitset of profiles a package is visible in."""
+        try:
+            return self.pkg_visibility[pkg]
+        except KeyError:
+            visible = self.profiles.visible_profiles(pkg)
+            self.pkg_visibility[pkg] = visible
+            return visible
+
+    def _satisfied_profiles(self, node, bits, profiles):
+        """Return the bitset of profiles where an atom has a visible match.
+
+        Only the profiles in the given bitset are guaranteed to be resolved,
+        results are cached across packages.
+        """
+        checked, satisfied = self.node_visibility.get(node, (0, 0))
+        if not (pending := bits & ~checked):
+            return satisfied
+
+        src = self._query(node.no_usedeps)
+        if not checked:
+            satisfied = self.profiles.provided_profiles(node)
+        pending &= ~satisfied
+
+        if node.use:
+            # USE deps are resolved per profile, but only for profiles
+            # where a matching package is visible
+            for pkg in src:
+                if candidates := self._visible_profiles(pkg) & pending:
+                    for profile in profiles:
+                        if candidates & profile.bit and node.force_True(
+                                FakeConfigurable(pkg, profile)):
+                            satisfied |= profile.bit
+                            pending &= ~profile.bit
+                    if not pending:
+                        break
+            checked |= bits
+        else:
+            for pkg in src:
+                satisfied |= self._visible_profiles(pkg)
+            checked = self.profiles.profile_bits
+
+        self.node_visibility[node] = (checked, satisfied)
+        return satisfied
+
+    def _solve(self, restrict, bits, profiles):
+        """Resolve the solvability of a depset node across a profile bitset.
+
+        Returns the bitset of profiles where the node can't be satisfied along
+        with the unsatisfiable atoms and their related profile bitsets,
+        matching the unsatisfied clauses of the node's CNF form without
+        expanding it.
+        """
+        if isinstance(restrict, atom):
+            # blockers are ignored
+            if restrict.blocks:
+                return 0, []
+            unsolved = bits & ~self._satisfied_profiles(restrict, bits, profiles)
+            return unsolved, [(restrict, unsolved)] if unsolved else []
+
+        if isinstance(restrict, boolean.OrRestriction):
+            # empty groups have no clauses to satisfy
+            if not restrict.restrictions:
+                return 0, []
+            # profiles are only checked against later choices if all
+            # previous choices were unsatisfiable
+            unsolved = bits
+            failures = []
+            for x in restrict.restrictions:
+                unsolved, x_failures = self._solve(x, unsolved, profiles)
+                if not unsolved:
+                    return 0, []
+                failures.extend(x_failures)
+            return unsolved, [
+                (node, node_bits & unsolved) for node, node_bits in failures
+                if node_bits & unsolved]
+
+        unsolved = 0
+        failures = []
+        for x in restrict.restrictions:
+            x_unsolved, x_failures = self._solve(x, bits, profiles)
+            unsolved |= x_unsolved
+            failures.extend(x_failures)
+        return unsolved, failures
 
+    def process_depset(self, pkg, attr, depset, edepset, profiles):
+        part, parts = self._split
+        profile_bits = 0
         for profile in profiles:
-            failures = set()
-            # is it visible?  ie, is it masked?
-            # if so, skip it.
-            # long term, probably should do testing in the same respect we do
-            # for other visibility tiers
-            cache = profile.cache
-            provided = profile.provides_has_match
-            insoluble = profile.insoluble
-            visible = profile.visible
-            for required in csolutions:
-                # scan all of the quickies, the caches...
-                for node in required:
-                    if node in cache:
-                        break
-                    elif provided(node):
-                        break
-                else:
-                    for node in required:
-                        if node in insoluble:
-                            pass
-
-                        # get is required since there is an intermix between old style
-                        # virtuals and new style- thus the cache priming doesn't get
-                        # all of it.
-                        src = get_cached_query(node.no_usedeps, ())
-                        if node.use:
-                            src = (FakeConfigurable(pkg, profile) for pkg in src)
-                            src = (pkg for pkg in src if node.force_True(pkg))
-                        if any(visible(pkg) for pkg in src):
-                            cache.add(node)
-                            break
-                        else:
-                            insoluble.add(node)
-                    else:
-                        # no matches. not great, should collect them all
-                        failures.update(required)
-            if failures:
-                yield profile, failures
+            # Split runs check profiles interleaved by their index, stable and
+            # unstable profiles sharing an index use adjacent bits.
+            if parts == 1 or ((profile.bit.bit_length() - 1) // 2) % parts == part:
+                profile_bits |= profile.bit
+        if not profile_bits:
+            return
+
+        # Resolve the depset tree across all profiles at once, tracking the
+        # profiles where it's unsatisfiable.
+        unsolved, unsolved_nodes = self._solve(edepset, profile_bits, profiles)
+        if unsolved:
+            for profile in profiles:
+                if profile.bit & unsolved:
+                    failures = {
+                        node for node, bits in unsolved_nodes if bits & profile.bit}
+                    if failures:
+                        yield profile, failures
@@ -1,5 +1,9 @@
 """Feed functionality used by checks."""
 
+from collections import OrderedDict
+
+from snakeoil.cli import arghparse
+
 from . import base, sources
 
 
@@ -34,42 +38,79 @@ class Feed(base.Addon):
         yield from ()
 
 
+class LRUCache(OrderedDict):
+    """Size-bounded mapping discarding the least recently used entries.
+
+    Lookups via :meth:`get` and item access track hit and miss counts.
+    """
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, key):
+        try:
+            value = super().__getitem__(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if self.maxsize is not None and len(self) > self.maxsize:
+            self.popitem(last=False)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(size={len(self)}, maxsize={self.maxsize}, '
+            f'hits={self.hits}, misses={self.misses})')
+
+
 class QueryCache(Feed):
 
     @staticmethod
     def mangle_argparser(parser):
         group = parser.add_argument_group('query caching')
+        group.add_argument(
+            '--query-cache-size', dest='query_cache_size', type=arghparse.positive_int,
+            default=10000,
+            help='maximum number of cached package queries',
+            docs="""
+                Maximum number of dependency atom queries and their matching
+                packages to keep cached across the scan. Least recently used
+                entries are discarded when the limit is reached.
+            """)
         group.add_argument(
             '--reset-caching-per', dest='query_caching_freq',
             choices=('version', 'package', 'category'), default='package',
-            help='control how often the cache is cleared '
-                 '(version, package or category)')
-
-    @staticmethod
-    def _version(item):
-        return item
-
-    @staticmethod
-    def _package(item):
-        return item.key
-
-    @staticmethod
-    def _category(item):
-        return item.category
+            help='deprecated, query caching is controlled via --query-cache-size',
+            docs="""
+                Deprecated and ignored. The query cache is no longer cleared
+                periodically, its size is bounded via --query-cache-size
+                instead.
+            """)
 
     def __init__(self, options):
         super().__init__(options)
-        self.query_cache = {}
-        self._keyfunc = getattr(self, f'_{options.query_caching_freq}')
-        self._key = None
+        self.query_cache = LRUCache(options.query_cache_size)
 
-    def feed(self, item):
-        key = self._keyfunc(item)
-        # TODO: this should be logging debug info
-        if key != self._key:
-            self.query_cache.clear()
-            self._key = key
-        super().feed(item)
+    def cache_stats(self):
+        """Yield descriptions of the size and hit counts of all used LRU caches."""
+        for name, cache in vars(self).items():
+            if isinstance(cache, LRUCache):
+                yield f'{self.__class__.__name__}: {name}: {cache!r}'
 
 
 class EvaluateDepSet(Feed):
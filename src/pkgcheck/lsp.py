@@ -0,0 +1,322 @@
+"""Language server support for scanning open ebuilds and eclasses.
+
+Diagnostics are split by the inputs of the checks generating them. Checks
+fed ebuild or eclass file contents and their parse trees are rerun against
+the edited buffer on every change, with parse trees updated incrementally.
+All other checks depend on on-disk package data so their results are only
+regenerated when the buffer is opened or saved.
+"""
+
+import json
+import os
+import re
+import traceback
+from collections import defaultdict
+from copy import copy
+from urllib.parse import unquote, urlparse
+
+from . import __version__, base, sources
+from .addons.eclass import Eclass
+from .api import Scanner
+from .checks import init_checks
+from .log import logger
+from .packages import EbuildContent
+from .scripts.pkgcheck_scan import generate_restricts
+
+# sources feeding checks the contents of scanned files
+_content_sources = frozenset([
+    sources.EbuildFileRepoSource,
+    sources.EbuildParseRepoSource,
+    sources.EclassParseRepoSource,
+])
+
+# diagnostic severity levels for result levels
+_severity = {'error': 1, 'warning': 2, 'style': 3, 'info': 3}
+
+
+class Document:
+    """Open text document tracking edits to its parse tree.
+
+    Positions are tracked as byte offsets with LSP positions converted from
+    the negotiated encoding.
+    """
+
+    def __init__(self, path, text, encoding='utf-16'):
+        self.path = path
+        self.encoding = encoding
+        self.data = text.encode()
+        self._line_offsets()
+        # parsed object fed to checks, updated in place on edits
+        self.parsed = None
+        # related package object or eclass
+        self.target = None
+        # results from checks using on-disk data
+        self.saved_results = []
+
+    def _line_offsets(self):
+        """Determine the starting byte offsets for all lines."""
+        self.lines = [0] + [m.end() for m in re.finditer(b'\n', self.data)]
+
+    def _offset(self, position):
+        """Return the byte offset and tree-sitter point for a given position."""
+        row = min(position['line'], len(self.lines) - 1)
+        start = self.lines[row]
+        end = self.lines[row + 1] if row + 1 < len(self.lines) else len(self.data)
+        line = self.data[start:end]
+        character = position['character']
+        if self.encoding == 'utf-8':
+            col = min(character, len(line))
+        else:
+            # convert UTF-16 code units to a byte column
+            col = units = 0
+            for char in line.decode(errors='replace'):
+                if units >= character:
+                    break
+                units += 2 if ord(char) > 0xFFFF else 1
+                col += len(char.encode())
+        return start + col, (row, col)
+
+    def change(self, changes):
+        """Apply content changes, returning related tree-sitter edits.
+
+        Returns None if the full document was replaced.
+        """
+        edits = []
+        for change in changes:
+            new = change['text'].encode()
+            if 'range' not in change:
+                self.data = new
+                self._line_offsets()
+                edits = None
+                continue
+            start, start_point = self._offset(change['range']['start'])
+            end, end_point = self._offset(change['range']['end'])
+            self.data = self.data[:start] + new + self.data[end:]
+            self._line_offsets()
+            if edits is not None:
+                if rows := new.count(b'\n'):
+                    new_end_point = (start_point[0] + rows, len(new) - new.rindex(b'\n') - 1)
+                else:
+                    new_end_point = (start_point[0], start_point[1] + len(new))
+                edits.append((
+                    start, end, start + len(new), start_point, end_point, new_end_point))
+        return edits
+
+
+class Server:
+    """Language server publishing diagnostics for open documents.
+
+    Messages are read from and written to given binary streams using the
+    base protocol's header framing. Options, addons, and checks are
+    initialized once and reused for all documents.
+    """
+
+    def __init__(self, args, instream, outstream):
+        self.scanner = Scanner(args)
+        self._in = instream
+        self._out = outstream
+        # options used to initialize checks
+        self._options = None
+        # checks fed file contents, mapped by source
+        self._checks = {}
+        # keywords generated by checks fed file contents
+        self._keywords = frozenset()
+        self._documents = {}
+        self._encoding = 'utf-16'
+        # whether a shutdown request was received
+        self._stopped = False
+
+    def _init_checks(self):
+        """Initialize checks fed file contents, reusing the scanner's addons."""
+        self._options = self.scanner.options
+        options = copy(self._options)
+        checks = [
+            x for x in options.enabled_checks
+            if getattr(x, '_source', None) in _content_sources]
+        self._checks = defaultdict(list)
+        enabled = init_checks(
+            base.get_addons(checks), options, None, addons_map=self.scanner._addons)
+        for check in (x for v in enabled.values() for x in v):
+            if check._source in _content_sources:
+                self._checks[check._source].append(check)
+        self._keywords = frozenset().union(
+            *(x.known_results for v in self._checks.values() for x in v))
+
+    def _read(self):
+        """Read a message, returning None when the input stream is closed."""
+        length = None
+        while line := self._in.readline():
+            if not (line := line.strip()):
+                if length is None:
+                    continue
+                return json.loads(self._in.read(length))
+            name, _, value = line.decode().partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return None
+
+    def _write(self, **message):
+        """Write a message."""
+        data = json.dumps({'jsonrpc': '2.0', **message}).encode()
+        self._out.write(f'Content-Length: {len(data)}\r\n\r\n'.encode() + data)
+        self._out.flush()
+
+    def run(self):
+        """Handle messages until exiting, returning the exit status."""
+        while (message := self._read()) is not None:
+            method = message.get('method')
+            if method == 'exit':
+                break
+            handler = getattr(self, '_on_' + (method or '').replace('/', '_'), None)
+            try:
+                if handler is None:
+                    if 'id' in message and method is not None:
+                        self._write(id=message['id'], error={
+                            'code': -32601, 'message': f'unsupported method: {method}'})
+                    continue
+                result = handler(message.get('params') or {})
+            except Exception as e:
+                logger.error('failed handling %s: %s', method, traceback.format_exc())
+                if 'id' in message:
+                    self._write(id=message['id'], error={'code': -32603, 'message': str(e)})
+                continue
+            if 'id' in message:
+                self._write(id=message['id'], result=result)
+        return 0 if self._stopped else 1
+
+    def _on_initialize(self, params):
+        encodings = params.get('capabilities', {}).get('general', {}).get('positionEncodings', ())
+        if 'utf-8' in encodings:
+            self._encoding = 'utf-8'
+        return {
+            'capabilities': {
+                'positionEncoding': self._encoding,
+                # incremental document syncing
+                'textDocumentSync': {'openClose': True, 'change': 2, 'save': True},
+            },
+            'serverInfo': {'name': 'pkgcheck', 'version': __version__},
+        }
+
+    def _on_initialized(self, params):
+        pass
+
+    def _on_shutdown(self, params):
+        self._stopped = True
+
+    def _on_textDocument_didOpen(self, params):
+        item = params['textDocument']
+        path = unquote(urlparse(item['uri']).path)
+        doc = self._documents[item['uri']] = Document(path, item['text'], self._encoding)
+        self._scan_saved(doc)
+        self._publish(item['uri'], doc)
+
+    def _on_textDocument_didChange(self, params):
+        uri = params['textDocument']['uri']
+        if (doc := self._documents.get(uri)) is None:
+            return
+        edits = doc.change(params['contentChanges'])
+        if doc.parsed is not None:
+            if edits is None:
+                doc.parsed = self._parse(doc)
+            else:
+                doc.parsed.edit(doc.data, edits)
+        self._publish(uri, doc)
+
+    def _on_textDocument_didSave(self, params):
+        uri = params['textDocument']['uri']
+        if (doc := self._documents.get(uri)) is not None:
+            self._scan_saved(doc)
+            self._publish(uri, doc)
+
+    def _on_textDocument_didClose(self, params):
+        uri = params['textDocument']['uri']
+        if self._documents.pop(uri, None) is not None:
+            self._write(
+                method='textDocument/publishDiagnostics',
+                params={'uri': uri, 'diagnostics': []})
+
+    def _parse(self, doc):
+        """Create the parsed object fed to checks for a document."""
+        if isinstance(doc.target, Eclass):
+            return sources._ParsedEclass(doc.data, eclass=doc.target)
+        return sources._ParsedPkg(doc.data, pkg=doc.target)
+
+    def _scan_saved(self, doc):
+        """Scan a document's on-disk data, updating its related target."""
+        doc.target = doc.parsed = None
+        doc.saved_results = []
+        repo = self.scanner.options.target_repo
+        if not os.path.exists(doc.path) or doc.path not in repo:
+            return
+
+        try:
+            scope, restrict = next(generate_restricts(repo, [doc.path]))
+            results = list(self.scanner.scan([doc.path]))
+        except base.PkgcheckException as e:
+            logger.warning('failed scanning %r: %s', doc.path, e)
+            return
+        if self.scanner.options is not self._options:
+            self._init_checks()
+
+        if scope == base.eclass_scope:
+            doc.target = Eclass(restrict, doc.path)
+        elif scope == base.version_scope:
+            for pkg in repo.itermatch(restrict):
+                doc.target = pkg
+        if doc.target is not None:
+            doc.parsed = self._parse(doc)
+            # results for file contents are regenerated from the buffer
+            results = [x for x in results if x.__class__ not in self._keywords]
+        doc.saved_results = results
+
+    def _scan_content(self, doc):
+        """Run checks fed file contents against a document's buffer."""
+        if doc.target is None:
+            return []
+        if isinstance(doc.target, Eclass):
+            items = {sources.EclassParseRepoSource: doc.parsed}
+        else:
+            items = {
+                sources.EbuildFileRepoSource: sources._SourcePkg(
+                    doc.target, EbuildContent(doc.data)),
+                sources.EbuildParseRepoSource: doc.parsed,
+            }
+        results = []
+        for source, item in items.items():
+            for check in self._checks.get(source, ()):
+                try:
+                    results.extend(check.feed(item))
+                except Exception:
+                    logger.warning(
+                        '%s failed on %r: %s', check.__class__.__name__,
+                        doc.path, traceback.format_exc())
+        return results
+
+    def _diagnostic(self, result, line):
+        return {
+            'range': {
+                'start': {'line': line, 'character': 0},
+                'end': {'line': line + 1, 'character': 0},
+            },
+            'severity': _severity.get(result.level, 3),
+            'code': result.name,
+            'source': 'pkgcheck',
+            'message': result.desc,
+        }
+
+    def _publish(self, uri, doc):
+        """Publish diagnostics for a document."""
+        diagnostics = []
+        results = doc.saved_results + self._scan_content(doc)
+        for result in results:
+            if result._filtered or result.__class__ not in self.scanner.options.filtered_keywords:
+                continue
+            if lineno := getattr(result, 'lineno', None):
+                lines = [lineno]
+            else:
+                lines = [x for x in getattr(result, 'lines', ()) if isinstance(x, int)] or [1]
+            for lineno in lines:
+                diagnostics.append(self._diagnostic(result, lineno - 1))
+        self._write(
+            method='textDocument/publishDiagnostics',
+            params={'uri': uri, 'diagnostics': diagnostics})
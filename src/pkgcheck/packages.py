@@ -1,5 +1,6 @@
 """Various custom package objects."""
 
+import io
 from dataclasses import dataclass, field
 from functools import total_ordering
 
@@ -53,6 +54,35 @@ class RawCPV:
         return f'<{self.__class__.__name__} cpv={self.versioned_atom.cpvstr!r} {address}>'
 
 
+class EbuildContent:
+    """Ebuild file contents read once and shared between package views.
+
+    The raw data is used as is for parse trees while decoded lines are only
+    generated on first access, matching those from text file reads.
+    """
+
+    __slots__ = ('data', '_text', '_lines')
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def read(cls, pkg):
+        """Read the ebuild contents for a given package."""
+        with pkg.ebuild.bytes_fileobj() as f:
+            return cls(f.read())
+
+    @klass.jit_attr
+    def text(self):
+        """Decoded text with universal newlines translated."""
+        return self.data.decode('utf8').replace('\r\n', '\n').replace('\r', '\n')
+
+    @klass.jit_attr
+    def lines(self):
+        """Decoded lines."""
+        return tuple(io.StringIO(self.text, newline='\n'))
+
+
 @total_ordering
 class WrappedPkg:
     """Generic package wrapper used to inject attributes into package objects."""
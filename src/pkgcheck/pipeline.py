@@ -1,17 +1,137 @@
 """Pipeline that parallelizes check running."""
 
+import logging
 import multiprocessing
 import os
+import pickle
 import signal
+import time
 import traceback
 from collections import defaultdict, deque
 from concurrent.futures import ThreadPoolExecutor
-from itertools import chain
-from operator import attrgetter
+from dataclasses import dataclass
+from itertools import chain, groupby, islice
+from math import ceil
+from operator import attrgetter, itemgetter
+from statistics import mean
 
-from . import base
+from pkgcore.ebuild.atom import atom as atom_cls
+from pkgcore.restrictions import packages
+from snakeoil import klass
+from snakeoil.compatibility import IGNORED_EXCEPTIONS
+from snakeoil.fileutils import AtomicWriteFile
+from snakeoil.osutils import pjoin
+
+from . import base, tracing
+from .addons import init_addon
+from .addons.caches import ResultsCache, repo_cache_dir
 from .checks import init_checks
-from .sources import UnversionedSource, VersionedSource
+from .feeds import QueryCache
+from .log import logger
+from .sources import UnversionedSource, VersionedSource, shared_matches
+from .timings import Timings
+from .transport import SharedMemoryQueue
+
+
+class WorkCosts:
+    """Historical wall time statistics for scanning work units.
+
+    Costs are tracked per package (or other restriction) and checkrunner in
+    order to schedule work longest-expected-first, so pathological packages
+    are started early instead of bounding the tail end of a scan. Costs for
+    versioned work are shared by all versions of a package so they're kept
+    across version bumps.
+    """
+
+    # stats file format version
+    version = 2
+
+    def __init__(self, options):
+        self.path = pjoin(
+            repo_cache_dir(options.cache_dir, options.target_repo), 'costs.pickle')
+        self._costs = {}
+        # costs measured during the current scan
+        self._measured = {}
+        # full repo scans replace all costs, dropping those for removed work
+        self._full_scan = options.restrictions == [(base.repo_scope, packages.AlwaysTrue)]
+
+        try:
+            with open(self.path, 'rb') as f:
+                version, costs = pickle.load(f)
+            if version == self.version:
+                self._costs = costs
+        except IGNORED_EXCEPTIONS:
+            raise
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug('ignoring invalid work costs file: %s', e)
+
+    @staticmethod
+    def key(restrict, runner_key):
+        """Return the costs key for a given restriction and checkrunner key."""
+        if isinstance(restrict, atom_cls):
+            return restrict.key, runner_key
+        return str(restrict), runner_key
+
+    @klass.jit_attr
+    def _runner_means(self):
+        """Mapping of runner keys to their mean work cost."""
+        runner_costs = defaultdict(list)
+        for (_restrict, runner_key), cost in self._costs.items():
+            runner_costs[runner_key].append(cost)
+        return {k: mean(v) for k, v in runner_costs.items()}
+
+    def expected(self, restrict, runners):
+        """Return the expected cost of running the given runners against a restriction."""
+        return sum(
+            self._costs.get(self.key(restrict, r.key), self._runner_means.get(r.key, 0))
+            for r in runners)
+
+    def update(self, costs):
+        """Merge work costs measured by a worker process."""
+        for key, cost in costs.items():
+            self._measured[key] = max(cost, self._measured.get(key, 0))
+
+    def save(self):
+        """Push updated costs to disk."""
+        if not self._measured:
+            return
+        if self._full_scan:
+            costs = self._measured
+        else:
+            costs = {**self._costs, **self._measured}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with AtomicWriteFile(self.path, binary=True) as f:
+                pickle.dump((self.version, costs), f, protocol=-1)
+        except IOError as e:
+            logger.warning('failed dumping work costs: %r: %s', self.path, e.strerror)
+
+
+@dataclass(frozen=True)
+class _ShardStates:
+    """Partial check states from running a sharded checkrunner on a shard."""
+    # work item identifier for the checkrunner
+    runner: tuple
+    states: list
+
+
+@dataclass(frozen=True)
+class _CacheStats:
+    """Query cache stats from a worker process."""
+    stats: list
+
+
+@dataclass(frozen=True)
+class _UnitPart:
+    """Results from running one part of a split work unit."""
+    # total number of parts for the work unit
+    parts: int
+    # results from runners that weren't split
+    results: list
+    # partial results from split checkrunners keyed by their work item identifier
+    split_results: dict
 
 
 class Pipeline:
@@ -21,38 +141,82 @@ class Pipeline:
     exception traceback strings. This iterator forces exceptions to be handled
     explicitly by outputting the serialized traceback and signaling the process
     group to end when an exception is raised.
+
+    Work units are numbered in queued order and workers push the sorted
+    results for each unit as tuples of sequence numbers and results lists.
+    Results are output in unit order as soon as all earlier units complete,
+    buffering only those for units finished out of order.
+
+    Repo checks supporting partial state merging are fed over per-category
+    shards in parallel with their partial states pushed into the results queue,
+    which are merged to finish the checks once all shards are done.
+
+    Work units for checks supporting split runs that are expected to be
+    expensive are split into multiple parts run in parallel, with the results
+    of all parts merged before being output in unit order.
     """
 
-    def __init__(self, options):
+    # maximum number of work units per queued chunk
+    _chunk_size = 16
+    # targeted expected wall time (in seconds) per queued chunk
+    _chunk_cost = 0.1
+    # targeted expected wall time (in seconds) per part of split work units
+    _split_cost = 0.5
+
+    def __init__(self, options, addons_map=None):
         self.options = options
         # results flagged as errors by the --exit option
         self.errors = []
 
+        # timeline tracing is enabled first to include addon initialization
+        if self.options.trace is not None:
+            tracing.start(self.options.trace)
+
         # pkgcheck currently requires the fork start method (#254)
         self._mp_ctx = multiprocessing.get_context('fork')
-        self._results_q = self._mp_ctx.SimpleQueue()
+        if self.options.transport == 'shm':
+            # ring buffers for all worker processes, the async check
+            # process, and the pipeline process
+            self._results_q = SharedMemoryQueue(self._mp_ctx, self.options.jobs + 2)
+        else:
+            self._results_q = self._mp_ctx.SimpleQueue()
+
+        # historical work costs used for scheduling
+        if self.options.schedule == 'cost':
+            self._costs = WorkCosts(self.options)
+        else:
+            self._costs = None
+
+        # Wall time statistics, checkrunners record into their process-local
+        # copies which are sent back and merged here when workers finish.
+        self.timings = Timings() if self.options.timings is not None else None
 
         # create checkrunners
-        self._pipes = self._create_runners()
+        self._pipes = self._create_runners(addons_map)
 
         # initialize settings used by iterator support
         self._runner = self._mp_ctx.Process(target=self._run)
         signal.signal(signal.SIGINT, self._kill_pipe)
-        self._results_iter = iter(self._results_q.get, None)
+        self._results_iter = iter(
+            tracing.traced(self._results_q.get, 'get', 'results queue'), None)
         self._results = deque()
+        # results for work units completed out of order
+        self._pending = {}
+        # sequence number of the next work unit to output
+        self._next_seq = 0
+        # partial check states from sharded repo checkrunners
+        self._shard_states = defaultdict(list)
+        # parts received for split work units
+        self._unit_parts = defaultdict(list)
 
         if self.options.pkg_scan:
-            # package level scans sort all returned results
+            # package level scans sort all returned results for the package
             self._ordered_results = {
                 scope: [] for scope in base.scopes.values()
                 if scope >= base.package_scope
             }
         else:
-            # scoped mapping for caching repo and location specific results
-            self._ordered_results = {
-                scope: [] for scope in reversed(list(base.scopes.values()))
-                if scope <= base.repo_scope
-            }
+            self._ordered_results = {}
 
     def _filter_checks(self, scope):
         """Verify check scope against given scope to determine activation."""
@@ -75,14 +239,20 @@ class Pipeline:
                 # package level.
                 yield check
 
-    def _create_runners(self):
+    def _create_runners(self, addons_map=None):
         """Initialize and categorize checkrunners for results pipeline."""
         pipes = {'async': [], 'sync': []}
 
         # use addon/source caches to avoid re-initializing objects
-        addons_map = {}
+        if addons_map is None:
+            addons_map = {}
         source_map = {}
 
+        # persistent results cache shared by all sync checkrunners
+        results_cache = None
+        if self.options.cache.get(ResultsCache.cache.type):
+            results_cache = init_addon(ResultsCache, self.options, addons_map)
+
         for scope, restriction in self.options.restrictions:
             # initialize enabled checks
             addons = list(base.get_addons(self._filter_checks(scope)))
@@ -98,7 +268,10 @@ class Pipeline:
             # scan and source scope.
             runners = {'async': defaultdict(list), 'sync': defaultdict(list)}
             for (source, runner_cls), check_objs in checks.items():
-                runner = runner_cls(self.options, source, check_objs)
+                kwargs = {'timings': self.timings}
+                if runner_cls.type == 'sync':
+                    kwargs['results_cache'] = results_cache
+                runner = runner_cls(self.options, source, check_objs, **kwargs)
                 if not self.options.pkg_scan and source.scope >= base.package_scope:
                     runners[runner_cls.type][base.package_scope].append(runner)
                 else:
@@ -114,6 +287,8 @@ class Pipeline:
         """Handle terminating the pipeline process group."""
         if self._runner.is_alive():
             os.killpg(self._runner.pid, signal.SIGKILL)
+        # output events traced by the main process
+        tracing.finish()
         if error is not None:
             # propagate exception raised during parallel scan
             raise base.PkgcheckUserException(error)
@@ -137,8 +312,12 @@ class Pipeline:
                     results = next(self._results_iter)
                 except StopIteration:
                     if self._ordered_results is None:
+                        tracing.finish()
                         raise
                     self._runner.join()
+                    if self._costs is not None:
+                        self._costs.save()
+                    self._finish_shards()
                     # output cached results in registered order
                     results = chain.from_iterable(map(sorted, self._ordered_results.values()))
                     self._results.extend(results)
@@ -150,14 +329,83 @@ class Pipeline:
                 if isinstance(results, str):
                     self._kill_pipe(error=results.strip())
 
-                # cache registered result scopes to forcibly order output
-                try:
-                    self._ordered_results[results[0].scope].extend(results)
-                except KeyError:
-                    self._results.extend(results)
+                # merge work costs measured by a worker process
+                if isinstance(results, dict):
+                    self._costs.update(results)
+                    continue
 
-    def _queue_work(self, sync_pipes, work_q):
-        """Producer that queues scanning tasks against granular scope restrictions."""
+                # merge wall time statistics collected by a worker process
+                if isinstance(results, Timings):
+                    self.timings.update(results)
+                    continue
+
+                # log query cache stats collected by a worker process
+                if isinstance(results, _CacheStats):
+                    for stats in results.stats:
+                        logger.debug(stats)
+                    continue
+
+                # collect partial check states for a sharded checkrunner
+                if isinstance(results, _ShardStates):
+                    self._shard_states[results.runner].append(results.states)
+                    continue
+
+                # output results for work units in order
+                if isinstance(results, tuple):
+                    for seq, unit_results in results:
+                        if isinstance(unit_results, _UnitPart):
+                            unit_results = self._merge_parts(seq, unit_results)
+                            if unit_results is None:
+                                continue
+                        self._pending[seq] = unit_results
+                    while self._next_seq in self._pending:
+                        self._queue_results(self._pending.pop(self._next_seq))
+                        self._next_seq += 1
+                    continue
+
+                # unordered results from asynchronous checks
+                self._queue_results(results)
+
+    def _queue_results(self, results):
+        """Queue sorted results for output."""
+        # Cache registered result scopes to forcibly order output, note
+        # that chunked work can return results for multiple scopes.
+        for scope, scope_results in groupby(results, attrgetter('scope')):
+            try:
+                self._ordered_results[scope].extend(scope_results)
+            except KeyError:
+                self._results.extend(scope_results)
+
+    def _merge_parts(self, seq, part):
+        """Merge the results for a split work unit once all its parts are done."""
+        parts = self._unit_parts[seq]
+        parts.append(part)
+        if len(parts) < part.parts:
+            return None
+        del self._unit_parts[seq]
+
+        results = []
+        split_results = defaultdict(list)
+        for part in parts:
+            results.extend(part.results)
+            for key, runner_results in part.split_results.items():
+                split_results[key].extend(runner_results)
+        for (i, scope, j), runner_results in split_results.items():
+            runner = self._pipes['sync'][i][-1][scope][j]
+            results.extend(runner.merge_split(runner_results))
+        return sorted(results)
+
+    def _finish_shards(self):
+        """Finish sharded checkrunners by merging their partial check states."""
+        for i, (_scan_scope, _restriction, pipes) in enumerate(self._pipes['sync']):
+            for scope, runners in pipes.items():
+                for j, runner in enumerate(runners):
+                    if runner.mergeable:
+                        states = self._shard_states[(i, scope, j)]
+                        self._queue_results(sorted(runner.merge(states)))
+
+    def _iter_work(self, sync_pipes):
+        """Generate scanning tasks against granular scope restrictions."""
         versioned_source = VersionedSource(self.options)
         unversioned_source = UnversionedSource(self.options)
 
@@ -167,39 +415,182 @@ class Pipeline:
                 if base.version_scope in (scope, scan_scope):
                     for restrict in versioned_source.itermatch(restriction):
                         for j in range(num_runners):
-                            work_q.put((scope, restrict, i, [j]))
+                            yield scope, restrict, i, [j]
                 elif scope == base.package_scope:
                     for restrict in unversioned_source.itermatch(restriction):
-                        work_q.put((scope, restrict, i, range(num_runners)))
+                        yield scope, restrict, i, range(num_runners)
                 else:
-                    for j in range(num_runners):
-                        work_q.put((scope, restriction, i, [j]))
+                    for j, runner in enumerate(runners):
+                        if runner.mergeable:
+                            for shard in runner.shards(restriction):
+                                yield scope, shard, i, [j]
+                        else:
+                            yield scope, restriction, i, [j]
+
+    def _chunk_work(self, work):
+        """Group work units into chunks to amortize queue transport overhead.
+
+        Chunks are closed when they reach a maximum number of units or, if
+        historical costs are known, once their expected cost exceeds the
+        targeted chunk cost so expensive work isn't serialized. The number of
+        units per chunk is scaled down for smaller scans so work is still
+        spread across all processes, determined using a bounded lookahead
+        instead of generating all work upfront.
+        """
+        lookahead = self.options.jobs * 4
+        work = iter(work)
+        buffered = list(islice(work, lookahead * self._chunk_size))
+        chunk_size = max(1, min(self._chunk_size, len(buffered) // lookahead))
+        work = chain(buffered, work)
+
+        chunk = []
+        chunk_cost = 0
+        for cost, unit in work:
+            chunk.append(unit)
+            chunk_cost += cost
+            if len(chunk) >= chunk_size or chunk_cost >= self._chunk_cost:
+                yield chunk
+                chunk = []
+                chunk_cost = 0
+        if chunk:
+            yield chunk
+
+    def _split_work(self, sync_pipes, work):
+        """Split expensive work units into parts, yielding their expected costs.
+
+        Work items are extended with the split specification for the unit
+        consisting of the part index, the total number of parts, and the
+        checkrunners that are split. The first part runs all of the unit's
+        checkrunners while later parts only run split checkrunners.
+        """
+        for seq, scope, restrict, i, runners in work:
+            pipes = sync_pipes[i][-1][scope]
+            costs = {j: self._costs.expected(restrict, (pipes[j],)) for j in runners}
+            split = tuple(
+                j for j in runners
+                if pipes[j].splittable and costs[j] > self._split_cost)
+            if split:
+                split_cost = sum(costs[j] for j in split)
+                max_cost = max(costs[j] for j in split)
+                parts = min(self.options.jobs, ceil(max_cost / self._split_cost))
+            if not split or parts < 2:
+                yield sum(costs.values()), (seq, scope, restrict, i, runners, None)
+                continue
+
+            unsplit_cost = sum(costs.values()) - split_cost
+            yield unsplit_cost + split_cost / parts, (
+                seq, scope, restrict, i, runners, (0, parts, split))
+            for part in range(1, parts):
+                yield split_cost / parts, (seq, scope, restrict, i, split, (part, parts, split))
+
+    def _queue_work(self, sync_pipes, work_q):
+        """Producer that queues chunks of scanning tasks in scheduled order."""
+        # number units in generation order
+        work = ((seq,) + unit for seq, unit in enumerate(self._iter_work(sync_pipes)))
+
+        if self._costs is not None:
+            # longest processing time first scheduling using historical costs
+            work = sorted(
+                self._split_work(sync_pipes, work), key=itemgetter(0), reverse=True)
+            # renumber units in queued order so results are output in a
+            # deterministic order for given costs while only buffering
+            # results for units finished out of order
+            seqs = {}
+            work = [
+                (cost, (seqs.setdefault(unit[0], len(seqs)),) + unit[1:])
+                for cost, unit in work]
+        else:
+            work = ((0, unit + (None,)) for unit in work)
+
+        put = tracing.traced(work_q.put, 'put', 'work queue')
+        for chunk in self._chunk_work(work):
+            put(chunk)
 
         # notify consumers that no more work exists
         for i in range(self.options.jobs):
             work_q.put(None)
 
     def _run_checks(self, pipes, work_q):
-        """Consumer that runs scanning tasks, queuing results for output."""
+        """Consumer that runs chunks of scanning tasks, queuing results for output."""
         try:
-            for scope, restrict, i, runners in iter(work_q.get, None):
-                if results := sorted(chain.from_iterable(
-                        pipes[i][-1][scope][j].run(restrict) for j in runners)):
-                    self._results_q.put(results)
+            if tracing.tracer is not None:
+                tracing.tracer.process('worker')
+            get = tracing.traced(work_q.get, 'get', 'work queue')
+            put = tracing.traced(self._results_q.put, 'put', 'results queue')
+            # measured wall time per restriction and checkrunner
+            costs = {} if self._costs is not None else None
+            for chunk in iter(get, None):
+                chunk_results = []
+                for seq, scope, restrict, i, runners, split in chunk:
+                    results = []
+                    split_results = {}
+                    for j in runners:
+                        runner = pipes[i][-1][scope][j]
+                        start = time.monotonic()
+                        if runner.mergeable:
+                            shard_results, states = runner.run_shard(restrict)
+                            results.extend(shard_results)
+                            put(_ShardStates((i, scope, j), states))
+                        elif split is not None and j in split[2]:
+                            part, parts, _ = split
+                            split_results[(i, scope, j)] = runner.run_split(restrict, part, parts)
+                        else:
+                            results.extend(runner.run(restrict))
+                        if costs is not None:
+                            cost = time.monotonic() - start
+                            if (i, scope, j) in split_results:
+                                # estimate the total cost of split runs
+                                cost *= split[1]
+                            key = WorkCosts.key(restrict, runner.key)
+                            costs[key] = max(cost, costs.get(key, 0))
+                    # drop package matches shared by the unit's runners
+                    shared_matches.clear()
+                    if split is None:
+                        chunk_results.append((seq, sorted(results)))
+                    else:
+                        chunk_results.append((seq, _UnitPart(split[1], results, split_results)))
+                # flush results per chunk, including empty units to allow
+                # later units to be output
+                put(tuple(chunk_results))
+            # worker log output is lost on exit so stats are logged by the parent
+            if logger.isEnabledFor(logging.DEBUG):
+                self._results_q.put(self._cache_stats(pipes))
+            if costs:
+                self._results_q.put(costs)
+            if self.timings:
+                self._results_q.put(self.timings)
+            if tracing.tracer is not None:
+                tracing.tracer.flush()
         except Exception:  # pragma: no cover
             # traceback can't be pickled so serialize it
             tb = traceback.format_exc()
             self._results_q.put(tb)
 
+    @staticmethod
+    def _cache_stats(pipes):
+        """Return query cache stats for the checks run by a worker."""
+        checks = {}
+        for _scope, _restrict, runners in pipes:
+            for runner in chain.from_iterable(runners.values()):
+                checks.update((id(x), x) for x in runner.checks)
+        return _CacheStats(list(chain.from_iterable(
+            x.cache_stats() for x in checks.values() if isinstance(x, QueryCache))))
+
     def _schedule_async(self, async_pipes):
         """Schedule asynchronous checks."""
         try:
+            if tracing.tracer is not None:
+                tracing.tracer.process('async')
             with ThreadPoolExecutor(max_workers=self.options.tasks) as executor:
                 # schedule any existing async checks
                 futures = {}
                 for _scope, restriction, pipes in async_pipes:
                     for runner in chain.from_iterable(pipes.values()):
                         runner.schedule(executor, futures, restriction)
+            if self.timings:
+                self._results_q.put(self.timings)
+            if tracing.tracer is not None:
+                tracing.tracer.flush()
         except Exception:  # pragma: no cover
             # traceback can't be pickled so serialize it
             tb = traceback.format_exc()
@@ -210,6 +601,8 @@ class Pipeline:
         try:
             signal.signal(signal.SIGINT, signal.SIG_DFL)
             os.setpgrp()
+            if tracing.tracer is not None:
+                tracing.tracer.process('pipeline')
 
             # schedule asynchronous checks in a separate process
             async_proc = None
@@ -229,6 +622,8 @@ class Pipeline:
 
             if async_proc is not None:
                 async_proc.join()
+            if tracing.tracer is not None:
+                tracing.tracer.flush()
             # notify iterator that no more results exist
             self._results_q.put(None)
         except Exception:  # pragma: no cover
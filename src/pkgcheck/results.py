@@ -1,9 +1,9 @@
 """Base classes for check results."""
 
-from functools import total_ordering
+import sys
+from functools import cached_property, cmp_to_key, lru_cache, total_ordering
 
 from pkgcore.ebuild import cpv
-from snakeoil import klass
 
 from . import base
 from .packages import FilteredPkg, RawCPV
@@ -13,6 +13,29 @@ class InvalidResult(Exception):
     """Creating a result object failed in some fashion."""
 
 
+# cached result attributes that aren't serialized
+_cached_attrs = frozenset(['_hash', '_sort_key'])
+# shared attribute name tuples for serialized results
+_state_keys = {}
+
+
+def _restore(cls, keys, *values):
+    """Recreate a result object from serialized attributes."""
+    obj = cls.__new__(cls)
+    obj.__dict__.update(zip(keys, values))
+    return obj
+
+
+_ver_rev_key = cmp_to_key(lambda x, y: cpv.ver_cmp(*x, *y))
+
+
+@lru_cache(maxsize=4096)
+def _version_key(version):
+    """Return the sorting key for a given package version string."""
+    version, _, revision = version.partition('-r')
+    return _ver_rev_key((version, cpv.Revision(revision)))
+
+
 @total_ordering
 class Result:
     """Generic report result returned from a check."""
@@ -66,14 +89,33 @@ class Result:
         return self.name == other.name and self._attrs == other._attrs
 
     def __hash__(self):
-        return hash((self.name, tuple(sorted(self._attrs.items()))))
+        try:
+            return self.__dict__['_hash']
+        except KeyError:
+            value = self.__dict__['_hash'] = hash(
+                (self.name, tuple(sorted(self._attrs.items()))))
+            return value
+
+    def __reduce__(self):
+        # Drop cached attributes and share attribute names between objects,
+        # serializing results as their class, names, and values.
+        state = self.__dict__
+        if not state.keys().isdisjoint(_cached_attrs):
+            state = {k: v for k, v in state.items() if k not in _cached_attrs}
+        keys = tuple(state)
+        return _restore, (self.__class__, _state_keys.setdefault(keys, keys), *state.values())
+
+    def _key(self):
+        """Return the key used to sort the result."""
+        return (0, self.scope.level, '', self.name, self.desc)
+
+    @cached_property
+    def _sort_key(self):
+        """Cached sorting key."""
+        return self._key()
 
     def __lt__(self, other):
-        if self.scope == other.scope:
-            if self.name == other.name:
-                return self.desc < other.desc
-            return self.name < other.name
-        return self.scope < other.scope
+        return self._sort_key < other._sort_key
 
 
 class AliasResult(Result):
@@ -146,17 +188,8 @@ class EclassResult(Result):
         self.eclass = str(eclass)
         self._attr = 'eclass'
 
-    def __lt__(self, other):
-        try:
-            # if eclasses match, sort by name/desc
-            if self.eclass == other.eclass:
-                if self.name == other.name:
-                    return self.desc < other.desc
-                return self.name < other.name
-            return self.eclass < other.eclass
-        except AttributeError:
-            pass
-        return False
+    def _key(self):
+        return (0, self.scope.level, self.eclass, self.name, self.desc)
 
 
 class CategoryResult(Result):
@@ -166,16 +199,15 @@ class CategoryResult(Result):
 
     def __init__(self, pkg, **kwargs):
         super().__init__(**kwargs)
-        self.category = pkg.category
+        self.category = sys.intern(pkg.category)
         self._attr = 'category'
 
-    def __lt__(self, other):
-        try:
-            if self.category != other.category:
-                return self.category < other.category
-        except AttributeError:
-            pass
-        return super().__lt__(other)
+    def _key(self, package='', version=(), lineno=0):
+        # sort by category, package, version, and line number before
+        # falling back to scope, name, and description
+        return (
+            1, self.category, package, version, lineno,
+            self.scope.level, self.name, self.desc)
 
 
 class PackageResult(CategoryResult):
@@ -185,16 +217,11 @@ class PackageResult(CategoryResult):
 
     def __init__(self, pkg, **kwargs):
         super().__init__(pkg, **kwargs)
-        self.package = pkg.package
+        self.package = sys.intern(pkg.package)
         self._attr = 'package'
 
-    def __lt__(self, other):
-        try:
-            if self.category == other.category and self.package != other.package:
-                return self.package < other.package
-        except AttributeError:
-            pass
-        return super().__lt__(other)
+    def _key(self, **kwargs):
+        return super()._key(package=self.package, **kwargs)
 
 
 class VersionResult(PackageResult):
@@ -207,27 +234,11 @@ class VersionResult(PackageResult):
             self._filtered = True
             pkg = pkg._pkg
         super().__init__(pkg, **kwargs)
-        self.version = pkg.fullver
+        self.version = sys.intern(pkg.fullver)
         self._attr = 'version'
 
-    @klass.jit_attr
-    def ver_rev(self):
-        version, _, revision = self.version.partition('-r')
-        revision = cpv.Revision(revision)
-        return version, revision
-
-    def __lt__(self, other, cmp=None):
-        try:
-            if self.category == other.category and self.package == other.package:
-                if cmp is None:
-                    cmp = cpv.ver_cmp(*(self.ver_rev + other.ver_rev))
-                if cmp < 0:
-                    return True
-                elif cmp > 0:
-                    return False
-        except AttributeError:
-            pass
-        return super().__lt__(other)
+    def _key(self, **kwargs):
+        return super()._key(version=(_version_key(self.version),), **kwargs)
 
 
 class LineResult(VersionResult):
@@ -238,20 +249,9 @@ class LineResult(VersionResult):
         self.line = line
         self.lineno = lineno
 
-    def __lt__(self, other):
-        cmp = None
-        try:
-            if self.category == other.category and self.package == other.package:
-                # sort by line number for matching versions
-                cmp = cpv.ver_cmp(*(self.ver_rev + other.ver_rev))
-                if cmp == 0:
-                    if self.lineno < other.lineno:
-                        return True
-                    elif self.lineno > other.lineno:
-                        return False
-        except AttributeError:
-            pass
-        return super().__lt__(other, cmp=cmp)
+    def _key(self):
+        # sort by line number for matching versions
+        return super()._key(lineno=self.lineno)
 
 
 class _LogResult(Result):
@@ -1,15 +1,25 @@
 """Check runners."""
 
-from collections import deque
+from collections import defaultdict, deque
 from functools import partial
+from time import perf_counter_ns
 
+from pkgcore.ebuild import restricts
 from pkgcore.package.errors import MetadataException
 from pkgcore.restrictions import packages
+from snakeoil import klass
 
-from . import base
+from . import base, tracing
 from .results import MetadataError
 
 
+def _item_key(item):
+    """Return the package key for a given source item, if one exists."""
+    if isinstance(item, (list, tuple)):
+        item = item[0] if item else None
+    return getattr(item, 'key', None)
+
+
 class CheckRunner:
     """Generic runner for checks.
 
@@ -21,11 +31,35 @@ class CheckRunner:
 
     # check type classification to support checkrunner initialization
     type = None
+    # whether runs can be split into shards, see RepoCheckRunner
+    mergeable = False
+    # whether work per item can be split into parts, see SplitCheckRunner
+    splittable = False
 
-    def __init__(self, options, source, checks):
+    def __init__(self, options, source, checks, timings=None):
         self.options = options
         self.source = source
         self.checks = sorted(checks)
+        # optional wall time statistics collection
+        self._timings = timings
+        # active timeline tracer
+        self._tracer = tracing.tracer
+        # whether check running is timed
+        self._timed = timings is not None or self._tracer is not None
+
+    def _record(self, name, target, start, cat='check'):
+        """Record the wall time for an operation started at a given timestamp."""
+        end = perf_counter_ns()
+        if self._timings is not None:
+            self._timings.add(name, target, (end - start) / 1e9)
+        if self._tracer is not None:
+            self._tracer.complete(name, cat, start, end, target=target)
+
+    @klass.jit_attr
+    def key(self):
+        """Identifier for the runner that is stable across scanning runs."""
+        return (self.source.__class__.__name__,) + tuple(
+            x.__class__.__name__ for x in self.checks)
 
 
 class SyncCheckRunner(CheckRunner):
@@ -33,17 +67,26 @@ class SyncCheckRunner(CheckRunner):
 
     type = 'sync'
 
-    def __init__(self, *args):
-        super().__init__(*args)
+    def __init__(self, *args, results_cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # optional persistent results cache
+        self._results_cache = results_cache
         # set of known results for all checks run by the checkrunner
         self._known_results = set().union(*(x.known_results for x in self.checks))
         # used to store MetadataError results for processing
         self._metadata_errors = deque()
 
-        # only report metadata errors for version-scoped sources
+        # Only report metadata errors for version-scoped sources, note that
+        # sources can be shared between runners so they aren't altered.
         if self.source.scope == base.version_scope:
-            self.source.itermatch = partial(
+            self._itermatch = partial(
                 self.source.itermatch, error_callback=self._metadata_error_cb)
+        else:
+            self._itermatch = self.source.itermatch
+
+        # avoid any timing overhead when timings aren't collected
+        if self._timed:
+            self._run = self._timed_run
 
     def _metadata_error_cb(self, e, check=None):
         """Callback handling MetadataError results."""
@@ -60,33 +103,164 @@ class SyncCheckRunner(CheckRunner):
         if result_cls in known_results:
             error_str = ': '.join(e.msg().split('\n'))
             result = result_cls(e.attr, error_str, pkg=e.pkg)
-            self._metadata_errors.append((e.pkg, result))
+            self._metadata_errors.append((e.pkg, result, check))
 
-    def run(self, restrict=packages.AlwaysTrue):
-        """Run registered checks against all matching source items."""
-        for item in self.source.itermatch(restrict):
-            for check in self.checks:
+    def _run(self, restrict, checks):
+        """Run checks against all matching source items.
+
+        Results are yielded as (check, result) tuples where the check is None
+        for errors occurring outside of check running context.
+        """
+        for item in self._itermatch(restrict):
+            for check in checks:
                 try:
-                    yield from check.feed(item)
+                    for result in check.feed(item):
+                        yield check, result
                 except MetadataException as e:
                     self._metadata_error_cb(e, check=check)
 
-        # yield all relevant MetadataError results that occurred
+        yield from self._metadata_results(restrict)
+
+    def _timed_run(self, restrict, checks):
+        """Run checks against all matching source items, tracking their wall time."""
+        source = f'{self.source.__class__.__name__} (source)'
+        start = perf_counter_ns()
+        for item in self._itermatch(restrict):
+            target = _item_key(item)
+            self._record(source, target, start, cat='source')
+            for check in checks:
+                results = []
+                start = perf_counter_ns()
+                try:
+                    results.extend(check.feed(item))
+                except MetadataException as e:
+                    self._metadata_error_cb(e, check=check)
+                self._record(check.__class__.__name__, target, start)
+                for result in results:
+                    yield check, result
+            start = perf_counter_ns()
+
+        yield from self._metadata_results(restrict)
+
+    def _metadata_results(self, restrict):
+        """Yield all relevant MetadataError results that occurred."""
         while self._metadata_errors:
-            pkg, result = self._metadata_errors.popleft()
+            pkg, result, check = self._metadata_errors.popleft()
             if restrict.match(pkg):
+                yield check, result
+
+    def _cached_run(self, restrict, key):
+        """Run uncacheable checks, replaying cached results for all others."""
+        if (cached := self._results_cache.get(key)) is None:
+            results = defaultdict(list)
+            for check, result in self._run(restrict, self.checks):
+                results[check.__class__.__name__ if check else None].append(result)
                 yield result
+            self._results_cache.put(key, {
+                k: v for k, v in results.items() if k not in self._uncacheable})
+        else:
+            if checks := [x for x in self.checks if not x.cacheable]:
+                # errors outside check context are regenerated by iterating the source
+                cached.pop(None, None)
+                for _check, result in self._run(restrict, checks):
+                    yield result
+            for results in cached.values():
+                yield from results
+
+    @klass.jit_attr
+    def _uncacheable(self):
+        """Names of registered checks with results that can't be cached."""
+        return frozenset(x.__class__.__name__ for x in self.checks if not x.cacheable)
+
+    def run(self, restrict=packages.AlwaysTrue):
+        """Run registered checks against all matching source items."""
+        if self._results_cache is not None:
+            if key := self._results_cache.key(self, restrict):
+                yield from self._cached_run(restrict, key)
+                return
+        for _check, result in self._run(restrict, self.checks):
+            yield result
+
+
+class SplitCheckRunner(SyncCheckRunner):
+    """Generic runner for checks supporting split runs.
+
+    The work done for each item can be split into separate parts run in
+    parallel, with the results from all parts merged afterwards.
+    """
+
+    splittable = True
+
+    def run_split(self, restrict, part, parts):
+        """Run checks against all matching source items for a given part."""
+        for check in self.checks:
+            check.split(part, parts)
+        try:
+            # partial results are never cached
+            return [result for _check, result in self._run(restrict, self.checks)]
+        finally:
+            for check in self.checks:
+                check.split(0, 1)
+
+    def merge_split(self, results):
+        """Merge results from all parts of a split run."""
+        for check in self.checks:
+            yield from check.merge_split(
+                [x for x in results if x.__class__ in check.known_results])
 
 
 class RepoCheckRunner(SyncCheckRunner):
-    """Generic runner for checks run across an entire repo."""
+    """Generic runner for checks run across an entire repo.
+
+    If all registered checks support merging partial states, runs can be split
+    into per-category shards fed separately with the resulting check states
+    merged before finishing.
+    """
+
+    @klass.jit_attr
+    def mergeable(self):
+        """Whether checks can be fed over separate shards and merged."""
+        return self.source.scope == base.repo_scope and all(x.mergeable for x in self.checks)
+
+    def shards(self, restrict=packages.AlwaysTrue):
+        """Yield restrictions splitting a run into separately fed shards."""
+        for category in sorted(self.options.target_repo.categories):
+            shard = restricts.CategoryDep(category)
+            if restrict is not packages.AlwaysTrue:
+                shard = packages.AndRestriction(restrict, shard)
+            yield shard
+
+    def _finish(self):
+        for check in self.checks:
+            if not self._timed:
+                yield from check.finish()
+            else:
+                start = perf_counter_ns()
+                results = list(check.finish())
+                self._record(check.__class__.__name__, None, start)
+                yield from results
 
     def run(self, *args):
         for check in self.checks:
             check.start()
         yield from super().run(*args)
+        yield from self._finish()
+
+    def run_shard(self, restrict):
+        """Feed checks a given shard, returning its results and partial check states."""
         for check in self.checks:
-            yield from check.finish()
+            check.start()
+        results = list(super().run(restrict))
+        return results, [check.state() for check in self.checks]
+
+    def merge(self, states):
+        """Merge partial check states from all shards, yielding final results."""
+        for check in self.checks:
+            check.start()
+        for shard_states in states:
+            for check, state in zip(self.checks, shard_states):
+                check.merge(state)
+        yield from self._finish()
 
 
 class AsyncCheckRunner(CheckRunner):
@@ -103,4 +277,9 @@ class AsyncCheckRunner(CheckRunner):
         """Schedule all checks to run via the given executor."""
         for item in self.source.itermatch(restrict):
             for check in self.checks:
-                check.schedule(item, executor, futures)
+                if not self._timed:
+                    check.schedule(item, executor, futures)
+                else:
+                    start = perf_counter_ns()
+                    check.schedule(item, executor, futures)
+                    self._record(check.__class__.__name__, _item_key(item), start)
@@ -91,7 +91,7 @@ class EnableNet(argparse.Action):
 class CacheNegations(arghparse.CommaSeparatedNegations):
     """Split comma-separated enabled and disabled cache types."""
 
-    caches = ImmutableDict({cache.type: True for cache in CachedAddon.caches.values()})
+    caches = ImmutableDict({cache.type: cache.default for cache in CachedAddon.caches.values()})
 
     def __init__(self, *args, **kwargs):
         # delay setting default since it has to be mutable
@@ -111,7 +111,10 @@ class CacheNegations(arghparse.CommaSeparatedNegations):
         else:
             disabled, enabled = super().parse_values(values)
         disabled = set(disabled)
-        enabled = set(enabled) if enabled else all_cache_types
+        if not enabled:
+            # only negations were specified so alter the default cache types
+            enabled = {k for k, v in self.caches.items() if v}
+        enabled = set(enabled)
         if unknown := (disabled | enabled) - all_cache_types:
             unknowns = ', '.join(map(repr, unknown))
             choices = ', '.join(map(repr, sorted(self.caches)))
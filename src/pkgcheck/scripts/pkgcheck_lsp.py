@@ -0,0 +1,39 @@
+import sys
+
+from snakeoil.cli import arghparse
+
+from ..lsp import Server
+
+
+class ArgumentParser(arghparse.ArgumentParser):
+    """Argument parser passing all extraneous args through for scanning."""
+
+    def parse_known_args(self, args=None, namespace=None):
+        namespace, args = super().parse_known_args(args, namespace)
+        namespace.args = args
+        return namespace, []
+
+
+lsp = ArgumentParser(
+    prog='pkgcheck lsp', description='run language server over stdio',
+    docs="""
+        Run a language server speaking the Language Server Protocol over
+        stdin and stdout, publishing scan results for open ebuilds and
+        eclasses as diagnostics.
+
+        All arguments are passed through to ``pkgcheck scan`` when
+        initializing the server's scanning options, e.g. ``pkgcheck lsp -r
+        gentoo -k -info`` targets the gentoo repo while disabling info level
+        keywords.
+
+        Checks that scan ebuild and eclass file contents are rerun against
+        the editor's buffer on every change with parse trees updated
+        incrementally, while all other results are regenerated when files
+        are opened or saved.
+    """)
+
+
+@lsp.bind_main_func
+def _lsp(options, out, err):
+    server = Server(options.args, sys.stdin.buffer, sys.stdout.buffer)
+    return server.run()
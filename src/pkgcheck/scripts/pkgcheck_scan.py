@@ -11,7 +11,7 @@ from pkgcore.util import parserestrict
 from snakeoil.cli import arghparse
 from snakeoil.osutils import pjoin
 
-from .. import base, const, objects
+from .. import base, const, objects, tracing
 from ..base import PkgcheckUserException
 from ..cli import ConfigFileParser
 from ..pipeline import Pipeline
@@ -75,12 +75,64 @@ main_options.add_argument(
     docs="""
         Number of asynchronous tasks to run concurrently (defaults to 5 * CPU count).
     """)
+main_options.add_argument(
+    '--schedule', choices=('repo-order', 'cost'), default='repo-order',
+    help='order in which scanning work is distributed',
+    docs="""
+        Order in which scanning work is queued for parallel processing.
+
+        By default, work is queued in repo order. Using ``cost`` records the
+        wall time spent on each package per check runner to a stats file in
+        the cache directory and on later runs queues work longest expected
+        first, reducing the time spent waiting on a single worker
+        processing slow packages at the end of a scan. Results are then
+        output in the order work is queued rather than in repo order.
+    """)
+main_options.add_argument(
+    '--transport', choices=('queue', 'shm'), default='queue',
+    help='method used to pass results from worker processes',
+    docs="""
+        Method used to pass results from scanning processes to the main
+        process.
+
+        By default, results are serialized through a single queue shared by
+        all processes. Using ``shm`` gives each process its own ring buffer
+        in shared memory instead, avoiding contention between processes
+        when scans produce large numbers of results.
+    """)
+main_options.add_argument(
+    '--timings', nargs='?', type=arghparse.positive_int, const=5, metavar='N',
+    help='output wall time statistics for checks',
+    docs="""
+        Collect wall time statistics for all checks and sources run during
+        the scan, outputting a table to stderr when it finishes. For each
+        check the total, mean, 95th percentile, and maximum time spent per
+        package are shown, sorted by total time.
+
+        An optional argument sets the number of slowest packages listed for
+        each check, defaulting to 5.
+    """)
+main_options.add_argument(
+    '--trace', metavar='FILE',
+    help='write a timeline trace of the scan to a file',
+    docs="""
+        Write a timeline of the scanning pipeline to the given file using the
+        trace event JSON format, viewable in chrome://tracing or Perfetto
+        (https://ui.perfetto.dev).
+
+        The main process, the pipeline process, the asynchronous check
+        process, and each worker process get separate tracks showing addon
+        initialization, cache updates, source iteration, check runs, work
+        and result queue operations, and reporter output.
+    """)
 main_options.add_argument(
     '--cache', action=argparse_actions.CacheNegations,
     help='forcibly enable/disable caches',
     docs="""
-        All cache types are enabled by default, this option explicitly sets
-        which caches will be generated and used during scanning.
+        All cache types except ``results`` and ``syntax`` are enabled by
+        default, this option
+        explicitly sets which caches will be generated and used during
+        scanning.
 
         To enable only certain cache types, specify them in a comma-separated
         list, e.g. ``--cache git,profiles`` will enable both the git and
@@ -96,6 +148,16 @@ main_options.add_argument(
 
         When disabled, no caches will be saved to disk and results requiring
         caches (e.g. git-related checks) will be skipped.
+
+        The ``results`` cache stores scan results for packages and reuses them
+        on later runs if neither the package's files, the eclasses it
+        inherits, the enabled checks, nor global repo data (e.g. profiles or
+        metadata/pkgcheck.conf) have changed. Since it's disabled by default,
+        use ``--cache yes`` to enable it alongside all other cache types.
+
+        The ``syntax`` cache stores facts extracted from parsing ebuilds and
+        eclasses keyed by their contents, allowing parse-based checks to skip
+        parsing unchanged files on later runs. It's also disabled by default.
     """)
 main_options.add_argument(
     '--cache-dir', type=arghparse.create_dir, default=const.USER_CACHE_DIR,
@@ -429,6 +491,9 @@ def _scan(options, out, err):
         for c in options.pop('contexts') + [reporter]:
             stack.enter_context(c)
         pipe = Pipeline(options)
+        report = tracing.traced(reporter.report, 'report', 'reporter')
         for result in pipe:
-            reporter.report(result)
+            report(result)
+    if pipe.timings is not None:
+        pipe.timings.report(err, limit=options.timings)
     return int(bool(pipe.errors))
@@ -6,18 +6,20 @@ from collections.abc import Set
 from dataclasses import dataclass
 from itertools import groupby
 from operator import attrgetter
+from weakref import WeakKeyDictionary
 
+from pkgcore.ebuild.atom import atom as atom_cls
 from pkgcore.ebuild.profiles import ProfileError
 from pkgcore.ebuild.repository import UnconfiguredTree, tree
-from pkgcore.restrictions import packages
 from snakeoil import klass
 from snakeoil.osutils import listdir_files, pjoin
 
 from . import addons, base
 from .bash import ParseTree
+from .addons.caches import CacheDisabled, SyntaxCache
 from .addons.eclass import Eclass, EclassAddon
 from .addons.profiles import ProfileAddon, ProfileNode
-from .packages import FilteredPkg, RawCPV, WrappedPkg
+from .packages import EbuildContent, FilteredPkg, RawCPV, WrappedPkg
 
 
 class Source:
@@ -25,6 +27,8 @@ class Source:
 
     scope = base.repo_scope
     required_addons = ()
+    # addons passed as None when their related cache is disabled
+    optional_addons = ()
 
     def __init__(self, options, source):
         self.options = options
@@ -45,6 +49,70 @@ class EmptySource(Source):
         self.scope = scope
 
 
+class _SharedMatches:
+    """Package matches shared between all sources using the same repo.
+
+    Work units are run against package-level restrictions with every related
+    checkrunner iterating over its own source, so the matches for the most
+    recent package restriction are stored per repo and replayed to all
+    sources requesting them. This way each package is matched, instantiated,
+    and has its metadata loaded once per work unit, with the file and parse
+    tree views, package grouping, and filtering being derived from the same
+    package objects. Ebuild contents for matched packages are stored as well
+    so they're only read once.
+    """
+
+    def __init__(self):
+        # mapping of repos to their most recent match key, matches, and
+        # ebuild contents mapping keyed by package object id
+        self._matches = WeakKeyDictionary()
+
+    def clear(self):
+        """Drop all stored matches."""
+        self._matches.clear()
+
+    def itermatch(self, repo, restrict, **kwargs):
+        """Yield packages matching a given restriction from a given repo."""
+        # only package restrictions against ebuild repos are shared to avoid
+        # storing entire repos
+        if not isinstance(restrict, atom_cls) or not isinstance(repo, UnconfiguredTree):
+            yield from repo.itermatch(restrict, **kwargs)
+            return
+
+        error_callback = kwargs.pop('error_callback', None)
+        key = (restrict, tuple(sorted(kwargs.items())))
+        cached_key, matches, _contents = self._matches.get(repo, (None, None, None))
+        if key != cached_key:
+            # errors are stored inline to preserve their order
+            matches = []
+            matches.extend(repo.itermatch(restrict, error_callback=matches.append, **kwargs))
+            contents = {id(x): None for x in matches if not isinstance(x, Exception)}
+            self._matches[repo] = (key, matches, contents)
+
+        for item in matches:
+            if isinstance(item, Exception):
+                if error_callback is not None:
+                    error_callback(item)
+            else:
+                yield item
+
+    def content(self, repo, pkg):
+        """Return the ebuild contents for a package, reading them once if it's shared."""
+        try:
+            contents = self._matches[repo][2]
+            content = contents[id(pkg)]
+        except (KeyError, TypeError):
+            # package isn't from the stored matches
+            return EbuildContent.read(pkg)
+        if content is None:
+            content = contents[id(pkg)] = EbuildContent.read(pkg)
+        return content
+
+
+# process-wide package matches shared between repo sources
+shared_matches = _SharedMatches()
+
+
 class RepoSource(Source):
     """Base template for a repository source."""
 
@@ -57,7 +125,9 @@ class RepoSource(Source):
 
     def itermatch(self, restrict, sorter=sorted, **kwargs):
         """Yield packages matching the given restriction from the selected source."""
-        return self.source.itermatch(restrict, sorter=sorter, **kwargs)
+        if isinstance(self.source, Source):
+            return self.source.itermatch(restrict, sorter=sorter, **kwargs)
+        return shared_matches.itermatch(self.source, restrict, sorter=sorter, **kwargs)
 
 
 class LatestVersionRepoSource(RepoSource):
@@ -266,8 +336,8 @@ class RestrictionRepoSource(RepoSource):
         self.restriction = restriction
 
     def itermatch(self, restrict, **kwargs):
-        restrict = packages.AndRestriction(*(restrict, self.restriction))
-        yield from super().itermatch(restrict, **kwargs)
+        # filter shared matches instead of combining restrictions
+        yield from filter(self.restriction.match, super().itermatch(restrict, **kwargs))
 
 
 class UnmaskedRepoSource(RepoSource):
@@ -284,57 +354,89 @@ class UnmaskedRepoSource(RepoSource):
 
 
 class _SourcePkg(WrappedPkg):
-    """Package object with file contents injected as an attribute."""
+    """Package object with file contents injected as attributes."""
 
-    __slots__ = ('lines',)
+    __slots__ = ('content', 'lines')
 
-    def __init__(self, pkg):
+    def __init__(self, pkg, content):
         super().__init__(pkg)
-        with pkg.ebuild.text_fileobj() as fileobj:
-            self.lines = tuple(fileobj)
+        self.content = content
+        self.lines = content.lines
+
+
+class _ContentRepoSource(RepoSource):
+    """Generic repository source yielding packages with their ebuild contents."""
+
+    def _iter_content(self, restrict, **kwargs):
+        """Yield matching packages and their ebuild contents."""
+        # determine the underlying repo for wrapped sources
+        repo = self.source
+        while isinstance(repo, Source):
+            repo = repo.source
+        for pkg in super().itermatch(restrict, **kwargs):
+            yield pkg, shared_matches.content(repo, pkg)
 
 
-class EbuildFileRepoSource(RepoSource):
+class EbuildFileRepoSource(_ContentRepoSource):
     """Ebuild repository source yielding package objects and their file contents."""
 
     def itermatch(self, restrict, **kwargs):
-        for pkg in super().itermatch(restrict, **kwargs):
-            yield _SourcePkg(pkg)
+        for pkg, content in self._iter_content(restrict, **kwargs):
+            yield _SourcePkg(pkg, content)
+
+
+class _ParseSource:
+    """Mixin for sources parsing files, reusing cached syntax facts if enabled."""
+
+    optional_addons = (SyntaxCache,)
+
+    def __init__(self, *args, syntax_cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._syntax_cache = syntax_cache
+
+    def _parse(self, cls, data, **kwargs):
+        """Create a parsed object of a given type for given file contents."""
+        if self._syntax_cache is None:
+            return cls(data, **kwargs)
+        key = self._syntax_cache.key(data)
+        if (facts := self._syntax_cache.get(key)) is not None:
+            return cls(data, facts=facts, **kwargs)
+        parsed = cls(data, **kwargs)
+        self._syntax_cache.put(key, parsed.facts)
+        return parsed
 
 
 class _ParsedPkg(ParseTree, WrappedPkg):
     """Parsed package object."""
 
 
-class EbuildParseRepoSource(RepoSource):
+class EbuildParseRepoSource(_ParseSource, _ContentRepoSource):
     """Ebuild repository source yielding parsed packages."""
 
     def itermatch(self, restrict, **kwargs):
-        for pkg in super().itermatch(restrict, **kwargs):
-            with pkg.ebuild.bytes_fileobj() as f:
-                data = f.read()
-            yield _ParsedPkg(data, pkg=pkg)
+        for pkg, content in self._iter_content(restrict, **kwargs):
+            yield self._parse(_ParsedPkg, content.data, pkg=pkg)
 
 
 class _ParsedEclass(ParseTree):
     """Parsed eclass object."""
 
-    def __init__(self, data, eclass):
-        super().__init__(data)
+    def __init__(self, data, eclass, facts=None):
+        super().__init__(data, facts=facts)
         self.eclass = eclass
 
     __getattr__ = klass.GetAttrProxy('eclass')
     __dir__ = klass.DirProxy('eclass')
 
 
-class EclassParseRepoSource(EclassRepoSource):
+class EclassParseRepoSource(_ParseSource, EclassRepoSource):
     """Eclass repository source yielding parsed eclass objects."""
 
     def itermatch(self, restrict, **kwargs):
         for eclass in super().itermatch(restrict, **kwargs):
             with open(eclass.path, 'rb') as f:
                 data = f.read()
-            yield _ParsedEclass(data, eclass=eclass)
+            yield self._parse(_ParsedEclass, data, eclass=eclass)
 
 
 class _CombinedSource(RepoSource):
@@ -428,4 +530,9 @@ def init_source(source, options, addons_map=None):
         kwargs = {}
     for addon in cls.required_addons:
         kwargs[base.param_name(addon)] = addons.init_addon(addon, options, addons_map)
+    for addon in cls.optional_addons:
+        try:
+            kwargs[base.param_name(addon)] = addons.init_addon(addon, options, addons_map)
+        except CacheDisabled:
+            kwargs[base.param_name(addon)] = None
     return cls(*args, options, **kwargs)
@@ -0,0 +1,65 @@
+"""Wall time statistics for scanning runs."""
+
+import math
+from operator import itemgetter
+
+
+class Timings:
+    """Wall time statistics for checks and sources run during a scan.
+
+    Elapsed times are tracked per name and target package so they can be
+    merged across scanning processes and summarized once a scan finishes.
+    """
+
+    def __init__(self):
+        # mapping of names to mappings of package keys to elapsed time
+        self._times = {}
+
+    def __bool__(self):
+        return bool(self._times)
+
+    def add(self, name, target, elapsed):
+        """Add the elapsed time for a given name and target package."""
+        times = self._times.setdefault(name, {})
+        times[target] = times.get(target, 0) + elapsed
+
+    def update(self, other):
+        """Merge timings from another instance."""
+        for name, times in other._times.items():
+            for target, elapsed in times.items():
+                self.add(name, target, elapsed)
+
+    def stats(self):
+        """Return summarized timing stats sorted by total time.
+
+        Stats are tuples of the name, total, mean, 95th percentile, and
+        maximum time across targets, and a list of (target, elapsed) tuples
+        in descending time order.
+        """
+        stats = []
+        for name, times in self._times.items():
+            samples = sorted(times.values())
+            total = sum(samples)
+            # nearest-rank percentile
+            p95 = samples[math.ceil(len(samples) * 0.95) - 1]
+            targets = sorted(
+                ((k, v) for k, v in times.items() if k is not None),
+                key=itemgetter(1), reverse=True)
+            stats.append((name, total, total / len(samples), p95, samples[-1], targets))
+        return sorted(stats, key=itemgetter(1), reverse=True)
+
+    def report(self, out, limit=5):
+        """Output a table of timing stats, including the slowest packages."""
+        stats = self.stats()
+        width = max((len(x[0]) for x in stats), default=0)
+        headers = ('total', 'mean', 'p95', 'max')
+        out.write(out.bold, f"{'name':<{width}}", *(f'{x:>12}' for x in headers), out.reset)
+        for name, *times, targets in stats:
+            out.write(f'{name:<{width}}', *(f'{x:>11.4f}s' for x in times))
+            if limit and targets:
+                slowest = ', '.join(f'{k} ({v:.4f}s)' for k, v in targets[:limit])
+                out.first_prefix.append('  ')
+                out.later_prefix.append('    ')
+                out.write(out.fg('yellow'), 'slowest: ', out.reset, slowest)
+                out.first_prefix.pop()
+                out.later_prefix.pop()
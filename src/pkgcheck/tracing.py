@@ -0,0 +1,137 @@
+"""Timeline tracing support for scanning runs.
+
+Events are written in the trace event format supported by chrome://tracing
+and Perfetto, see
+https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+for the format specification.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from time import perf_counter_ns
+
+from snakeoil.fileutils import AtomicWriteFile
+
+# currently active tracer
+tracer = None
+
+
+class Tracer:
+    """Trace event collector supporting forked processes.
+
+    Each process buffers its own events and appends them to a shared
+    temporary file which is merged into the target file when tracing
+    finishes.
+    """
+
+    # maximum number of buffered events per process
+    buffer_size = 10000
+
+    def __init__(self, path):
+        self.path = path
+        fd, self._events_path = tempfile.mkstemp(
+            prefix='.pkgcheck-trace-', dir=os.path.dirname(os.path.abspath(path)))
+        os.close(fd)
+        self._events = []
+        self._pid = None
+        self.process('pkgcheck')
+
+    def process(self, name):
+        """Register the current process under a given track name.
+
+        This must be called when a forked process starts tracing in order to
+        drop events inherited from its parent.
+        """
+        self._pid = os.getpid()
+        self._events = [{
+            'name': 'process_name', 'ph': 'M', 'pid': self._pid,
+            'args': {'name': f'{name} ({self._pid})'},
+        }]
+
+    def complete(self, name, cat, start, end=None, **args):
+        """Add a complete event using nanosecond timestamps."""
+        if end is None:
+            end = perf_counter_ns()
+        event = {
+            'name': name, 'cat': cat, 'ph': 'X',
+            'ts': start / 1000, 'dur': (end - start) / 1000,
+            'pid': self._pid, 'tid': threading.get_native_id(),
+        }
+        if args:
+            event['args'] = args
+        self._events.append(event)
+        if len(self._events) >= self.buffer_size:
+            self.flush()
+
+    @contextmanager
+    def span(self, name, cat, **args):
+        """Context manager adding a complete event for its duration."""
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.complete(name, cat, start, **args)
+
+    def traced(self, func, name, cat):
+        """Wrap a function to add a complete event for each call."""
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.complete(name, cat, start)
+        return wrapped
+
+    def flush(self):
+        """Append buffered events to the shared events file."""
+        if self._events:
+            data = ''.join(json.dumps(x) + '\n' for x in self._events)
+            self._events = []
+            fd = os.open(self._events_path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, data.encode())
+            finally:
+                os.close(fd)
+
+    def finish(self):
+        """Merge all flushed events into the target trace file."""
+        self.flush()
+        with open(self._events_path) as f:
+            events = [json.loads(line) for line in f]
+        os.unlink(self._events_path)
+        with AtomicWriteFile(self.path) as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def start(path):
+    """Enable tracing, writing the trace to a given path when finished."""
+    global tracer
+    tracer = Tracer(path)
+    return tracer
+
+
+def finish():
+    """Finish and disable tracing if it's enabled."""
+    global tracer
+    if tracer is not None:
+        tracer.finish()
+        tracer = None
+
+
+def span(name, cat, **args):
+    """Context manager tracing its duration if tracing is enabled."""
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, cat, **args)
+
+
+def traced(func, name, cat):
+    """Return a given function, wrapped to trace its calls if tracing is enabled."""
+    if tracer is None:
+        return func
+    return tracer.traced(func, name, cat)
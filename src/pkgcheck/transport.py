@@ -0,0 +1,165 @@
+"""Shared memory transport for scanning results.
+
+Results are passed from scanning processes to the main process using
+per-process ring buffers in anonymous shared memory inherited across forks.
+Writers only synchronize with the reader of their own ring, avoiding the
+global write lock and pipe used by :class:`multiprocessing.SimpleQueue`.
+"""
+
+import mmap
+import pickle
+import struct
+import threading
+from collections import deque
+from multiprocessing import util
+
+
+class _Ring:
+    """Single producer, single consumer byte ring buffer in shared memory.
+
+    Messages are written as length-prefixed records. Records larger than the
+    available space are streamed in pieces, so message size isn't limited by
+    the ring size.
+
+    Header updates are made while holding a per-ring lock, which orders them
+    with the related payload accesses on architectures with weaker memory
+    ordering than x86 and avoids lost wakeups for waiting writers.
+    """
+
+    # total bytes written, total bytes read, and writer waiting flag
+    _header = struct.Struct('QQQ')
+    _length = struct.Struct('I')
+
+    def __init__(self, ctx, size):
+        self.size = size
+        self._buf = mmap.mmap(-1, self._header.size + size)
+        # guards header accesses
+        self._lock = ctx.Lock()
+        # signaled by the reader when space is freed for a waiting writer
+        self._space = ctx.Semaphore(0)
+        # partially read record data
+        self._data = bytearray()
+
+    def write(self, data, notify):
+        """Write a message, waiting for free space as required."""
+        record = self._length.pack(len(data)) + data
+        offset = self._header.size
+        pos, total = 0, len(record)
+        while pos < total:
+            with self._lock:
+                written, read, _ = self._header.unpack_from(self._buf)
+                if not (free := self.size - (written - read)):
+                    # flag the writer as waiting for the reader to free space
+                    struct.pack_into('Q', self._buf, 16, 1)
+            if not free:
+                self._space.acquire()
+                continue
+            n = min(free, total - pos)
+            start = written % self.size
+            first = min(n, self.size - start)
+            self._buf[offset + start:offset + start + first] = record[pos:pos + first]
+            if n > first:
+                self._buf[offset:offset + n - first] = record[pos + first:pos + n]
+            with self._lock:
+                struct.pack_into('Q', self._buf, 0, written + n)
+            pos += n
+            notify()
+
+    def read(self):
+        """Return all complete messages currently available."""
+        with self._lock:
+            written, read, _ = self._header.unpack_from(self._buf)
+        if written != read:
+            offset = self._header.size
+            start = read % self.size
+            end = start + written - read
+            if end <= self.size:
+                self._data += self._buf[offset + start:offset + end]
+            else:
+                self._data += self._buf[offset + start:offset + self.size]
+                self._data += self._buf[offset:offset + end - self.size]
+            with self._lock:
+                struct.pack_into('Q', self._buf, 8, written)
+                # wake the writer once space is freed
+                if self._header.unpack_from(self._buf)[2]:
+                    struct.pack_into('Q', self._buf, 16, 0)
+                    self._space.release()
+
+        messages = []
+        data, pos = self._data, 0
+        while len(data) - pos >= self._length.size:
+            (length,) = self._length.unpack_from(data, pos)
+            end = pos + self._length.size + length
+            if end > len(data):
+                break
+            messages.append(bytes(data[pos + self._length.size:end]))
+            pos = end
+        if pos:
+            del data[:pos]
+        return messages
+
+
+class SharedMemoryQueue:
+    """Queue supporting multiple writer processes and a single reader process.
+
+    Each writing process claims its own ring buffer on first use, so the
+    total number of writing processes must be known in advance.
+    Messages from a single process are received in order while ordering
+    between processes isn't guaranteed, except that a ``None`` message
+    signaling the end of the stream is only returned once all other
+    messages have been received.
+    """
+
+    # default ring buffer size in bytes per writing process
+    ring_size = 1 << 20
+
+    def __init__(self, ctx, writers, ring_size=None):
+        ring_size = ring_size if ring_size is not None else self.ring_size
+        self._rings = [_Ring(ctx, ring_size) for _ in range(writers)]
+        # number of rings claimed by writing processes
+        self._claimed = ctx.Value('i', 0)
+        # signaled by writers when data is available
+        self._ready = ctx.Semaphore(0)
+        # received messages that haven't been returned yet
+        self._messages = deque()
+        self._after_fork()
+        util.register_after_fork(self, SharedMemoryQueue._after_fork)
+
+    def _after_fork(self):
+        self._ring = None
+        self._lock = threading.Lock()
+
+    def _claim(self):
+        """Claim an unused ring buffer for the current process."""
+        with self._claimed.get_lock():
+            i = self._claimed.value
+            if i >= len(self._rings):
+                raise RuntimeError('no ring buffers available for writing process')
+            self._claimed.value += 1
+        return self._rings[i]
+
+    def put(self, obj):
+        """Serialize an object and write it to the process's ring buffer."""
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if self._ring is None:
+                self._ring = self._claim()
+            self._ring.write(data, self._ready.release)
+
+    def _receive(self):
+        """Receive all available messages, returning True if any exist."""
+        for ring in self._rings:
+            self._messages.extend(ring.read())
+        return bool(self._messages)
+
+    def get(self):
+        """Return the next object, blocking until one is available."""
+        while True:
+            while not self._messages and not self._receive():
+                self._ready.acquire()
+            obj = pickle.loads(self._messages.popleft())
+            if obj is None and (self._messages or self._receive()):
+                # defer end of stream until all other messages are received
+                self._messages.append(pickle.dumps(None))
+                continue
+            return obj
@@ -346,6 +346,52 @@ class TestProfileAddon:
         groups = addon.identify_profiles(FakePkg("d-b/ab-2", data={'KEYWORDS': 'foon'}))
         assert len(groups) == 0, f"checking for profile collapsing: {groups!r}"
 
+    def test_visible_profiles(self):
+        profiles = [
+            Profile('default-linux/x86', 'x86'),
+            Profile('default-linux/ppc', 'ppc'),
+        ]
+        self.repo.create_profiles(profiles)
+        self.repo.arches.update(['x86', 'ppc'])
+        options, _ = self.tool.parse_args(self.args)
+        addon = addons.init_addon(self.addon_kls, options)
+
+        # each profile data object gets a unique bit
+        bits = [x.bit for x in addon]
+        assert len(set(bits)) == len(bits) == 4
+        assert sum(bits) == addon.profile_bits
+
+        for keywords in ('x86', '~x86', 'ppc ~x86', '~ppc x86', 'foon', ''):
+            pkg = FakePkg("d-b/ab-1", data={'KEYWORDS': keywords})
+            expected = sum(x.bit for x in addon if x.visible(pkg))
+            assert addon.visible_profiles(pkg) == expected, keywords
+
+    def test_lazy_loading(self):
+        profiles = [
+            Profile('default-linux/x86', 'x86'),
+            Profile('default-linux/ppc', 'ppc'),
+        ]
+        self.repo.create_profiles(profiles)
+        self.repo.arches.update(['x86', 'ppc'])
+
+        # profiles are loaded upfront for repo scans
+        options, _ = self.tool.parse_args(self.args)
+        addon = addons.init_addon(self.addon_kls, options)
+        assert sorted(addon.profile_filters) == ['ppc', 'x86', '~ppc', '~x86']
+        bits = {x.key: x.bit for x in addon}
+
+        # but only for the arches used by packages in targeted scans
+        self.repo.create_ebuild('cat/pkg-1', keywords=['~ppc'])
+        options, _ = self.tool.parse_args(self.args + ['cat/pkg'])
+        addon = addons.init_addon(self.addon_kls, options)
+        assert sorted(addon.profile_filters) == ['ppc', '~ppc']
+        # with others loaded on demand
+        pkg = FakePkg('cat/pkg-1', data={'KEYWORDS': '~x86'})
+        assert [x.name for y in addon.identify_profiles(pkg) for x in y] == ['default-linux/x86']
+        assert sorted(addon.profile_filters) == ['ppc', 'x86', '~ppc', '~x86']
+        # profile bits are independent of load order
+        assert {x.key: x.bit for x in addon} == bits
+
 
 try:
     import requests
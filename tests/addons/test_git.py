@@ -1,11 +1,13 @@
 import os
+import sqlite3
 import subprocess
 from functools import partial
 from unittest.mock import Mock, patch
 
 import pytest
 from pkgcheck import base
-from pkgcheck.addons import git, init_addon
+from pkgcheck import scan
+from pkgcheck.addons import caches, git, init_addon
 from pkgcheck.base import PkgcheckUserException
 from pkgcheck.addons.caches import CacheDisabled
 from pkgcore.ebuild.atom import MalformedAtom
@@ -229,6 +231,190 @@ class TestGitStash:
                 touch(path)
 
 
+class TestPkgcheckScanTree:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmp_path, repo, make_git_repo):
+        self.cache_dir = str(tmp_path)
+        self.repo = repo
+        self.git_repo = make_git_repo(repo.location, commit=True)
+        self.args = [
+            '--config', 'no', '--cache-dir', self.cache_dir, '-r', repo.location,
+            '-k', 'InvalidEapi,MissingLicense']
+
+    def scan(self, args):
+        return sorted(x.__class__.__name__ for x in scan(self.args + args))
+
+    def test_tree(self):
+        self.repo.create_ebuild('cat/pkg-0', eapi='-1')
+        self.git_repo.add_all('cat/pkg-0')
+        commit = self.git_repo.HEAD
+        self.repo.create_ebuild('cat/pkg-0')
+        self.git_repo.add_all('cat/pkg: fix EAPI')
+        # uncommitted changes aren't seen
+        self.repo.create_ebuild('cat/pkg-1', license='')
+        # executable files keep their mode
+        os.chmod(pjoin(self.repo.location, 'cat/pkg/pkg-0.ebuild'), 0o755)
+        self.git_repo.add_all('cat/pkg: mode change', signoff=False)
+        self.repo.create_ebuild('cat/pkg-2', license='')
+
+        assert self.scan(['--tree', commit]) == ['InvalidEapi']
+        assert self.scan(['--tree', 'HEAD~1']) == []
+        assert self.scan(['--tree', 'HEAD']) == ['MissingLicense']
+        assert self.scan([]) == ['MissingLicense', 'MissingLicense']
+
+        # trees are stored by hash and share file contents
+        trees_dir = pjoin(
+            caches.repo_cache_dir(self.cache_dir, self.repo), 'trees')
+        trees = [pjoin(trees_dir, x) for x in os.listdir(trees_dir)]
+        assert len(trees) == 3
+        inodes = {
+            os.stat(pjoin(x, 'profiles', 'repo_name')).st_ino for x in trees}
+        assert len(inodes) == 1
+        head = pjoin(trees_dir, self.git_repo.run(
+            ['git', 'rev-parse', 'HEAD^{tree}'], stdout=subprocess.PIPE).stdout.strip())
+        assert os.access(pjoin(head, 'cat/pkg/pkg-0.ebuild'), os.X_OK)
+
+    def test_prune(self):
+        self.repo.create_ebuild('cat/pkg-0', eapi='-1')
+        self.git_repo.add_all('cat/pkg-0')
+        self.repo.create_ebuild('cat/pkg-0')
+        self.git_repo.add_all('cat/pkg: fix EAPI')
+        assert self.scan(['--tree', 'HEAD~1']) == ['InvalidEapi']
+
+        cache_dir = caches.repo_cache_dir(self.cache_dir, self.repo)
+        old_tree = pjoin(cache_dir, 'trees', self.git_repo.run(
+            ['git', 'rev-parse', 'HEAD~1^{tree}'], stdout=subprocess.PIPE).stdout.strip())
+        blobs = {}
+        for rev in ('HEAD~1', 'HEAD'):
+            obj_hash = self.git_repo.run(
+                ['git', 'rev-parse', f'{rev}:cat/pkg/pkg-0.ebuild'],
+                stdout=subprocess.PIPE).stdout.strip()
+            blobs[rev] = pjoin(cache_dir, 'objects', obj_hash[:2], obj_hash[2:])
+        # caches generated for the tree's location
+        old_cache = pjoin(
+            self.cache_dir, 'repos', f'{self.repo.repo_id}-{caches.location_token(old_tree)}')
+        os.makedirs(old_cache)
+        touch(pjoin(old_cache, 'profiles.pickle'))
+
+        # outdated trees are removed along with their caches and unused blobs
+        os.utime(old_tree, (0, 0))
+        assert self.scan(['--tree', 'HEAD']) == []
+        assert not os.path.exists(old_tree)
+        assert not os.path.exists(old_cache)
+        assert not os.path.exists(blobs['HEAD~1'])
+        assert os.path.exists(blobs['HEAD'])
+
+    def test_invalid_rev(self, capsys, tool):
+        with pytest.raises(SystemExit) as excinfo:
+            tool.parse_args(['scan'] + self.args + ['--tree', 'nonexistent'])
+        assert excinfo.value.code == 2
+        out, err = capsys.readouterr()
+        assert err.strip().endswith("--tree: invalid git revision: 'nonexistent'")
+
+
+class TestPkgcheckScanStaged:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmp_path, repo, make_git_repo):
+        self.cache_dir = str(tmp_path)
+        self.repo = repo
+        self.git_repo = make_git_repo(repo.location, commit=True)
+        self.args = [
+            '--config', 'no', '--cache-dir', self.cache_dir, '-r', repo.location,
+            '-k', 'InvalidEapi,MissingLicense', '--staged']
+
+    def scan(self):
+        return sorted(
+            (x.__class__.__name__, x.version) for x in scan(self.args))
+
+    def test_staged(self):
+        self.repo.create_ebuild('cat/pkg-0')
+        self.git_repo.add_all('cat/pkg-0')
+
+        # stage an invalid ebuild and fix it without staging the fix
+        path = self.repo.create_ebuild('cat/pkg-1', eapi='-1')
+        self.git_repo.add('cat/pkg/pkg-1.ebuild', commit=False)
+        self.repo.create_ebuild('cat/pkg-1')
+        # untracked files are ignored
+        self.repo.create_ebuild('cat/pkg-2', license='')
+        with open(path) as f:
+            data = f.read()
+
+        assert self.scan() == [('InvalidEapi', '1')]
+        # the working tree is left untouched
+        with open(path) as f:
+            assert f.read() == data
+        assert os.path.exists(pjoin(self.repo.location, 'cat/pkg/pkg-2.ebuild'))
+
+        # staged changes are updated incrementally
+        self.repo.create_ebuild('cat/pkg-0', license='')
+        self.git_repo.add('cat/pkg/pkg-0.ebuild', commit=False)
+        self.git_repo.add('cat/pkg/pkg-1.ebuild', commit=False)
+        with patch('pkgcheck.addons.git.GitTree._blob', autospec=True,
+                   side_effect=git.GitTree._blob) as blob:
+            assert self.scan() == [('MissingLicense', '0')]
+        # only the blobs for changed files are requested
+        assert len(blob.call_args_list) == 2
+
+    def test_ignored_files(self):
+        with open(pjoin(self.repo.location, '.gitignore'), 'w') as f:
+            f.write('/metadata/md5-cache\n')
+        self.repo.create_ebuild('cat/pkg-0')
+        self.git_repo.add_all('cat/pkg-0')
+        os.makedirs(pjoin(self.repo.location, 'metadata/md5-cache/cat'))
+        touch(pjoin(self.repo.location, 'metadata/md5-cache/cat/pkg-0'))
+        self.repo.create_ebuild('cat/pkg-1')
+        self.git_repo.add('cat/pkg/pkg-1.ebuild', commit=False)
+
+        assert self.scan() == []
+        staged_dir = pjoin(caches.repo_cache_dir(self.cache_dir, self.repo), 'staged')
+        # ignored files fall back to the working tree
+        assert os.path.realpath(pjoin(staged_dir, 'metadata/md5-cache/cat/pkg-0')) == \
+            pjoin(self.repo.location, 'metadata/md5-cache/cat/pkg-0')
+        # ignored directories are linked as a whole
+        assert os.path.islink(pjoin(staged_dir, 'metadata/md5-cache'))
+
+        # so regenerated files don't alter the staged tree state
+        staged_file = pjoin(caches.repo_cache_dir(self.cache_dir, self.repo), 'staged.pickle')
+        mtime = os.stat(staged_file).st_mtime_ns
+        touch(pjoin(self.repo.location, 'metadata/md5-cache/cat/pkg-1'))
+        assert self.scan() == []
+        assert os.stat(staged_file).st_mtime_ns == mtime
+        assert os.path.exists(pjoin(staged_dir, 'metadata/md5-cache/cat/pkg-1'))
+
+        # links are removed for files that are no longer ignored
+        os.unlink(pjoin(self.repo.location, '.gitignore'))
+        self.git_repo.add('.gitignore', commit=False)
+        assert self.scan() == []
+        assert not os.path.lexists(pjoin(staged_dir, 'metadata/md5-cache'))
+
+    def test_history(self, make_repo, make_git_repo):
+        # create a repo with history for a removed package
+        parent_git_repo = make_git_repo()
+        parent_repo = make_repo(parent_git_repo.path)
+        parent_git_repo.add_all('initial commit')
+        parent_repo.create_ebuild('cat/pkg-0')
+        parent_git_repo.add_all('cat/pkg-0')
+        parent_git_repo.remove_all('cat/pkg')
+
+        child_git_repo = make_git_repo()
+        child_git_repo.run(['git', 'remote', 'add', 'origin', parent_git_repo.path])
+        child_git_repo.run(['git', 'pull', 'origin', 'main'])
+        child_git_repo.run(['git', 'remote', 'set-head', 'origin', 'main'])
+        child_repo = make_repo(child_git_repo.path)
+        child_repo.create_ebuild('cat/dep-0', depend='!cat/pkg !nonexistent/pkg')
+        child_git_repo.add('cat/dep/dep-0.ebuild', commit=False)
+
+        # git history is pulled from the original repo
+        args = [
+            '--config', 'no', '--cache-dir', self.cache_dir, '-r', child_repo.location,
+            '-k', 'NonexistentBlocker', '--staged']
+        assert [x.atom for x in scan(args)] == ['!nonexistent/pkg']
+        assert os.path.exists(pjoin(
+            caches.repo_cache_dir(self.cache_dir, child_repo), 'git.db'))
+
+
 class TestGitRepoCommits:
 
     def test_non_git(self, tmp_path):
@@ -367,6 +553,95 @@ class TestGitRepoPkgs:
             assert len(pkgs) == 0
 
 
+class TestGitRepoPkgChunks:
+
+    def test_non_git(self, tmp_path):
+        with pytest.raises(git.GitError, match='failed running git rev-list'):
+            list(git.GitRepoPkgChunks(str(tmp_path), 'HEAD'))
+
+    @pytest.mark.parametrize('jobs', (1, 2))
+    def test_parsing(self, jobs, repo, make_git_repo):
+        git_repo = make_git_repo(repo.location, commit=True)
+        path = git_repo.path
+        repo.create_ebuild('cat/pkg-0')
+        git_repo.add_all('cat/pkg-0')
+        repo.create_ebuild('cat/pkg-1')
+        repo.create_ebuild('cat/pkg-2')
+        git_repo.add_all('cat/pkg-1 and cat/pkg-2')
+        # commits without ebuild changes
+        touch(pjoin(path, 'foo'))
+        git_repo.add_all('foo')
+        git_repo.remove('cat/pkg/pkg-0.ebuild')
+        git_repo.move('cat', 'cat2')
+
+        with patch('pkgcheck.addons.git.GitRepoPkgChunks.chunk_size', 2):
+            commits = list(git.GitRepoPkgChunks(path, 'HEAD', jobs=jobs))
+        # commits are returned in order
+        assert [x[0] for x in commits] == [
+            x.split()[0] for x in git_repo.log(['--format=%h'])]
+        # and match the streaming parser
+        changes = [
+            (status, category, package, version)
+            for _, _, x in commits for status, category, package, version in x]
+        assert changes == [
+            (x.status, x.atom.category, x.atom.package, x.atom.fullver)
+            for x in git.GitRepoPkgs(path, 'HEAD')]
+        assert changes[:2] == [
+            ('A', 'cat2', 'pkg', '1'), ('D', 'cat', 'pkg', '1')]
+
+    def test_malformed(self, repo, make_git_repo):
+        git_repo = make_git_repo(repo.location, commit=True)
+        repo.create_ebuild('cat/pkg-0')
+        git_repo.add_all('cat/pkg-0')
+        with patch('pkgcheck.addons.git.atom_cls') as fake_atom:
+            fake_atom.side_effect = MalformedAtom('bad atom')
+            commits = list(git.GitRepoPkgChunks(git_repo.path, 'HEAD'))
+            assert commits[0][2] == []
+
+
+class TestGitCatFile:
+
+    def test_objects(self, repo, make_git_repo):
+        git_repo = make_git_repo(repo.location, commit=True)
+        repo.create_ebuild('cat/pkg-0')
+        os.makedirs(pjoin(repo.location, 'cat/pkg/files'))
+        with open(pjoin(repo.location, 'cat/pkg/files/foo.patch'), 'w') as f:
+            f.write('foo\n')
+        git_repo.add_all('cat/pkg-0')
+
+        objects = git.GitCatFile(git_repo.path)
+        entries = objects.tree('HEAD:cat/pkg')
+        assert [(mode, name) for mode, name, _ in entries] == [
+            ('40000', 'files'), ('100644', 'pkg-0.ebuild')]
+        obj_hash, obj_type, data = objects.get(entries[1][2])
+        assert obj_hash == entries[1][2]
+        assert obj_type == 'blob'
+        with open(pjoin(repo.location, 'cat/pkg/pkg-0.ebuild'), 'rb') as f:
+            assert data == f.read()
+        assert objects.get('HEAD:cat/pkg/files/foo.patch')[2] == b'foo\n'
+
+        # missing objects and non-tree objects
+        with pytest.raises(git.GitError, match='failed reading git object'):
+            objects.get('HEAD:cat/pkg/pkg-1.ebuild')
+        with pytest.raises(git.GitError, match='invalid git tree object'):
+            objects.tree('HEAD:cat/pkg/pkg-0.ebuild')
+
+        # the running process is reused until closed
+        proc = objects._proc
+        objects.get('HEAD')
+        assert objects._proc is proc
+        objects.close()
+        assert proc.returncode == 0
+        assert objects.get('HEAD')[1] == 'commit'
+        objects.close()
+
+        # processes are terminated when readers are garbage collected
+        objects.get('HEAD')
+        proc = objects._proc
+        del objects
+        assert proc.returncode == 0
+
+
 class TestGitChangedRepo:
 
     def test_pkg_history(self, repo, make_git_repo):
@@ -453,6 +728,41 @@ class TestGitChangedRepo:
         removed_repo = git.GitRemovedRepo(data)
         assert len(removed_repo) == 2
 
+    def test_cache_history(self, tmp_path, repo, make_git_repo):
+        git_repo = make_git_repo(repo.location, commit=True)
+        pkg_history = partial(git.GitAddon.pkg_history, repo)
+        cache = git.GitCache(str(tmp_path / 'git.db'), 1)
+        assert cache.load()
+        assert cache.commit is None
+
+        repo.create_ebuild('cat/pkg-0')
+        git_repo.add_all('cat/pkg-0')
+        repo.create_ebuild('cat/pkg-1')
+        git_repo.add_all('cat/pkg-1')
+        cache.update(pkg_history('HEAD'), git_repo.HEAD)
+        commit = git_repo.HEAD
+
+        # history is appended on updates
+        git_repo.remove('cat/pkg/pkg-0.ebuild')
+        git_repo.move('cat', 'cat2')
+        cache.update(pkg_history(f'{commit}..HEAD'), git_repo.HEAD)
+        cache._close()
+
+        # reloaded caches match dict-based history
+        cache = git.GitCache(cache.path, 1)
+        assert cache.load()
+        assert cache.commit == git_repo.HEAD
+        data = pkg_history('HEAD')
+        for repo_cls in (git.GitChangedRepo, git.GitAddedRepo, git.GitRemovedRepo):
+            assert len(repo_cls(cache)) == len(repo_cls(data))
+            assert sorted(map(str, repo_cls(cache))) == sorted(map(str, repo_cls(data)))
+        assert sorted(git.GitChangedRepo(cache).categories) == ['cat', 'cat2']
+        pkg = next(iter(git.GitRemovedRepo(cache).itermatch(atom_cls('=cat/pkg-0'))))
+        assert pkg.status == 'D'
+
+        # outdated caches are flagged
+        assert not git.GitCache(cache.path, 2).load()
+
 
 class TestGitAddon:
 
@@ -535,13 +845,13 @@ class TestGitAddon:
         self.addon.update_cache()
         assert atom_cls('=cat/pkg-0') in self.addon.cached_repo(git.GitAddedRepo)
 
-        with patch('pkgcheck.addons.caches.CachedAddon.save_cache') as save_cache:
+        with patch('pkgcheck.addons.git.GitCache.update') as update:
             # verify the cache was loaded and not regenerated
             self.addon.update_cache()
-            save_cache.assert_not_called()
+            update.assert_not_called()
             # and is regenerated on a forced cache update
             self.addon.update_cache(force=True)
-            save_cache.assert_called_once()
+            update.assert_called_once()
 
         # create another pkg and commit it to the parent repo
         repo.create_ebuild('cat/pkg-1')
@@ -567,15 +877,17 @@ class TestGitAddon:
         self.addon.update_cache()
         assert atom_cls('=cat/pkg-0') in self.addon.cached_repo(git.GitAddedRepo)
 
-        # increment cache version and dump cache
-        cache = self.addon.load_cache(self.cache_file)
-        cache.version += 1
-        self.addon.save_cache(cache, self.cache_file)
+        # increment cache version
+        with sqlite3.connect(self.cache_file) as db:
+            db.execute(f'PRAGMA user_version = {self.addon.cache.version + 1}')
+        db.close()
 
         # verify cache load causes regen
-        with patch('pkgcheck.addons.caches.CachedAddon.save_cache') as save_cache:
+        with patch('pkgcheck.addons.git.GitCache.update') as update:
             self.addon.update_cache()
-            save_cache.assert_called_once()
+            update.assert_called_once()
+            data, _commit = update.call_args.args
+            assert 'cat' in data
 
     def test_error_creating_cache(self, repo, make_git_repo):
         parent_repo = make_git_repo(repo.location, commit=True)
@@ -588,8 +900,8 @@ class TestGitAddon:
         child_repo.run(['git', 'pull', 'origin', 'main'])
         child_repo.run(['git', 'remote', 'set-head', 'origin', 'main'])
 
-        with patch('pkgcheck.addons.git.GitLog') as git_log:
-            git_log.side_effect = git.GitError('git parsing failed')
+        with patch('pkgcheck.addons.git.GitRepoPkgChunks._parse') as parse:
+            parse.side_effect = git.GitError('git parsing failed')
             with pytest.raises(PkgcheckUserException, match='git parsing failed'):
                 self.addon.update_cache()
 
@@ -606,17 +918,11 @@ class TestGitAddon:
         self.addon.update_cache()
         assert atom_cls('=cat/pkg-0') in self.addon.cached_repo(git.GitAddedRepo)
 
-        with patch('pkgcheck.addons.caches.pickle.load') as pickle_load:
-            # catastrophic errors are raised
-            pickle_load.side_effect = MemoryError('unpickling failed')
-            with pytest.raises(MemoryError, match='unpickling failed'):
-                self.addon.update_cache()
-
-            # but various load failure exceptions cause cache regen
-            pickle_load.side_effect = Exception('unpickling failed')
-            with patch('pkgcheck.addons.caches.CachedAddon.save_cache') as save_cache:
-                self.addon.update_cache()
-                save_cache.assert_called_once()
+        # corrupted caches cause regen
+        with open(self.cache_file, 'wb') as f:
+            f.write(b'\0' * 1024)
+        self.addon.update_cache()
+        assert atom_cls('=cat/pkg-0') in self.addon.cached_repo(git.GitAddedRepo)
 
     def test_error_dumping_cache(self, repo, make_git_repo):
         parent_repo = make_git_repo(repo.location, commit=True)
@@ -630,9 +936,9 @@ class TestGitAddon:
         child_repo.run(['git', 'remote', 'set-head', 'origin', 'main'])
 
         # verify IO related dump failures are raised
-        with patch('pkgcheck.addons.caches.pickle.dump') as pickle_dump:
-            pickle_dump.side_effect = IOError('unpickling failed')
-            with pytest.raises(PkgcheckUserException, match='failed dumping git cache'):
+        with patch('pkgcheck.addons.git.os.makedirs') as makedirs:
+            makedirs.side_effect = IOError('failed creating dir')
+            with pytest.raises(PkgcheckUserException, match='failed updating git cache'):
                 self.addon.update_cache()
 
     def test_commits_repo(self, repo, make_repo, make_git_repo):
@@ -6,7 +6,7 @@ from unittest.mock import patch
 import pytest
 from pkgcheck.base import PkgcheckUserException
 from pkgcheck.checks import git as git_mod
-from pkgcheck.addons.git import GitCommit
+from pkgcheck.addons.git import GitCommit, GitError
 from pkgcore.ebuild.cpv import VersionedCPV as CPV
 from pkgcore.test.misc import FakeRepo
 from snakeoil.cli import arghparse
@@ -385,6 +385,11 @@ class TestGitPkgCommitsCheck(ReportTestCase):
         options, _ = self._tool.parse_args(args)
         return options
 
+    def test_uncacheable(self):
+        # results depend on git history so they can't be cached per package
+        for check in (self.check_kls, git_mod.GitCommitMessageCheck, git_mod.GitEclassCommitsCheck):
+            assert not check.cacheable
+
     def test_broken_ebuilds_ignored(self):
         self.child_repo.create_ebuild('newcat/pkg-1', eapi='-1')
         self.child_git_repo.add_all('newcat/pkg: initial import')
@@ -447,9 +452,9 @@ class TestGitPkgCommitsCheck(ReportTestCase):
         expected = git_mod.DroppedStableKeywords(['amd64'], commit, pkg=CPV('cat/pkg-1'))
         assert r == expected
 
-        # git archive failures error out
-        with patch('pkgcheck.checks.git.subprocess.Popen') as git_archive:
-            git_archive.return_value.poll.return_value = -1
+        # git object reading failures error out
+        with patch('pkgcheck.addons.git.GitCatFile.get') as get:
+            get.side_effect = GitError('failed reading git object')
             with pytest.raises(PkgcheckUserException, match='failed populating archive repo'):
                 self.assertNoReport(self.check, self.source)
 
@@ -538,9 +543,9 @@ class TestGitPkgCommitsCheck(ReportTestCase):
         self.init_check()
         self.assertNoReport(self.check, self.source)
 
-        # git archive failures error out
-        with patch('pkgcheck.checks.git.subprocess.Popen') as git_archive:
-            git_archive.return_value.poll.return_value = -1
+        # git object reading failures error out
+        with patch('pkgcheck.addons.git.GitCatFile.get') as get:
+            get.side_effect = GitError('failed reading git object')
             with pytest.raises(PkgcheckUserException, match='failed populating archive repo'):
                 self.assertNoReport(self.check, self.source)
 
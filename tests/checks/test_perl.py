@@ -2,6 +2,7 @@ from unittest.mock import patch
 
 import pytest
 from pkgcheck.checks import SkipCheck, perl
+from pkgcheck.packages import EbuildContent
 from snakeoil.cli import arghparse
 
 from .. import misc
@@ -34,7 +35,8 @@ class TestPerlCheck(misc.ReportTestCase):
             lines.append(f'DIST_VERSION={dist_version}\n')
         kwargs.setdefault('EAPI', '7')
         kwargs.setdefault('_eclasses_', list(eclasses))
-        return misc.FakePkg(f'app-foo/bar-{PVR}', lines=lines, data=kwargs)
+        content = EbuildContent(''.join(lines).encode())
+        return misc.FakePkg(f'app-foo/bar-{PVR}', content=content, data=kwargs)
 
     def test_matching(self):
         """Ebuilds with matching DIST_VERSION and package version."""
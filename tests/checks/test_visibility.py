@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from pkgcheck.checks import visibility
+
+
+class TestVisibilityCheck:
+
+    def test_split_profiles(self):
+        # stable and unstable profiles for 4 profile indexes
+        stable = [SimpleNamespace(bit=1 << (i * 2)) for i in range(4)]
+        unstable = [SimpleNamespace(bit=1 << (i * 2 + 1)) for i in range(4)]
+        check = visibility.VisibilityCheck.__new__(visibility.VisibilityCheck)
+
+        for profiles in (stable + unstable, unstable):
+            solved = []
+            def solve(restrict, bits, profiles):
+                solved.append(bits)
+                return 0, []
+            with patch.object(check, '_solve', solve, create=True):
+                for part in range(2):
+                    check._split = (part, 2)
+                    list(check.process_depset(None, 'RDEPEND', None, None, profiles))
+            # profiles are spread across all parts, keeping stable and
+            # unstable profiles for the same index together
+            assert len(solved) == 2
+            assert sum(solved) == sum(x.bit for x in profiles)
+            if len(profiles) == 8:
+                assert solved == [0b00110011, 0b11001100]
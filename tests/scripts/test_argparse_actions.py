@@ -120,7 +120,16 @@ class TestCacheNegations:
             if k == cache:
                 assert v is False
             else:
-                assert v is True
+                assert v is argparse_actions.CacheNegations.caches[k]
+
+    @pytest.mark.parametrize('cache', ('results', 'syntax'))
+    def test_disabled_by_default(self, cache):
+        options = self.parser.parse_args([])
+        assert options.cache[cache] is False
+        options = self.parser.parse_args(['--cache=-git'])
+        assert options.cache[cache] is False
+        options = self.parser.parse_args(['--cache', cache])
+        assert options.cache[cache] is True
 
 
 class TestChecksetArgs:
@@ -0,0 +1,34 @@
+import io
+import json
+from functools import partial
+from unittest.mock import patch
+
+import pytest
+from pkgcheck.scripts import run
+
+
+class TestPkgcheckLsp:
+
+    script = partial(run, 'pkgcheck')
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, testconfig, tmp_path):
+        self.args = [
+            'pkgcheck', '--config', testconfig, 'lsp',
+            '--config', 'no', '--cache-dir', str(tmp_path)]
+
+    def test_lifecycle(self, repo):
+        data = b''
+        for msg in ({'id': 1, 'method': 'shutdown'}, {'method': 'exit'}):
+            body = json.dumps({'jsonrpc': '2.0', **msg}).encode()
+            data += f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+        stdin, stdout = io.TextIOWrapper(io.BytesIO(data)), io.TextIOWrapper(io.BytesIO())
+        with patch('sys.argv', self.args + ['-r', repo.location]), \
+                patch('sys.stdin', stdin), patch('sys.stdout', stdout):
+            with pytest.raises(SystemExit) as excinfo:
+                self.script()
+            stdout.flush()
+            output = stdout.buffer.getvalue()
+        assert excinfo.value.code == 0
+        assert json.loads(output.partition(b'\r\n\r\n')[2]) == {
+            'jsonrpc': '2.0', 'id': 1, 'result': None}
@@ -1,9 +1,12 @@
+import json
+import logging
 import os
 import shlex
 import shutil
 import subprocess
 import tempfile
 import textwrap
+import time
 from collections import defaultdict
 from functools import partial
 from io import StringIO
@@ -15,7 +18,11 @@ from pkgcheck import __title__ as project
 from pkgcheck import base
 from pkgcheck import checks as checks_mod
 from pkgcheck import const, objects, reporters, scan
+from pkgcheck.addons.caches import repo_cache_dir
+from pkgcheck.pipeline import Pipeline, WorkCosts
+from pkgcheck.runners import SyncCheckRunner
 from pkgcheck.scripts import run
+from pkgcheck.transport import SharedMemoryQueue
 from pkgcore import const as pkgcore_const
 from pkgcore.ebuild import atom, restricts
 from pkgcore.restrictions import packages
@@ -431,6 +438,268 @@ class TestPkgcheckScan:
         results = list(self.scan(self.scan_args + ['-r', repo.location, 'cat/unknown']))
         assert not results
 
+    def test_schedule_cost(self, repo):
+        repo.create_ebuild('cat/pkg-0', eapi='-1')
+        repo.create_ebuild('cat/pkg-1', eapi='-1')
+        repo.create_ebuild('other/pkg-0', eapi='-1')
+        args = self.scan_args + ['-r', repo.location, '-k', 'InvalidEapi', '--schedule', 'cost']
+        costs_file = pjoin(
+            repo_cache_dir(self.cache_dir, repo), 'costs.pickle')
+
+        # initial run records work costs
+        pipe = self.scan(args)
+        results = sorted(pipe)
+        assert [x.version for x in results] == ['0', '1', '0']
+        assert os.path.exists(costs_file)
+        costs = WorkCosts(pipe.options)
+        # costs are shared by all versions of a package
+        assert {restrict for restrict, _ in costs._costs} == {'cat/pkg', 'other/pkg'}
+        assert costs.expected('cat/pkg', ()) == 0
+
+        # later runs use them for scheduling without altering results
+        assert sorted(self.scan(args)) == results
+
+        # targeted scans keep costs for unscanned packages
+        shutil.rmtree(pjoin(repo.location, 'other'))
+        list(self.scan(args + ['cat/pkg']))
+        costs = WorkCosts(pipe.options)
+        assert {restrict for restrict, _ in costs._costs} == {'cat/pkg', 'other/pkg'}
+
+        # while full scans drop costs for work that wasn't run
+        list(self.scan(args))
+        costs = WorkCosts(pipe.options)
+        assert {restrict for restrict, _ in costs._costs} == {'cat/pkg'}
+
+        # repo order scheduling doesn't record costs
+        repo.create_ebuild('other/pkg-0', eapi='-1')
+        os.unlink(costs_file)
+        assert sorted(self.scan(args[:-2])) == results
+        assert not os.path.exists(costs_file)
+
+    def test_results_cache(self, repo):
+        repo.create_ebuild('cat/pkg-0', eapi='-1')
+        repo.create_ebuild('cat/pkg-1', eapi='-1')
+        repo.create_ebuild('other/pkg-0', eapi='-1')
+        args = self.scan_args + ['-r', repo.location, '-k', 'InvalidEapi', '--cache', 'results']
+        db_file = pjoin(repo_cache_dir(self.cache_dir, repo), 'results.db')
+
+        # initial run populates the cache
+        results = sorted(self.scan(args))
+        assert [x.version for x in results] == ['0', '1', '0']
+        assert os.path.exists(db_file)
+
+        # unchanged packages replay cached results without running checks
+        with patch('pkgcheck.runners.SyncCheckRunner._run') as run:
+            run.side_effect = Exception('checks run')
+            assert sorted(self.scan(args)) == results
+
+        # modified packages are rescanned
+        repo.create_ebuild('cat/pkg-1', eapi='7')
+        assert [x.version for x in sorted(self.scan(args))] == ['0', '0']
+
+        # options altering check results use separate cached results
+        for opts in (['-v'], ['-k', 'InvalidEapi,InvalidSlot'], ['--net'], ['--glsa-dir', repo.location]):
+            with patch('pkgcheck.runners.SyncCheckRunner._run') as run:
+                run.side_effect = Exception('checks run')
+                with pytest.raises(base.PkgcheckUserException, match='checks run'):
+                    list(self.scan(args + opts))
+            assert [x.version for x in sorted(self.scan(args + opts))] == ['0', '0']
+            # while results for other options are kept
+            with patch('pkgcheck.runners.SyncCheckRunner._run') as run:
+                run.side_effect = Exception('checks run')
+                assert [x.version for x in sorted(self.scan(args))] == ['0', '0']
+
+        # repo file timestamps don't affect cached results, e.g. for fresh clones
+        for root, _dirs, files in os.walk(pjoin(repo.location, 'profiles')):
+            for name in files:
+                os.utime(pjoin(root, name), (0, 0))
+        with patch('pkgcheck.runners.SyncCheckRunner._run') as run:
+            run.side_effect = Exception('checks run')
+            assert [x.version for x in sorted(self.scan(args))] == ['0', '0']
+
+        # global repo changes invalidate all cached results
+        with open(pjoin(repo.location, 'metadata', 'layout.conf'), 'a') as f:
+            f.write('# modified\n')
+        with patch('pkgcheck.runners.SyncCheckRunner._run') as run:
+            run.side_effect = Exception('checks run')
+            with pytest.raises(base.PkgcheckUserException, match='checks run'):
+                list(self.scan(args))
+
+    def test_syntax_cache(self, repo):
+        repo.create_ebuild('cat/pkg-0', data='src_install() { cat ${T}/foo; }')
+        args = self.scan_args + [
+            '-r', repo.location, '-k', 'EbuildUnquotedVariable', '--cache', 'syntax']
+        db_file = pjoin(repo_cache_dir(self.cache_dir, repo), 'syntax.db')
+
+        # initial run populates the cache
+        results = list(self.scan(args))
+        assert [x.variable for x in results] == ['T']
+        assert os.path.exists(db_file)
+
+        # unchanged ebuilds reuse cached syntax facts without being parsed
+        with patch('pkgcheck.bash.parser') as parser:
+            parser.parse.side_effect = Exception('ebuild parsed')
+            assert list(self.scan(args)) == results
+
+        # modified ebuilds are parsed
+        repo.create_ebuild('cat/pkg-0', data='src_install() { cat "${T}"/foo; }')
+        with patch('pkgcheck.bash.parser') as parser:
+            parser.parse.side_effect = Exception('ebuild parsed')
+            with pytest.raises(base.PkgcheckUserException, match='ebuild parsed'):
+                list(self.scan(args))
+        assert not list(self.scan(args))
+
+    def test_sharded_repo_checks(self, repo):
+        repo.create_ebuild('cat/pkg-0', license='foo')
+        repo.create_ebuild('cat/pkg-1', license='foo')
+        repo.create_ebuild('other/pkg-0', license='bar')
+        touch(pjoin(repo.location, 'licenses', 'unused'))
+        args = self.scan_args + ['-r', repo.location, '-c', 'UnusedLicensesCheck', '-j2']
+
+        # repo checks are fed per category and merged instead of run serially
+        with patch('pkgcheck.runners.RepoCheckRunner.run') as run:
+            run.side_effect = Exception('unsharded run')
+            results = list(self.scan(args))
+        assert len(results) == 1
+        assert results[0].licenses == ('unused',)
+
+        # unmergeable checks force serial runs
+        with patch('pkgcheck.checks.repo_metadata.UnusedLicensesCheck.mergeable', False):
+            assert list(self.scan(args)) == results
+
+    @pytest.mark.parametrize('verbosity', ([], ['-v']))
+    def test_split_work(self, verbosity):
+        repo_dir = pjoin(self.repos_dir, 'visibility')
+        args = self.scan_args + verbosity + [
+            '-r', repo_dir, '-c', 'VisibilityCheck', '-p', 'all', '-j4']
+        expected = sorted(self.scan(args))
+        assert expected
+
+        # expensive units are split into parts checking separate profiles
+        with patch('pkgcheck.pipeline.WorkCosts.expected', return_value=10), \
+                patch('pkgcheck.runners.SplitCheckRunner.run') as run:
+            run.side_effect = Exception('unsplit run')
+            assert sorted(self.scan(args + ['--schedule', 'cost'])) == expected
+
+    def test_ordered_output(self, repo):
+        for pkg in ('cat/a-0', 'cat/b-0', 'other/a-0', 'other/b-0'):
+            repo.create_ebuild(pkg, eapi='-1')
+        args = self.scan_args + ['-r', repo.location, '-k', 'InvalidEapi']
+        expected = list(self.scan(args + ['-j1']))
+        assert [f'{x.category}/{x.package}' for x in expected] == [
+            'cat/a', 'cat/b', 'other/a', 'other/b']
+
+        # results are output in work unit order even if units finish out of order
+        run = SyncCheckRunner.run
+        def delayed_run(self, restrict=packages.AlwaysTrue):
+            if getattr(restrict, 'key', None) == 'cat/a':
+                time.sleep(0.5)
+            return run(self, restrict)
+        with patch('pkgcheck.runners.SyncCheckRunner.run', delayed_run), \
+                patch('pkgcheck.pipeline.Pipeline._chunk_size', 1):
+            assert list(self.scan(args + ['-j4'])) == expected
+
+            # when scheduled by cost, results are output in queued order
+            costs = {'cat/a': 1, 'cat/b': 0, 'other/a': 3, 'other/b': 2}
+            def expected_cost(self, restrict, runners):
+                return costs[restrict.key]
+            with patch('pkgcheck.pipeline.WorkCosts.expected', expected_cost):
+                for _ in range(2):
+                    results = list(self.scan(args + ['-j4', '--schedule', 'cost']))
+                    assert [f'{x.category}/{x.package}' for x in results] == [
+                        'other/a', 'other/b', 'cat/a', 'cat/b']
+
+    def test_chunk_size(self, tool, repo):
+        repo.create_ebuild('cat/pkg-0')
+        for jobs, units, size in ((4, 4, 1), (4, 40, 2), (2, 1000, 16), (1, 10, 2)):
+            options, _ = tool.parse_args(
+                ['scan'] + self.scan_args + ['-r', repo.location, '-j', str(jobs)])
+            pipe = Pipeline(options)
+            chunks = list(pipe._chunk_work([(0, x) for x in range(units)]))
+            # chunks are scaled down so smaller scans are spread across processes
+            assert max(map(len, chunks)) == size, (jobs, units)
+            assert sum(map(len, chunks)) == units
+
+        # work is consumed using a bounded lookahead
+        work = ((0, x) for x in range(10000))
+        next(pipe._chunk_work(work))
+        assert next(work) == (0, 4 * 16)
+
+    def test_shm_transport(self, repo):
+        for pkg in ('cat/a-0', 'cat/b-0', 'other/a-0', 'other/b-0'):
+            repo.create_ebuild(pkg, eapi='-1')
+        args = self.scan_args + ['-r', repo.location, '-k', 'InvalidEapi', '-j2']
+        expected = list(self.scan(args))
+        assert len(expected) == 4
+        # results are passed through per-process ring buffers
+        get = SharedMemoryQueue.get
+        with patch.object(SharedMemoryQueue, 'get', autospec=True, side_effect=get) as shm_get, \
+                patch.object(SharedMemoryQueue, 'ring_size', 64):
+            assert list(self.scan(args + ['--transport', 'shm'])) == expected
+        assert shm_get.called
+
+    def test_timings(self, capsys, repo):
+        repo.create_ebuild('cat/pkg-0')
+        repo.create_ebuild('other/pkg-0')
+        args = ['-r', repo.location, '-c', 'EapiCheck', '--timings', '1']
+        with patch('sys.argv', self.args + args):
+            with pytest.raises(SystemExit) as excinfo:
+                self.script()
+            assert excinfo.value.code == 0
+        out, err = capsys.readouterr()
+        assert not out
+        lines = err.splitlines()
+        assert lines[0].split() == ['name', 'total', 'mean', 'p95', 'max']
+        names = [x.split()[0] for x in lines if not x.startswith(' ')]
+        assert 'EapiCheck' in names
+        slowest = [x for x in lines if x.startswith('  slowest: ')]
+        assert slowest and all(x.count('/pkg (') == 1 for x in slowest)
+
+        # timings aren't output by default
+        with patch('sys.argv', self.args + args[:-2]):
+            with pytest.raises(SystemExit):
+                self.script()
+        out, err = capsys.readouterr()
+        assert not out and not err
+
+    def test_cache_stats(self, caplog, repo):
+        repo.create_ebuild('cat/pkg-0', depend='other/pkg')
+        repo.create_ebuild('other/pkg-0')
+        args = self.scan_args + ['-r', repo.location, '-c', 'VisibilityCheck', '-j2']
+        # query cache stats from worker processes are logged when debugging
+        with caplog.at_level(logging.DEBUG, logger='pkgcheck'):
+            list(self.scan(args))
+        stats = [x.message for x in caplog.records if 'LRUCache' in x.message]
+        assert stats and all(x.startswith('VisibilityCheck: ') for x in stats)
+        assert any(x.startswith('VisibilityCheck: query_cache: ') for x in stats)
+
+        caplog.clear()
+        list(self.scan(args))
+        assert not any('LRUCache' in x.message for x in caplog.records)
+
+    def test_trace(self, repo, tmp_path):
+        repo.create_ebuild('cat/pkg-0')
+        repo.create_ebuild('other/pkg-0', eapi='-1')
+        trace_file = str(tmp_path / 'trace.json')
+        args = ['-r', repo.location, '-k', 'InvalidEapi', '-j2', '--trace', trace_file]
+        results = list(self.scan(self.scan_args + args))
+        assert [x.name for x in results] == ['InvalidEapi']
+
+        with open(trace_file) as f:
+            events = json.load(f)['traceEvents']
+        assert not any(x.name.startswith('.pkgcheck-trace-') for x in tmp_path.iterdir())
+        tracks = {x['args']['name'].split()[0] for x in events if x['ph'] == 'M'}
+        assert tracks == {'pkgcheck', 'pipeline', 'worker'}
+        spans = {(x['cat'], x['name']) for x in events if x['ph'] == 'X'}
+        assert ('addon init', 'SourcingCheck') in spans
+        assert ('check', 'SourcingCheck') in spans
+        assert ('work queue', 'get') in spans
+        assert ('results queue', 'put') in spans
+        assert ('results queue', 'get') in spans
+        # checks are run in worker processes
+        workers = {x['pid'] for x in events if x.get('cat') == 'check'}
+        assert workers and os.getpid() not in workers
+
     def test_explict_skip_check(self, capsys):
         """SkipCheck exceptions are raised when triggered for explicitly enabled checks."""
         error = 'network checks not enabled'
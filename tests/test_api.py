@@ -1,10 +1,14 @@
 import multiprocessing
 import os
 import signal
+from unittest.mock import patch
 
 import pytest
-from pkgcheck import PkgcheckException, scan
+from pkgcheck import PkgcheckException, Scanner, scan
 from pkgcheck import objects
+from pkgcheck.addons.profiles import ProfileAddon
+
+from .misc import Profile
 
 
 class TestScanApi:
@@ -71,3 +75,65 @@ class TestScanApi:
             os.kill(p.pid, signal.SIGINT)
             p.join()
             assert p.exitcode == 0
+
+
+class TestScanner:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmp_path):
+        self.scan_args = ['--config', 'no', '--cache-dir', str(tmp_path)]
+
+    def test_scan(self, repo):
+        repo.create_ebuild('cat/pkg-0', eapi='-1')
+        repo.create_ebuild('other/pkg-0', eapi='-1')
+        args = self.scan_args + ['-r', repo.location, '-k', 'InvalidEapi,MissingLicense']
+        scanner = Scanner(args)
+        expected = list(scan(args))
+        assert len(expected) == 2
+        assert list(scanner.scan()) == expected
+        assert list(scanner.scan(['cat/pkg'])) == expected[:1]
+        assert list(scanner.scan(['other/pkg'])) == expected[1:]
+
+        # addons are reused while checks are reinitialized
+        with patch('pkgcheck.addons.UseAddon.__init__') as init:
+            init.side_effect = Exception('addon reinitialized')
+            assert list(scanner.scan()) == expected
+
+        with pytest.raises(PkgcheckException, match='no targets'):
+            scanner.scan([])
+
+    def test_profiles(self, repo):
+        repo.create_profiles([Profile('default/x86', 'x86'), Profile('default/ppc', 'ppc')])
+        repo.arches.update(['x86', 'ppc'])
+        repo.create_ebuild('cat/pkg-0', keywords=['x86'])
+        repo.create_ebuild('other/pkg-0', keywords=['~ppc'])
+        args = self.scan_args + ['-r', repo.location, '-k', 'NonsolvableDepsInStable']
+        scanner = Scanner(args + ['cat/pkg'])
+        list(scanner.scan())
+        profile_addon = scanner._addons[ProfileAddon]
+
+        # profiles are only loaded for the arches used by targeted packages
+        assert sorted(profile_addon.profile_filters) == ['x86', '~x86']
+        # and profiles for new targets are loaded before scanning
+        list(scanner.scan(['other/pkg']))
+        assert sorted(profile_addon.profile_filters) == ['ppc', 'x86', '~ppc', '~x86']
+
+    def test_head_change(self, make_git_repo, make_repo):
+        git_repo = make_git_repo()
+        repo = make_repo(git_repo.path)
+        repo.create_ebuild('cat/pkg-0', eapi='-1')
+        git_repo.add_all('cat/pkg-0')
+        scanner = Scanner(self.scan_args + ['-r', repo.location, '-k', 'InvalidEapi'])
+        options = scanner.options
+        assert len(list(scanner.scan())) == 1
+
+        # uncommitted changes don't reinitialize the scanner
+        repo.create_ebuild('cat/pkg-1', eapi='-1')
+        list(scanner.scan())
+        assert scanner.options is options
+
+        # repo data is refreshed when HEAD changes
+        git_repo.add_all('cat/pkg-1')
+        results = list(scanner.scan())
+        assert scanner.options is not options
+        assert [x.version for x in results] == ['0', '1']
@@ -0,0 +1,116 @@
+import pickle
+import textwrap
+from unittest.mock import patch
+
+from pkgcheck import bash
+
+
+class TestParseTree:
+
+    data = textwrap.dedent("""\
+        EAPI=7
+        inherit foo
+        DESCRIPTION="${PN} test"
+        if true; then
+            bar() { baz "${T}"; }
+        fi
+
+        src_prepare() {
+            local x=1
+            default
+            einfo "${x}"
+        }
+
+        src_install() {
+            sub() { doins "${D}"; }
+            sub
+        }
+    """).encode()
+
+    def test_nodes(self):
+        tree = bash.ParseTree(self.data)
+        for kind, node_type in bash.node_types.items():
+            query = bash.query(f'({node_type}) @{kind}')
+            expected = [x for x, _ in query.captures(tree.tree.root_node)]
+            assert tree.nodes(kind) == expected
+            global_nodes, func_nodes = [], []
+            for x in tree.tree.root_node.children:
+                nodes = func_nodes if x.type == 'function_definition' else global_nodes
+                nodes.extend(node for node, _ in query.captures(x))
+            assert tree.global_nodes(kind) == global_nodes
+            assert tree.func_nodes(kind) == func_nodes
+            for func_node in tree.nodes('func'):
+                expected = [x for x, _ in query.captures(func_node)]
+                assert tree.nodes(kind, func_node) == expected
+
+    def test_single_query(self):
+        tree = bash.ParseTree(self.data)
+        with patch('pkgcheck.bash.nodes_query') as nodes_query:
+            nodes_query.captures.return_value = []
+            for kind in bash.node_types:
+                tree.nodes(kind)
+                tree.global_nodes(kind)
+                tree.func_nodes(kind)
+            assert nodes_query.captures.call_count == 1
+
+    def test_facts(self):
+        tree = bash.ParseTree(self.data)
+        facts = pickle.loads(pickle.dumps(tree.facts))
+        restored = bash.ParseTree(self.data, facts=facts)
+        assert restored.has_error == tree.has_error
+
+        def attrs(parse_tree, node):
+            name = None
+            if node.type in ('command', 'function_definition', 'variable_assignment'):
+                name = parse_tree.node_str(node.child_by_field_name('name'))
+            return (
+                node.type, node.start_point, node.end_point,
+                parse_tree.node_str(node), name)
+
+        for kind in bash.node_types:
+            for nodes in ('nodes', 'global_nodes', 'func_nodes'):
+                expected = [attrs(tree, x) for x in getattr(tree, nodes)(kind)]
+                assert [attrs(restored, x) for x in getattr(restored, nodes)(kind)] == expected
+
+        # ancestors are retained
+        for node, restored_node in zip(tree.nodes('var'), restored.nodes('var')):
+            while node is not None:
+                assert attrs(restored, restored_node) == attrs(tree, node)
+                node, restored_node = node.parent, restored_node.parent
+            assert restored_node is None
+
+        # children of variable assignments are retained
+        for node, restored_node in zip(tree.nodes('assign'), restored.nodes('assign')):
+            assert tree.node_str(node.children[-1]) == restored.node_str(restored_node.children[-1])
+
+        # facts are used in place of parsing
+        with patch('pkgcheck.bash.parser') as parser:
+            restored = bash.ParseTree(self.data, facts=facts)
+            assert restored.nodes('cmd')
+            assert restored.facts is facts
+            assert not parser.parse.called
+
+    def test_edit(self):
+        tree = bash.ParseTree(self.data)
+        tree.nodes('cmd')
+        # replace 'default' with a multiline command
+        start = self.data.index(b'default')
+        row = self.data[:start].count(b'\n')
+        col = start - self.data.rindex(b'\n', 0, start) - 1
+        new = b'eapply "${FILESDIR}"/foo.patch\n\tdefault'
+        data = self.data[:start] + new + self.data[start + 7:]
+        edit = (
+            start, start + 7, start + len(new),
+            (row, col), (row, col + 7), (row + 1, len(b'\tdefault')))
+        old_tree = tree.tree
+        parse = bash.parser.parse
+        with patch('pkgcheck.bash.parser') as parser:
+            parser.parse.side_effect = parse
+            tree.edit(data, [edit])
+            parser.parse.assert_called_once_with(data, old_tree)
+        expected = bash.ParseTree(data)
+        assert tree.data == data
+        assert tree.tree.root_node.sexp() == expected.tree.root_node.sexp()
+        for kind in bash.node_types:
+            assert list(map(tree.node_str, tree.nodes(kind))) == \
+                list(map(expected.node_str, expected.nodes(kind)))
@@ -13,22 +13,48 @@ class TestQueryCacheAddon:
         self.args = ['scan']
 
     def test_opts(self):
-        for val in ('version', 'package', 'category'):
-            options, _ = self.tool.parse_args(self.args + ['--reset-caching-per', val])
-            assert options.query_caching_freq == val
+        options, _ = self.tool.parse_args(self.args + ['--query-cache-size', '10'])
+        assert options.query_cache_size == 10
 
     def test_default(self):
         options, _ = self.tool.parse_args(self.args)
-        assert options.query_caching_freq == 'package'
+        assert options.query_cache_size == 10000
+
+    def test_deprecated_opts(self):
+        # deprecated options are still accepted
+        for val in ('version', 'package', 'category'):
+            options, _ = self.tool.parse_args(self.args + ['--reset-caching-per', val])
+            assert options.query_caching_freq == val
+            assert options.query_cache_size == 10000
 
     def test_feed(self):
         options, _ = self.tool.parse_args(self.args)
         addon = feeds.QueryCache(options)
-        assert addon.options.query_caching_freq == 'package'
         addon.query_cache['foo'] = 'bar'
         pkg = FakePkg('dev-util/diffball-0.5')
         addon.feed(pkg)
-        assert not addon.query_cache
+        # cached queries persist across packages
+        assert addon.query_cache['foo'] == 'bar'
+
+    def test_lru(self):
+        options, _ = self.tool.parse_args(self.args + ['--query-cache-size', '2'])
+        addon = feeds.QueryCache(options)
+        cache = addon.query_cache
+        cache['a'] = 1
+        cache['b'] = 2
+        assert cache.get('a') == 1
+        assert cache.get('c') is None
+        # least recently used entry is discarded when full
+        cache['c'] = 3
+        assert list(cache) == ['a', 'c']
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_cache_stats(self):
+        options, _ = self.tool.parse_args(self.args)
+        addon = feeds.QueryCache(options)
+        addon.query_cache.get('a')
+        assert list(addon.cache_stats()) == [
+            'QueryCache: query_cache: LRUCache(size=0, maxsize=10000, hits=0, misses=1)']
 
 
 class TestEvaluateDepSet:
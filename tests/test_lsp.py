@@ -0,0 +1,164 @@
+import io
+import json
+
+import pytest
+from pkgcheck.lsp import Document, Server
+
+
+def messages(*msgs):
+    """Encode messages using the base protocol's header framing."""
+    data = b''
+    for msg in msgs:
+        body = json.dumps({'jsonrpc': '2.0', **msg}).encode()
+        data += f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+    return data
+
+
+def replies(data):
+    """Decode all written messages."""
+    msgs = []
+    while data:
+        header, _, data = data.partition(b'\r\n\r\n')
+        length = int(header.split(b':')[1])
+        msgs.append(json.loads(data[:length]))
+        data = data[length:]
+    return msgs
+
+
+class TestDocument:
+
+    def test_change(self):
+        doc = Document('/path', 'foo\nbär\U0001f600baz\n')
+        # UTF-16 positions are converted to byte offsets
+        edits = doc.change([{
+            'range': {
+                'start': {'line': 1, 'character': 3},
+                'end': {'line': 1, 'character': 5}},
+            'text': 'x\ny'}])
+        assert doc.data == 'foo\nbärx\nybaz\n'.encode()
+        assert edits == [(8, 12, 11, (1, 4), (1, 8), (2, 1))]
+        assert doc.lines == [0, 4, 10, 15]
+
+        doc = Document('/path', 'foo\nbär\n', encoding='utf-8')
+        edits = doc.change([{
+            'range': {
+                'start': {'line': 1, 'character': 1},
+                'end': {'line': 1, 'character': 3}},
+            'text': 'a'}])
+        assert doc.data == b'foo\nbar\n'
+        assert edits == [(5, 7, 6, (1, 1), (1, 3), (1, 2))]
+
+        # full document replacements don't generate edits
+        assert doc.change([{'text': 'bar\n'}]) is None
+        assert doc.data == b'bar\n'
+
+
+class TestServer:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmp_path, repo):
+        self.repo = repo
+        self.args = [
+            '--config', 'no', '--cache-dir', str(tmp_path), '-r', repo.location,
+            '-k', 'WhitespaceFound,BannedEapiCommand,BadDescription']
+        self.path = repo.create_ebuild(
+            'cat/pkg-0', description='foo', data='src_install() { dohtml foo; }')
+        self.uri = f'file://{self.path}'
+        with open(self.path) as f:
+            self.text = f.read()
+
+    def run(self, *msgs):
+        instream, outstream = io.BytesIO(messages(*msgs)), io.BytesIO()
+        server = Server(self.args, instream, outstream)
+        status = server.run()
+        return status, replies(outstream.getvalue())
+
+    def diagnostics(self, msg):
+        assert msg['method'] == 'textDocument/publishDiagnostics'
+        assert msg['params']['uri'] == self.uri
+        return sorted(
+            (x['code'], x['range']['start']['line'])
+            for x in msg['params']['diagnostics'])
+
+    def test_lifecycle(self):
+        status, (init, unknown, shutdown) = self.run(
+            {'id': 1, 'method': 'initialize', 'params': {'capabilities': {}}},
+            {'method': 'initialized', 'params': {}},
+            {'id': 2, 'method': 'workspace/symbol', 'params': {}},
+            {'method': '$/cancelRequest', 'params': {'id': 2}},
+            {'id': 3, 'method': 'shutdown'},
+            {'method': 'exit'},
+        )
+        assert status == 0
+        assert init['id'] == 1
+        assert init['result']['capabilities']['textDocumentSync']['change'] == 2
+        assert init['result']['capabilities']['positionEncoding'] == 'utf-16'
+        assert unknown['error']['code'] == -32601
+        assert shutdown == {'jsonrpc': '2.0', 'id': 3, 'result': None}
+
+        # exiting without a shutdown request
+        status, _ = self.run({'method': 'exit'})
+        assert status == 1
+
+    def test_diagnostics(self):
+        lineno = self.text.splitlines().index('src_install() { dohtml foo; }')
+        doc = {'uri': self.uri, 'version': 1}
+        status, (init, opened, changed, saved, closed, shutdown) = self.run(
+            {'id': 1, 'method': 'initialize', 'params': {'capabilities': {}}},
+            {'method': 'textDocument/didOpen', 'params': {'textDocument': {
+                **doc, 'languageId': 'ebuild', 'text': self.text}}},
+            # add trailing whitespace and fix the banned command
+            {'method': 'textDocument/didChange', 'params': {
+                'textDocument': doc, 'contentChanges': [
+                    {'range': {
+                        'start': {'line': lineno, 'character': 16},
+                        'end': {'line': lineno, 'character': 22}},
+                     'text': 'dodoc'},
+                    {'range': {
+                        'start': {'line': 0, 'character': 0},
+                        'end': {'line': 0, 'character': 0}},
+                     'text': ' '},
+                ]}},
+            {'method': 'textDocument/didSave', 'params': {'textDocument': doc}},
+            {'method': 'textDocument/didClose', 'params': {'textDocument': doc}},
+            {'id': 2, 'method': 'shutdown'},
+            {'method': 'exit'},
+        )
+        assert self.diagnostics(opened) == [
+            ('BadDescription', 0), ('BannedEapiCommand', lineno)]
+        # results for file contents are regenerated from the edited buffer
+        assert self.diagnostics(changed) == [('BadDescription', 0), ('WhitespaceFound', 0)]
+        # saving rescans on-disk data while the buffer's contents are used
+        assert self.diagnostics(saved) == [('BadDescription', 0), ('WhitespaceFound', 0)]
+        assert closed['params']['diagnostics'] == []
+
+    def test_incremental_parsing(self):
+        doc = {'uri': self.uri, 'version': 1}
+        instream, outstream = io.BytesIO(messages(
+            {'method': 'textDocument/didOpen', 'params': {'textDocument': {
+                **doc, 'languageId': 'ebuild', 'text': self.text}}},
+            {'method': 'textDocument/didChange', 'params': {
+                'textDocument': doc, 'contentChanges': [
+                    {'range': {
+                        'start': {'line': 0, 'character': 0},
+                        'end': {'line': 0, 'character': 0}},
+                     'text': '# comment\n'},
+                ]}},
+        )), io.BytesIO()
+        server = Server(self.args, instream, outstream)
+        server.run()
+        parsed = server._documents[self.uri].parsed
+        assert parsed.data == b'# comment\n' + self.text.encode()
+        assert not parsed.has_error
+
+    def test_outside_repo(self, tmp_path):
+        path = str(tmp_path / 'foo.ebuild')
+        with open(path, 'w') as f:
+            f.write('EAPI=7\n')
+        self.uri = f'file://{path}'
+        status, (opened,) = self.run(
+            {'method': 'textDocument/didOpen', 'params': {'textDocument': {
+                'uri': self.uri, 'version': 1, 'languageId': 'ebuild',
+                'text': 'EAPI=7 \n'}}},
+        )
+        assert self.diagnostics(opened) == []
@@ -0,0 +1,27 @@
+import pytest
+from pkgcheck.packages import EbuildContent
+
+
+class TestEbuildContent:
+
+    @pytest.mark.parametrize('data', (
+        b'',
+        b'EAPI=8\n',
+        b'EAPI=8\nSLOT="0"',
+        b'EAPI=8\r\nSLOT="0"\rKEYWORDS="~amd64"\n',
+        'DESCRIPTION="ünicode line"\n\x0c\n'.encode(),
+    ))
+    def test_lines(self, tmp_path, data):
+        path = tmp_path / 'pkg-0.ebuild'
+        path.write_bytes(data)
+        content = EbuildContent(data)
+        # lines match those read in text mode
+        with open(path, encoding='utf8') as f:
+            assert content.lines == tuple(f)
+        assert content.text == ''.join(content.lines)
+
+    def test_invalid_utf8(self):
+        content = EbuildContent(b'DESCRIPTION="\xff"\n')
+        assert content.data
+        with pytest.raises(UnicodeDecodeError):
+            content.lines
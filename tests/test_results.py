@@ -0,0 +1,61 @@
+import pickle
+import random
+
+from pkgcheck.checks import codingstyle, metadata, metadata_xml, pkgdir, profiles
+from pkgcore.test.misc import FakePkg
+
+
+class TestResult:
+
+    def test_pickle(self):
+        pkg = FakePkg('dev-libs/foo-1-r1')
+        result = codingstyle.DeprecatedEapiCommand(
+            'dohtml', line='dohtml doc/*', lineno=8, eapi='6', pkg=pkg)
+        # cached attributes aren't serialized
+        hash(result)
+        assert result < codingstyle.DeprecatedEapiCommand(
+            'dohtml', line='dohtml doc/*', lineno=9, eapi='6', pkg=pkg)
+        assert {'_hash', '_sort_key'} <= set(result.__dict__)
+        restored = pickle.loads(pickle.dumps(result))
+        assert restored == result
+        assert restored.__dict__.keys() == result._attrs.keys() | {'_attr'}
+        assert str(restored) == str(result)
+
+        # attribute name tuples are shared between results
+        results = [
+            metadata.BadFilename(('0.tar.gz',), pkg=FakePkg(f'dev-libs/foo-{i}'))
+            for i in range(2)]
+        assert results[0].__reduce__()[1][1] is results[1].__reduce__()[1][1]
+
+    def test_interned(self):
+        pkg = FakePkg('dev-libs/foo-1')
+        result = metadata.BadFilename(('0.tar.gz',), pkg=pkg)
+        restored = pickle.loads(pickle.dumps(result))
+        for attr in ('category', 'package', 'version'):
+            assert getattr(result, attr) is getattr(
+                metadata.BadFilename(('1.tar.gz',), pkg=FakePkg('dev-libs/foo-1')), attr)
+            assert getattr(restored, attr) == getattr(result, attr)
+
+    def test_sorting(self):
+        pkg = FakePkg('dev-libs/foo-1')
+        ordered = [
+            profiles.ProfileWarning(Exception('profile warning')),
+            metadata_xml.CatMissingMetadataXml('metadata.xml', pkg=FakePkg('app-arch/foo-0')),
+            metadata_xml.CatMissingMetadataXml('metadata.xml', pkg=pkg),
+            pkgdir.InvalidPN(('bar',), pkg=pkg),
+            metadata.BadFilename(('0.tar.gz',), pkg=FakePkg('dev-libs/foo-1_rc1')),
+            metadata.BadFilename(('0.tar.gz',), pkg=pkg),
+            codingstyle.DeprecatedEapiCommand(
+                'dohtml', line='dohtml', lineno=2, eapi='6', pkg=pkg),
+            codingstyle.DeprecatedEapiCommand(
+                'dohtml', line='dohtml', lineno=10, eapi='6', pkg=pkg),
+            metadata.BadFilename(('0.tar.gz',), pkg=FakePkg('dev-libs/foo-1-r1')),
+            metadata.BadFilename(('0.tar.gz',), pkg=FakePkg('dev-libs/foo-2')),
+            pkgdir.InvalidPN(('bar',), pkg=FakePkg('dev-libs/foo2-0')),
+        ]
+        random.seed(0)
+        for _ in range(10):
+            shuffled = ordered[:]
+            random.shuffle(shuffled)
+            assert sorted(shuffled) == ordered
+            assert sorted(pickle.loads(pickle.dumps(shuffled))) == ordered
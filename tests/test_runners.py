@@ -0,0 +1,19 @@
+from pkgcheck import sources
+from pkgcheck.checks import metadata
+from pkgcheck.runners import SyncCheckRunner
+from pkgcore.ebuild.atom import atom
+from snakeoil.cli import arghparse
+
+
+class TestSyncCheckRunner:
+
+    def test_shared_source_metadata_errors(self, repo):
+        repo.create_ebuild('cat/pkg-0', eapi='-1')
+        options = arghparse.Namespace(target_repo=repo._repo)
+        source = sources.RepoSource(options)
+        runner = SyncCheckRunner(options, source, [metadata.SourcingCheck(options)])
+        # other runners sharing the source don't capture its metadata errors
+        other = SyncCheckRunner(options, source, [metadata.DescriptionCheck(options)])
+        assert not list(other.run(atom('cat/pkg')))
+        results = list(runner.run(atom('cat/pkg')))
+        assert [x.__class__ for x in results] == [metadata.InvalidEapi]
@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+from pkgcheck import sources
+from pkgcheck.addons.caches import SyntaxCache
+from pkgcheck.packages import EbuildContent
+from pkgcore.ebuild.atom import atom
+from pkgcore.restrictions import packages, values
+from snakeoil.cli import arghparse
+
+
+class TestSharedMatches:
+
+    def test_shared_pkgs(self, repo):
+        repo.create_ebuild('cat/pkg-0')
+        repo.create_ebuild('cat/pkg-1')
+        repo.create_ebuild('cat/pkg-2', eapi='-1')
+        repo.create_ebuild('cat/other-0')
+        target_repo = repo._repo
+        options = arghparse.Namespace(target_repo=target_repo)
+        file_source = sources.EbuildFileRepoSource(options)
+        pkg_source = sources.PackageRepoSource(options)
+
+        errors = []
+        restrict = atom('cat/pkg')
+        with patch.object(target_repo, 'itermatch', wraps=target_repo.itermatch) as itermatch:
+            file_pkgs = list(file_source.itermatch(restrict, error_callback=errors.append))
+            pkgsets = list(pkg_source.itermatch(restrict, error_callback=errors.append))
+            # the repo is only iterated once for all sources
+            assert itermatch.call_count == 1
+
+            # new package restrictions replace the shared matches
+            pkgs = list(file_source.itermatch(atom('cat/other')))
+            assert [x.cpvstr for x in pkgs] == ['cat/other-0']
+            assert itermatch.call_count == 2
+            list(pkg_source.itermatch(restrict))
+            assert itermatch.call_count == 3
+
+        assert [x.cpvstr for x in file_pkgs] == ['cat/pkg-0', 'cat/pkg-1']
+        assert all(x._pkg is y for x, y in zip(file_pkgs, pkgsets[0], strict=True))
+        # metadata errors are replayed to all sources
+        assert [e.pkg.cpvstr for e in errors] == ['cat/pkg-2', 'cat/pkg-2']
+
+    def test_unshared_restrictions(self, repo):
+        repo.create_ebuild('cat/pkg-0')
+        target_repo = repo._repo
+        source = sources.RepoSource(arghparse.Namespace(target_repo=target_repo))
+        with patch.object(target_repo, 'itermatch', wraps=target_repo.itermatch) as itermatch:
+            for _ in range(2):
+                pkgs = list(source.itermatch(packages.AlwaysTrue))
+                assert [x.cpvstr for x in pkgs] == ['cat/pkg-0']
+            assert itermatch.call_count == 2
+
+    def test_restriction_source(self, repo):
+        repo.create_ebuild('cat/pkg-0', eapi='5')
+        repo.create_ebuild('cat/pkg-1', eapi='7')
+        options = arghparse.Namespace(target_repo=repo._repo)
+        restriction = packages.PackageRestriction('eapi', values.StrExactMatch('7'))
+        source = sources.RestrictionRepoSource(restriction, options)
+        pkgs = list(source.itermatch(atom('cat/pkg')))
+        assert [x.cpvstr for x in pkgs] == ['cat/pkg-1']
+
+
+class TestEbuildContentSources:
+
+    def test_shared_content(self, repo):
+        repo.create_ebuild('cat/pkg-0')
+        options = arghparse.Namespace(target_repo=repo._repo)
+        file_source = sources.EbuildFileRepoSource(options)
+        parse_source = sources.EbuildParseRepoSource(options)
+        restrict = atom('cat/pkg')
+        with patch('pkgcheck.packages.EbuildContent.read', wraps=EbuildContent.read) as read:
+            (file_pkg,) = file_source.itermatch(restrict)
+            (parsed_pkg,) = parse_source.itermatch(restrict)
+            # ebuilds are only read once for all sources
+            assert read.call_count == 1
+        assert parsed_pkg.data is file_pkg.content.data
+        with open(file_pkg.path, encoding='utf8') as f:
+            assert file_pkg.lines == tuple(f)
+
+    def test_shared_syntax_cache(self, repo, tmp_path):
+        options = arghparse.Namespace(
+            target_repo=repo._repo, cache={'syntax': True}, cache_dir=str(tmp_path))
+        addons_map = {}
+        ebuild_source = sources.init_source(sources.EbuildParseRepoSource, options, addons_map)
+        other_source = sources.init_source(sources.EbuildParseRepoSource, options, addons_map)
+        # parse sources share the syntax cache with other addons
+        assert ebuild_source._syntax_cache is not None
+        assert ebuild_source._syntax_cache is other_source._syntax_cache
+        assert ebuild_source._syntax_cache is addons_map[SyntaxCache]
+
+        # disabled caches are skipped
+        options.cache['syntax'] = False
+        source = sources.init_source(sources.EbuildParseRepoSource, options, {})
+        assert source._syntax_cache is None
@@ -0,0 +1,45 @@
+import pickle
+
+import pytest
+from pkgcheck.timings import Timings
+
+
+class TestTimings:
+
+    def test_empty(self):
+        timings = Timings()
+        assert not timings
+        assert timings.stats() == []
+
+    def test_stats(self):
+        timings = Timings()
+        for i in range(1, 21):
+            timings.add('Check', f'cat/pkg{i}', float(i))
+        timings.add('Check', 'cat/pkg1', 1.0)
+        timings.add('Check', None, 0.5)
+        timings.add('Other', 'cat/pkg1', 1000.0)
+        assert timings
+
+        other, check = timings.stats()
+        name, total, mean, p95, max_time, targets = check
+        assert name == 'Check'
+        assert total == sum(range(1, 21)) + 1.5
+        assert mean == pytest.approx(total / 21)
+        assert p95 == 19.0
+        assert max_time == 20.0
+        # untargeted times count towards stats, but aren't listed
+        assert len(targets) == 20
+        assert targets[:2] == [('cat/pkg20', 20.0), ('cat/pkg19', 19.0)]
+        assert ('cat/pkg1', 2.0) in targets
+        assert other[0] == 'Other'
+
+    def test_update(self):
+        timings = Timings()
+        timings.add('Check', 'cat/pkg', 1.0)
+        # merged instances are transferred between processes
+        other = pickle.loads(pickle.dumps(timings))
+        other.add('Check', 'cat/other', 2.0)
+        timings.update(other)
+        (_name, total, *_, targets), = timings.stats()
+        assert total == 4.0
+        assert targets == [('cat/pkg', 2.0), ('cat/other', 2.0)]
@@ -0,0 +1,50 @@
+import json
+import os
+
+from pkgcheck import tracing
+
+
+class TestTracing:
+
+    def test_disabled(self):
+        assert tracing.tracer is None
+        func = lambda: None
+        assert tracing.traced(func, 'name', 'cat') is func
+        with tracing.span('name', 'cat'):
+            pass
+        # finishing without an active tracer is a no-op
+        tracing.finish()
+
+    def test_forked(self, tmp_path):
+        path = str(tmp_path / 'trace.json')
+        tracer = tracing.start(path)
+        try:
+            with tracing.span('parent', 'test', arg=1):
+                pass
+            traced = tracing.traced(lambda x: x * 2, 'call', 'test')
+            assert traced(2) == 4
+
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover
+                tracer.process('child')
+                with tracer.span('child', 'test'):
+                    pass
+                tracer.flush()
+                os._exit(0)
+            os.waitpid(pid, 0)
+        finally:
+            tracing.finish()
+        assert tracing.tracer is None
+
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+        # temporary events file is removed
+        assert os.listdir(tmp_path) == ['trace.json']
+        names = {x['pid']: x['args']['name'] for x in events if x['ph'] == 'M'}
+        assert names == {os.getpid(): f'pkgcheck ({os.getpid()})', pid: f'child ({pid})'}
+        spans = {(x['name'], x['pid']) for x in events if x['ph'] == 'X'}
+        # events inherited by forked processes aren't duplicated
+        assert spans == {('parent', os.getpid()), ('call', os.getpid()), ('child', pid)}
+        parent = next(x for x in events if x['name'] == 'parent')
+        assert parent['args'] == {'arg': 1}
+        assert parent['dur'] >= 0
@@ -0,0 +1,67 @@
+import multiprocessing
+
+from pkgcheck.transport import SharedMemoryQueue
+
+
+def _writer(q, i, count):
+    for j in range(count):
+        q.put((i, j, 'x' * (j * 7 % 100)))
+
+
+class TestSharedMemoryQueue:
+
+    ctx = multiprocessing.get_context('fork')
+
+    def test_single_process(self):
+        q = SharedMemoryQueue(self.ctx, 1, ring_size=16)
+        # messages larger than the ring are streamed by the writer
+        data = [list(range(100)), 'foo', {'bar': 1}]
+        proc = self.ctx.Process(target=lambda: [q.put(x) for x in data + [None]])
+        proc.start()
+        assert list(iter(q.get, None)) == data
+        proc.join()
+
+    def test_multiple_processes(self):
+        writers, count = 4, 200
+        q = SharedMemoryQueue(self.ctx, writers + 1, ring_size=256)
+        procs = [
+            self.ctx.Process(target=_writer, args=(q, i, count))
+            for i in range(writers)]
+        for proc in procs:
+            proc.start()
+        results = [q.get() for _ in range(writers * count)]
+        for proc in procs:
+            proc.join()
+        q.put(None)
+        assert q.get() is None
+
+        # messages from each process are received in order
+        for i in range(writers):
+            assert [x[1] for x in results if x[0] == i] == list(range(count))
+
+    def test_end_of_stream(self):
+        q = SharedMemoryQueue(self.ctx, 2)
+
+        def writer():
+            q.put('foo')
+            q.put('bar')
+        proc = self.ctx.Process(target=writer)
+        proc.start()
+        proc.join()
+
+        def finish():
+            q.put(None)
+        proc = self.ctx.Process(target=finish)
+        proc.start()
+        proc.join()
+        # end of stream is deferred until other messages are received
+        assert list(iter(q.get, None)) == ['foo', 'bar']
+
+    def test_too_many_writers(self):
+        q = SharedMemoryQueue(self.ctx, 1)
+        q.put('foo')
+        proc = self.ctx.Process(target=q.put, args=('bar',))
+        proc.start()
+        proc.join()
+        assert proc.exitcode != 0
+        assert q.get() == 'foo'